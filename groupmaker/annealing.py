@@ -0,0 +1,214 @@
+"""Functions for finding good groups quickly with simulated annealing.
+
+Starting from chunked groups, students in different groups are repeatedly
+swapped. Each swap is scored only by the pairs it changes, so large classes can
+be searched without ever scoring a whole group config.
+"""
+import math
+import random
+import time
+from typing import Callable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from .constraints import IndexConstraints
+from .generation import calc_group_sizes
+from .generation import chunk_index_groups
+from .generation import group_config_from_index_groups
+from .models import Group
+from .models import GroupConfig
+from .models import Pair
+from .models import PairCountMatrix
+from .models import PairCounts
+from .models import Students
+from .profiling import add_counts
+from .scoring import calc_index_cost_rows
+from .scoring import score_index_groups
+
+DEFAULT_ITERATIONS = 100000
+
+_DEADLINE_CHECK_INTERVAL = 256
+_END_TEMPERATURE_RATIO = 0.001
+_TEMPERATURE_SAMPLE_COUNT = 100
+
+
+def _calc_swap_delta(
+        cost_rows: List[List[int]], group_a: List[int], position_a: int,
+        group_b: List[int], position_b: int
+) -> int:
+    """Return how much the score changes if the students at two positions in
+    different groups swap groups.
+
+    Only pairs with one of the swapped students change.
+
+    >>> _calc_swap_delta(
+    ...     [[0, 4, 0, 0], [4, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]],
+    ...     [0, 1], 1, [2, 3], 0)
+    -4
+    """
+    student_a = group_a[position_a]
+    student_b = group_b[position_b]
+    costs_a = cost_rows[student_a]
+    costs_b = cost_rows[student_b]
+    delta = 0
+    for member in group_a:
+        if member != student_a:
+            delta += costs_b[member] - costs_a[member]
+    for member in group_b:
+        if member != student_b:
+            delta += costs_a[member] - costs_b[member]
+    return delta
+
+
+def _pick_swap(rng: random.Random, index_groups: List[List[int]]
+               ) -> Tuple[int, int, int, int]:
+    """Return a random pair of groups and a position in each to swap."""
+    group_index_a, group_index_b = rng.sample(range(len(index_groups)), 2)
+    return (
+        group_index_a, rng.randrange(len(index_groups[group_index_a])),
+        group_index_b, rng.randrange(len(index_groups[group_index_b]))
+    )
+
+
+def _estimate_start_temperature(
+        cost_rows: List[List[int]], index_groups: List[List[int]],
+        rng: random.Random
+) -> float:
+    """Return a temperature that accepts a typical worsening swap about a
+    third of the time.
+    """
+    deltas = []
+    for _ in range(_TEMPERATURE_SAMPLE_COUNT):
+        group_index_a, position_a, group_index_b, position_b = _pick_swap(
+            rng, index_groups
+        )
+        deltas.append(
+            abs(
+                _calc_swap_delta(
+                    cost_rows, index_groups[group_index_a], position_a,
+                    index_groups[group_index_b], position_b
+                )
+            )
+        )
+    return sum(deltas) / len(deltas) or 1.0
+
+
+def anneal_index_groups(
+        cost_rows: List[List[int]],
+        index_groups: List[List[int]],
+        rng: random.Random,
+        iterations: int = DEFAULT_ITERATIONS,
+        deadline: Optional[float] = None,
+        on_improvement: Optional[Callable[[List[List[int]], int],
+                                          None]] = None,
+        lower_bound: Optional[float] = None,
+        index_constraints: Optional[IndexConstraints] = None
+) -> Tuple[List[List[int]], int]:
+    """Return the lowest-scoring groups of student indices found by swapping
+    students between groups, and their score.
+
+    Group sizes never change. Stops after a number of swap attempts, once
+    the `time.monotonic` deadline passes, or once groups scoring the lower
+    bound are found, whichever is first. Each time better groups are found,
+    they and their score are passed to `on_improvement`. With index
+    constraints, the starting groups must follow them, and swaps that would
+    break them are never made.
+
+    >>> index_groups, score = anneal_index_groups(
+    ...     [[0, 1, 0, 1], [1, 0, 1, 0], [0, 1, 0, 1], [1, 0, 1, 0]],
+    ...     [[0, 1], [2, 3]], random.Random(0), iterations=100)
+    >>> sorted(sorted(index_group) for index_group in index_groups), score
+    ([[0, 2], [1, 3]], 0)
+    """
+    index_groups = [list(index_group) for index_group in index_groups]
+    score = score_index_groups(cost_rows, index_groups)
+    best_index_groups = [list(index_group) for index_group in index_groups]
+    best_score = score
+    if on_improvement is not None:
+        on_improvement(best_index_groups, best_score)
+    if len(index_groups) < 2:
+        return best_index_groups, best_score
+
+    start_temperature = _estimate_start_temperature(
+        cost_rows, index_groups, rng
+    )
+    cooling_rate = _END_TEMPERATURE_RATIO ** (1 / max(iterations, 1))
+    temperature = start_temperature
+    swap_count = 0
+    for swap_count in range(1, iterations + 1):
+        if (deadline is not None and
+                swap_count % _DEADLINE_CHECK_INTERVAL == 1 and
+                time.monotonic() >= deadline):
+            swap_count -= 1
+            break
+        group_index_a, position_a, group_index_b, position_b = _pick_swap(
+            rng, index_groups
+        )
+        group_a = index_groups[group_index_a]
+        group_b = index_groups[group_index_b]
+        if index_constraints is not None and not index_constraints.allows_swap(
+                group_a, position_a, group_b, position_b):
+            temperature *= cooling_rate
+            continue
+        delta = _calc_swap_delta(
+            cost_rows, group_a, position_a, group_b, position_b
+        )
+        if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+            group_a[position_a], group_b[position_b] = (
+                group_b[position_b], group_a[position_a]
+            )
+            score += delta
+            if score < best_score:
+                best_score = score
+                best_index_groups = [
+                    list(index_group) for index_group in index_groups
+                ]
+                if on_improvement is not None:
+                    on_improvement(best_index_groups, best_score)
+                if lower_bound is not None and best_score <= lower_bound:
+                    break
+        temperature *= cooling_rate
+    add_counts(anneal_swaps_tried=swap_count)
+    return best_index_groups, best_score
+
+
+def solve_for_min_scoring_groups_annealing(
+        students: Students,
+        group_size: int,
+        historical_pair_counts: PairCounts,
+        seed: Optional[int] = None,
+        iterations: int = DEFAULT_ITERATIONS,
+        time_limit: Optional[float] = None
+) -> GroupConfig:
+    """Search for a low-scoring group config of a list of students by
+    simulated annealing.
+
+    Groups have the same sizes `solve_for_min_scoring_groups` makes, but the
+    group config is not guaranteed to be the minimum-scoring one. The same
+    seed always gives the same group config unless the time limit in seconds
+    cuts the search short.
+
+    >>> solve_for_min_scoring_groups_annealing(
+    ...     Students('A', 'B', 'C', 'D'),
+    ...     2,
+    ...     PairCounts(
+    ...         (Pair('A', 'B'), 1), (Pair('A', 'D'), 1), (Pair('B', 'C'), 1),
+    ...         (Pair('C', 'D'), 1)),
+    ...     seed=0)
+    GroupConfig(Group('A', 'C'), Group('B', 'D'))
+    """
+    deadline = None
+    if time_limit is not None:
+        deadline = time.monotonic() + time_limit
+    cost_rows = calc_index_cost_rows(
+        PairCountMatrix.from_pair_counts(students, historical_pair_counts)
+    )
+    seed_index_groups = chunk_index_groups(
+        calc_group_sizes(len(students.names), group_size)
+    )
+    index_groups, _ = anneal_index_groups(
+        cost_rows, seed_index_groups, random.Random(seed), iterations,
+        deadline
+    )
+    return group_config_from_index_groups(students, index_groups)
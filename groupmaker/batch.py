@@ -0,0 +1,253 @@
+"""Functions for making groups for many classes in one process.
+
+A manifest is a JSON list of jobs. Each job is an object with a `students` file
+path, a `group_size` (default 3), a `history` list of group file paths
+(default none), an `output` group file path to write, and optionally a
+`solver` name and a `constraints` file path. Relative paths are relative to the
+manifest.
+
+Every distinct group file is read once, however many jobs share it. Jobs are
+then solved in worker processes, and a job that fails is reported without
+stopping the others.
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from .counting import count_pairs
+from .file_io import read_constraints
+from .file_io import read_group_config
+from .file_io import read_students
+from .file_io import write_group_config
+from .models import PairCounts
+from .models import Solution
+from .pairing import calc_pairs_in_group_config
+from .solver import SOLVER_NAMES
+from .solver import solve
+
+DEFAULT_GROUP_SIZE = 3
+
+# A job's solution, or what went wrong.
+_JobResult = Tuple[Optional[Solution], Optional[str]]
+
+
+class BatchJob:
+    """One class to make groups for in a batch.
+
+    Treat as immutable.
+    """
+
+    __slots__ = (
+        'students_file_path', 'group_size', 'historical_groups_file_paths',
+        'output_file_path', 'solver', 'constraints_file_path'
+    )
+
+    def __init__(
+            self,
+            students_file_path: str,
+            group_size: int,
+            historical_groups_file_paths: Iterable[str],
+            output_file_path: str,
+            solver: str = 'exhaustive',
+            constraints_file_path: Optional[str] = None
+    ) -> None:
+        """Make a new batch job."""
+        self.students_file_path = students_file_path
+        self.group_size = group_size
+        self.historical_groups_file_paths = tuple(
+            historical_groups_file_paths
+        )
+        self.output_file_path = output_file_path
+        self.solver = solver
+        self.constraints_file_path = constraints_file_path
+
+    def __repr__(self) -> str:
+        """Return the literal of a batch job.
+
+        >>> BatchJob('s.txt', 2, ['g.txt'], 'out.txt')
+        BatchJob('s.txt', 2, ('g.txt',), 'out.txt', 'exhaustive', None)
+        """
+        return 'BatchJob({!r}, {!r}, {!r}, {!r}, {!r}, {!r})'.format(
+            self.students_file_path, self.group_size,
+            self.historical_groups_file_paths, self.output_file_path,
+            self.solver, self.constraints_file_path
+        )
+
+
+def read_manifest(manifest_file: Iterable[str], base_dir_path: str = ''
+                  ) -> List[BatchJob]:
+    r"""Read the jobs in a manifest, with relative paths joined onto a base
+    directory.
+
+    >>> read_manifest([
+    ...     '[{"students": "s.txt", "history": ["g.txt"], ',
+    ...     '"output": "/out.txt", "group_size": 2}]'], 'class')
+    [BatchJob('class/s.txt', 2, ('class/g.txt',), '/out.txt', 'exhaustive', None)]
+    >>> read_manifest(['[{"students": "s.txt"}]'])
+    Traceback (most recent call last):
+        ...
+    ValueError: job 1: missing 'output'
+    >>> read_manifest(['[{"students": "s.txt", "output": "o", "size": 2}]'])
+    Traceback (most recent call last):
+        ...
+    ValueError: job 1: unknown keys: ['size']
+    """
+    manifest = json.loads(''.join(manifest_file))
+    if not isinstance(manifest, list):
+        raise ValueError('manifest must be a list of jobs')
+
+    def _to_path(path: str) -> str:
+        return os.path.join(base_dir_path, path)
+
+    jobs = []
+    for job_number, job in enumerate(manifest, start=1):
+        if not isinstance(job, dict):
+            raise ValueError('job {}: must be an object'.format(job_number))
+        for key in ('students', 'output'):
+            if key not in job:
+                raise ValueError(
+                    'job {}: missing {!r}'.format(job_number, key)
+                )
+        unknown_keys = sorted(
+            frozenset(job) - {
+                'students', 'group_size', 'history', 'output', 'solver',
+                'constraints'
+            }
+        )
+        if len(unknown_keys) > 0:
+            raise ValueError(
+                'job {}: unknown keys: {!r}'.format(job_number, unknown_keys)
+            )
+        solver = job.get('solver', 'exhaustive')
+        if solver not in SOLVER_NAMES:
+            raise ValueError(
+                'job {}: unknown solver: {!r}'.format(job_number, solver)
+            )
+        constraints_file_path = job.get('constraints')
+        jobs.append(
+            BatchJob(
+                _to_path(job['students']),
+                int(job.get('group_size', DEFAULT_GROUP_SIZE)),
+                map(_to_path, job.get('history', [])),
+                _to_path(job['output']),
+                solver,
+                None if constraints_file_path is None else
+                _to_path(constraints_file_path)
+            )
+        )
+    return jobs
+
+
+def _describe_error(error: Exception) -> str:
+    """Return the type and message of an error.
+
+    >>> _describe_error(ValueError('bad name'))
+    'ValueError: bad name'
+    """
+    return '{}: {}'.format(type(error).__name__, error)
+
+
+def _read_shared_pair_counts(
+        jobs: Iterable[BatchJob]
+) -> Tuple[Dict[str, PairCounts], Dict[str, str]]:
+    """Read the pair counts of every distinct group file in jobs once.
+
+    Returns the pair counts of each group file that could be read, and the
+    error of each that could not.
+    """
+    pair_counts = {}  # type: Dict[str, PairCounts]
+    errors = {}  # type: Dict[str, str]
+    for job in jobs:
+        for path in job.historical_groups_file_paths:
+            if path in pair_counts or path in errors:
+                continue
+            try:
+                with open(path) as group_config_file:
+                    pair_counts[path] = count_pairs(
+                        calc_pairs_in_group_config(
+                            read_group_config(group_config_file)
+                        )
+                    )
+            except OSError as error:
+                errors[path] = _describe_error(error)
+            except ValueError as error:
+                errors[path] = '{}: {}'.format(path, _describe_error(error))
+    return pair_counts, errors
+
+
+def _run_job(job: BatchJob, historical_pair_counts: PairCounts) -> _JobResult:
+    """Solve one job and write its groups, returning the solution or what
+    went wrong.
+    """
+    try:
+        with open(job.students_file_path) as students_file:
+            students = read_students(students_file)
+        constraints = None
+        if job.constraints_file_path is not None:
+            with open(job.constraints_file_path) as constraints_file:
+                constraints = read_constraints(constraints_file)
+        solution = solve(
+            students,
+            job.group_size,
+            historical_pair_counts,
+            job.solver,
+            constraints=constraints
+        )
+        with open(job.output_file_path, 'w') as output_file:
+            write_group_config(solution.group_config, output_file)
+    except Exception as error:  # One job failing shouldn't stop the batch.
+        return None, _describe_error(error)
+    return solution, None
+
+
+def run_batch(jobs: List[BatchJob], workers: int = 1) -> List[_JobResult]:
+    """Solve every job, writing each one's groups to its output file, and
+    return each job's solution or what went wrong, in order.
+
+    With more than one worker, jobs are solved in that many processes.
+
+    >>> run_batch([BatchJob('missing.txt', 2, [], 'out.txt')])
+    ... # doctest: +NORMALIZE_WHITESPACE
+    [(None, "FileNotFoundError: [Errno 2] No such file or directory:
+      'missing.txt'")]
+    """
+    shared_pair_counts, history_errors = _read_shared_pair_counts(jobs)
+    results = {}  # type: Dict[int, _JobResult]
+    runnable_indices = []  # type: List[int]
+    runnable_pair_counts = []  # type: List[PairCounts]
+    for index, job in enumerate(jobs):
+        errors = [
+            history_errors[path] for path in job.historical_groups_file_paths
+            if path in history_errors
+        ]
+        if len(errors) > 0:
+            results[index] = (None, errors[0])
+            continue
+        runnable_indices.append(index)
+        runnable_pair_counts.append(
+            sum(
+                (
+                    shared_pair_counts[path]
+                    for path in job.historical_groups_file_paths
+                ), PairCounts()
+            )
+        )
+
+    runnable_jobs = [jobs[index] for index in runnable_indices]
+    if workers > 1 and len(runnable_jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            job_results = list(
+                executor.map(_run_job, runnable_jobs, runnable_pair_counts)
+            )
+    else:
+        job_results = list(
+            map(_run_job, runnable_jobs, runnable_pair_counts)
+        )
+    for index, job_result in zip(runnable_indices, job_results):
+        results[index] = job_result
+    return [results[index] for index in range(len(jobs))]
@@ -0,0 +1,308 @@
+"""Functions for timing each stage of making groups on synthetic classes.
+
+A synthetic class has numbered student names and a history of random rounds.
+Each stage is timed over repeated runs, then run once more while tracing
+allocations to find its peak memory use. Starting the command line script is
+timed in new Python processes, since that is when its modules are imported.
+"""
+import io
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from .counting import count_pairs
+from .file_io import read_group_configs
+from .file_io import write_group_config
+from .generation import calc_group_sizes
+from .generation import generate_all_group_configs
+from .models import Group
+from .models import GroupConfig
+from .models import PairCountMatrix
+from .models import Students
+from .pairing import calc_pairs_in_group_config
+from .pairing import calc_pairs_in_group_configs
+from .report import print_student_pair_summaries
+from .report import print_top_pairs
+from .report import write_pair_count_csv
+from .scoring import score_pairs
+from .solver import SOLVER_NAMES
+from .solver import find_min_scoring_group_config
+from .solver import solve
+from .table import print_student_pair_count_matrix
+
+DEFAULT_REPEAT = 5
+DEFAULT_STARTUP_MODULE = 'groupmaker.scripts.groupmaker'
+# Exhaustive stages only use this many students, since the number of group
+# configs grows faster than exponentially.
+DEFAULT_EXHAUSTIVE_STUDENT_COUNT = 9
+
+
+def make_synthetic_students(student_count: int) -> Students:
+    """Return a class of numbered students.
+
+    >>> make_synthetic_students(3)
+    Students('Student 1', 'Student 2', 'Student 3')
+    """
+    width = len(str(student_count))
+    return Students(
+        *(
+            'Student {:0{}}'.format(number, width)
+            for number in range(1, student_count + 1)
+        )
+    )
+
+
+def make_synthetic_group_configs(
+        students: Students, round_count: int, group_size: int, seed:
+        Optional[int] = None
+) -> List[GroupConfig]:
+    """Return rounds of random groups of a class.
+
+    >>> make_synthetic_group_configs(Students('A', 'B', 'C'), 2, 2, seed=0)
+    [GroupConfig(Group('A', 'C'), Group('B')), GroupConfig(Group('A'), Group('B', 'C'))]
+    """
+    rng = random.Random(seed)
+    group_sizes = calc_group_sizes(len(students.names), group_size)
+    group_configs = []
+    for _ in range(round_count):
+        names = list(students.names)
+        rng.shuffle(names)
+        groups = []
+        start = 0
+        for size in group_sizes:
+            groups.append(Group(*names[start:start + size]))
+            start += size
+        group_configs.append(GroupConfig(*groups))
+    return group_configs
+
+
+def time_stage(name: str, stage: Callable[[], Any],
+               repeat: int = DEFAULT_REPEAT) -> Dict[str, Any]:
+    """Run a stage a number of times and return its name, the fastest and
+    mean time of a run in seconds, and the peak memory in bytes allocated
+    during one more traced run.
+
+    >>> result = time_stage('nothing', lambda: None, repeat=2)
+    >>> sorted(result)
+    ['mean_seconds', 'min_seconds', 'name', 'peak_memory_bytes', 'repeat']
+    >>> result['name'], result['repeat']
+    ('nothing', 2)
+    """
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        stage()
+        durations.append(time.perf_counter() - start)
+
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    tracemalloc.clear_traces()
+    start_memory, _ = tracemalloc.get_traced_memory()
+    stage()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    if not was_tracing:
+        tracemalloc.stop()
+
+    return {
+        'name': name,
+        'repeat': repeat,
+        'min_seconds': min(durations),
+        'mean_seconds': sum(durations) / len(durations),
+        'peak_memory_bytes': max(peak_memory - start_memory, 0),
+    }
+
+
+def time_startup(module_name: str = DEFAULT_STARTUP_MODULE,
+                 repeat: int = DEFAULT_REPEAT) -> Dict[str, Any]:
+    """Start a new Python process that imports a module a number of times
+    and return the module name, and the fastest and mean time of a start in
+    seconds, along with the fastest time to start one that imports nothing.
+
+    >>> result = time_startup('groupmaker', repeat=1)
+    >>> sorted(result)
+    ['interpreter_min_seconds', 'mean_seconds', 'min_seconds', 'module', 'repeat']
+    >>> result['module'], result['repeat']
+    ('groupmaker', 1)
+    """
+    env = dict(os.environ)
+    # The new processes import this package, even if it isn't installed.
+    package_parent_path = os.path.dirname(
+        os.path.dirname(os.path.abspath(__file__))
+    )
+    env['PYTHONPATH'] = os.pathsep.join(
+        [package_parent_path] +
+        ([env['PYTHONPATH']] if env.get('PYTHONPATH') else [])
+    )
+
+    def _time_process(code: str) -> List[float]:
+        durations = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.check_call([sys.executable, '-c', code], env=env)
+            durations.append(time.perf_counter() - start)
+        return durations
+
+    durations = _time_process('import {}'.format(module_name))
+    return {
+        'module': module_name,
+        'repeat': repeat,
+        'min_seconds': min(durations),
+        'mean_seconds': sum(durations) / len(durations),
+        'interpreter_min_seconds': min(_time_process('pass')),
+    }
+
+
+def run_benchmarks(
+        student_count: int,
+        round_count: int,
+        group_size: int,
+        seed: Optional[int] = None,
+        repeat: int = DEFAULT_REPEAT,
+        exhaustive_student_count: int = DEFAULT_EXHAUSTIVE_STUDENT_COUNT,
+        solver_names: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """Time every stage of making groups for a synthetic class and history,
+    and return the results ready to be dumped as JSON.
+
+    Generating and searching every group config, and solving with each
+    solver, only use the first students of the class, up to the exhaustive
+    student count. Starting the command line script is timed too.
+
+    >>> results = run_benchmarks(4, 2, 2, seed=0, repeat=1)
+    >>> [stage['name'] for stage in results['stages']]
+    ... # doctest: +NORMALIZE_WHITESPACE
+    ['count_pairs', 'score_pairs', 'read_group_configs',
+     'print_student_pair_count_matrix', 'print_top_pairs',
+     'print_student_pair_summaries', 'write_pair_count_csv',
+     'generate_all_group_configs', 'find_min_scoring_group_config',
+     'solve:exhaustive',
+     'solve:branch-and-bound', 'solve:dynamic-programming', 'solve:anneal']
+    >>> results['startup']['module']
+    'groupmaker.scripts.groupmaker'
+    """
+    if solver_names is None:
+        solver_names = list(SOLVER_NAMES)
+    students = make_synthetic_students(student_count)
+    group_configs = make_synthetic_group_configs(
+        students, round_count, group_size, seed
+    )
+    pair_counts = count_pairs(calc_pairs_in_group_configs(group_configs))
+    pair_count_matrix = PairCountMatrix.from_pair_counts(
+        students, pair_counts
+    )
+    exhaustive_students = Students(
+        *students.names[:exhaustive_student_count]
+    )
+
+    stages = []
+    stages.append(
+        time_stage(
+            'count_pairs',
+            lambda: count_pairs(calc_pairs_in_group_configs(group_configs)),
+            repeat
+        )
+    )
+    stages.append(
+        time_stage(
+            'score_pairs', lambda: [
+                score_pairs(
+                    calc_pairs_in_group_config(group_config), pair_counts
+                ) for group_config in group_configs
+            ], repeat
+        )
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for number, group_config in enumerate(group_configs):
+            path = os.path.join(directory, 'round-{}.txt'.format(number))
+            with open(path, 'w') as group_config_file:
+                write_group_config(group_config, group_config_file)
+            paths.append(path)
+        stages.append(
+            time_stage(
+                'read_group_configs', lambda: list(read_group_configs(paths)),
+                repeat
+            )
+        )
+    stages.append(
+        time_stage(
+            'print_student_pair_count_matrix',
+            lambda: print_student_pair_count_matrix(
+                students, pair_counts, file=io.StringIO()
+            ), repeat
+        )
+    )
+    stages.append(
+        time_stage(
+            'print_top_pairs',
+            lambda: print_top_pairs(pair_count_matrix, file=io.StringIO()),
+            repeat
+        )
+    )
+    stages.append(
+        time_stage(
+            'print_student_pair_summaries',
+            lambda: print_student_pair_summaries(
+                pair_count_matrix, file=io.StringIO()
+            ), repeat
+        )
+    )
+    stages.append(
+        time_stage(
+            'write_pair_count_csv',
+            lambda: write_pair_count_csv(pair_count_matrix, io.StringIO()),
+            repeat
+        )
+    )
+    stages.append(
+        time_stage(
+            'generate_all_group_configs', lambda: sum(
+                1 for _ in
+                generate_all_group_configs(exhaustive_students, group_size)
+            ), repeat
+        )
+    )
+    stages.append(
+        time_stage(
+            'find_min_scoring_group_config',
+            lambda: find_min_scoring_group_config(
+                generate_all_group_configs(exhaustive_students, group_size),
+                pair_counts
+            ), repeat
+        )
+    )
+    for solver_name in solver_names:
+        stages.append(
+            time_stage(
+                'solve:{}'.format(solver_name),
+                lambda: solve(
+                    exhaustive_students, group_size, pair_counts,
+                    solver_name, seed=seed
+                ), repeat
+            )
+        )
+
+    return {
+        'python': platform.python_version(),
+        'parameters': {
+            'student_count': student_count,
+            'round_count': round_count,
+            'group_size': group_size,
+            'seed': seed,
+            'repeat': repeat,
+            'exhaustive_student_count': len(exhaustive_students.names),
+        },
+        'stages': stages,
+        'startup': time_startup(repeat=repeat),
+    }
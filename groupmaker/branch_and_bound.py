@@ -0,0 +1,345 @@
+"""Functions for finding the best groups with a branch-and-bound search.
+
+Students are assigned to groups one at a time in the same order group configs
+are generated, and any partial group config that can't beat the best complete
+one found so far is abandoned.
+"""
+import time
+from collections import Counter
+from typing import Any
+from typing import Callable
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from .constraints import IndexConstraints
+from .generation import calc_group_sizes
+from .generation import group_config_from_index_groups
+from .models import Constraints
+from .models import Group
+from .models import GroupConfig
+from .models import Pair
+from .models import PairCountMatrix
+from .models import PairCounts
+from .models import Students
+from .profiling import add_counts
+from .scoring import calc_index_cost_rows
+from .scoring import score_index_groups
+
+_DEADLINE_CHECK_INTERVAL = 1024
+_INF = float('inf')
+
+
+def calc_double_lower_bounds(cost_rows: List[List[int]], min_group_size:
+                              int) -> List[int]:
+    """Return twice the least score each student could ever add to a group
+    config.
+
+    A student adds at least its own pair and half of its cheapest pairs with
+    enough other students to fill the smallest group.
+
+    >>> calc_double_lower_bounds([[1, 4, 9], [4, 0, 1], [9, 1, 0]], 2)
+    [6, 1, 1]
+    """
+    double_lower_bounds = []
+    for index, costs in enumerate(cost_rows):
+        other_costs = sorted(costs[:index] + costs[index + 1:])
+        double_lower_bounds.append(
+            2 * costs[index] + sum(other_costs[:min_group_size - 1])
+        )
+    return double_lower_bounds
+
+
+def calc_lower_bound(
+        cost_rows: List[List[int]], group_sizes: Sequence[int]
+) -> float:
+    """Return a score no groups of student indices of the given sizes can
+    score less than.
+
+    >>> calc_lower_bound([[1, 4, 9], [4, 0, 1], [9, 1, 0]], [2, 1])
+    1.0
+    >>> calc_lower_bound([[1, 4, 9], [4, 0, 1], [9, 1, 0]], [3])
+    15.0
+    """
+    return sum(
+        calc_double_lower_bounds(cost_rows, min(group_sizes, default=1))
+    ) / 2
+
+
+def find_greedy_index_groups(
+        cost_rows: List[List[int]], group_sizes: Sequence[int],
+        first_index_group: Optional[Sequence[int]] = None
+) -> List[List[int]]:
+    """Return groups of student indices made by filling each group with the
+    cheapest unassigned student, lowest index first.
+
+    >>> find_greedy_index_groups(
+    ...     [[0, 1, 0, 1], [1, 0, 1, 0], [0, 1, 0, 1], [1, 0, 1, 0]], [2, 2])
+    [[0, 2], [1, 3]]
+    >>> find_greedy_index_groups(
+    ...     [[0, 1, 0, 1], [1, 0, 1, 0], [0, 1, 0, 1], [1, 0, 1, 0]], [2, 2],
+    ...     [0, 1])
+    [[0, 1], [2, 3]]
+    """
+    unassigned = list(range(len(cost_rows)))
+    index_groups = []
+    group_sizes = list(group_sizes)
+    if first_index_group is not None:
+        for index in first_index_group:
+            unassigned.remove(index)
+        group_sizes.remove(len(first_index_group))
+        index_groups.append(list(first_index_group))
+    for group_size in sorted(group_sizes, reverse=True):
+        index_group = [unassigned.pop(0)]
+        while len(index_group) < group_size:
+            cheapest = min(
+                unassigned,
+                key=lambda candidate: sum(
+                    cost_rows[member][candidate] for member in index_group
+                )
+            )
+            unassigned.remove(cheapest)
+            index_group.append(cheapest)
+        index_groups.append(index_group)
+    return index_groups
+
+
+def find_min_scoring_index_groups(
+        cost_rows: List[List[int]],
+        group_sizes: Sequence[int],
+        first_index_group: Optional[Sequence[int]] = None,
+        shared_best: Optional[Any] = None,
+        deadline: Optional[float] = None,
+        on_improvement: Optional[Callable[[List[List[int]], int],
+                                          None]] = None,
+        index_constraints: Optional[IndexConstraints] = None
+) -> Tuple[Optional[List[List[int]]], float, bool]:
+    """Return the minimum-scoring groups of student indices of the given sizes,
+    their score, and if the search finished.
+
+    If the `time.monotonic` deadline passes, the best groups found so far are
+    returned instead. Each time better groups are found, they and their score
+    are passed to `on_improvement`.
+
+    Ties go to whichever groups would be generated first. If a first group is
+    given, only groups that start with it are searched.
+
+    Searches running at the same time can share what they find through an
+    object with an `allows(score)` method, returning if groups with a score
+    could still be the best, and an `offer(score)` method, called with the
+    score of each better group found. If no groups are allowed, some
+    groups scoring more are returned.
+
+    With index constraints, groups that break them are never searched. If the
+    deadline passes before any groups that follow them are found, the first
+    groups that do are returned. If no groups follow the constraints, None and
+    an infinite score are returned.
+
+    >>> find_min_scoring_index_groups(
+    ...     [[0, 1, 0, 1], [1, 0, 1, 0], [0, 1, 0, 1], [1, 0, 1, 0]], [2, 2])
+    ([[0, 2], [1, 3]], 0, True)
+    >>> find_min_scoring_index_groups(
+    ...     [[0, 1, 0, 1], [1, 0, 1, 0], [0, 1, 0, 1], [1, 0, 1, 0]], [2, 2],
+    ...     [0, 1])
+    ([[0, 1], [2, 3]], 2, True)
+    >>> find_min_scoring_index_groups(
+    ...     [[0, 1, 0, 1], [1, 0, 1, 0], [0, 1, 0, 1], [1, 0, 1, 0]], [2, 2],
+    ...     deadline=0.0)
+    ([[0, 2], [1, 3]], 0, False)
+    >>> find_min_scoring_index_groups(
+    ...     [[0, 1, 0, 1], [1, 0, 1, 0], [0, 1, 0, 1], [1, 0, 1, 0]], [2, 2],
+    ...     index_constraints=IndexConstraints(
+    ...         Students('A', 'B', 'C', 'D'),
+    ...         Constraints(never_pairs=[Pair('A', 'C')])))
+    ([[0, 1], [2, 3]], 2, True)
+    >>> find_min_scoring_index_groups(
+    ...     [[0] * 6 for _ in range(6)], [3, 3],
+    ...     deadline=0.0,
+    ...     index_constraints=IndexConstraints(
+    ...         Students('A', 'B', 'C', 'D', 'E', 'F'),
+    ...         Constraints(never_pairs=[Pair('A', 'B'), Pair('A', 'C')])))
+    ([[0, 3, 4], [1, 2, 5]], 0, False)
+    """
+    student_count = len(cost_rows)
+    remaining_group_sizes = Counter(group_sizes)
+    double_lower_bounds = calc_double_lower_bounds(
+        cost_rows, min(group_sizes, default=1)
+    )
+    assigned = [False] * student_count
+    closed_groups = []  # type: List[List[int]]
+
+    greedy_index_groups = find_greedy_index_groups(
+        cost_rows, group_sizes, first_index_group
+    )
+    if index_constraints is None or index_constraints.allows_index_groups(
+            greedy_index_groups):
+        greedy_score = score_index_groups(cost_rows, greedy_index_groups)
+        if on_improvement is not None:
+            on_improvement(greedy_index_groups, greedy_score)
+    else:
+        greedy_index_groups, greedy_score = None, _INF
+    best_index_groups = None
+    best_score = greedy_score
+    node_count = 0
+    pruned_count = 0
+    timed_out = False
+
+    def _can_beat_best(double_bound: int) -> bool:
+        # Until a search result exists, the greedy score only bounds from
+        # above; a search result with the same score still wins the tie.
+        if shared_best is not None and not shared_best.allows(
+                double_bound / 2
+        ):
+            return False
+        if best_index_groups is None:
+            return double_bound <= 2 * best_score
+        return double_bound < 2 * best_score
+
+    def _search(open_group: List[int], score: int,
+                remaining_double_bound: int) -> None:
+        nonlocal best_index_groups, best_score, node_count, pruned_count, \
+            timed_out
+        node_count += 1
+        if (deadline is not None and
+                node_count % _DEADLINE_CHECK_INTERVAL == 1 and
+                time.monotonic() >= deadline):
+            timed_out = True
+        if timed_out:
+            return
+        if not _can_beat_best(2 * score + remaining_double_bound):
+            pruned_count += 1
+            return
+        if len(open_group) == 0:
+            anchor = next(
+                (index for index in range(student_count)
+                 if not assigned[index]), None
+            )
+            if anchor is None:
+                best_index_groups = [list(group) for group in closed_groups]
+                best_score = score
+                if shared_best is not None:
+                    shared_best.offer(score)
+                if on_improvement is not None:
+                    on_improvement(best_index_groups, best_score)
+                return
+            assigned[anchor] = True
+            _search(
+                [anchor], score + cost_rows[anchor][anchor],
+                remaining_double_bound - double_lower_bounds[anchor]
+            )
+            assigned[anchor] = False
+            return
+
+        group_size = len(open_group)
+        if remaining_group_sizes[group_size] > 0 and (
+                index_constraints is None or
+                index_constraints.allows_close(open_group)):
+            remaining_group_sizes[group_size] -= 1
+            closed_groups.append(open_group)
+            _search([], score, remaining_double_bound)
+            closed_groups.pop()
+            remaining_group_sizes[group_size] += 1
+        if not any(
+                count > 0 and size > group_size
+                for size, count in remaining_group_sizes.items()
+        ):
+            return
+        for candidate in range(open_group[-1] + 1, student_count):
+            if assigned[candidate] or (
+                    index_constraints is not None and
+                    not index_constraints.allows_join(open_group, candidate)):
+                continue
+            candidate_costs = cost_rows[candidate]
+            added_score = candidate_costs[candidate] + sum(
+                candidate_costs[member] for member in open_group
+            )
+            assigned[candidate] = True
+            _search(
+                open_group + [candidate], score + added_score,
+                remaining_double_bound - double_lower_bounds[candidate]
+            )
+            assigned[candidate] = False
+
+    if first_index_group is None:
+        _search([], 0, sum(double_lower_bounds))
+    else:
+        for index in first_index_group:
+            assigned[index] = True
+        remaining_group_sizes[len(first_index_group)] -= 1
+        closed_groups.append(list(first_index_group))
+        _search(
+            [], score_index_groups(cost_rows, [first_index_group]),
+            sum(double_lower_bounds) -
+            sum(double_lower_bounds[index] for index in first_index_group)
+        )
+    add_counts(
+        branch_and_bound_nodes=node_count,
+        branch_and_bound_nodes_pruned=pruned_count
+    )
+    if best_index_groups is None and greedy_index_groups is None and \
+            timed_out and first_index_group is None:
+        # Running out of time isn't proof that no groups follow the
+        # constraints, so look for any that do without a deadline.
+        greedy_index_groups = find_feasible_index_groups(
+            group_sizes, index_constraints
+        )
+        if greedy_index_groups is None:
+            return None, _INF, True
+        greedy_score = score_index_groups(cost_rows, greedy_index_groups)
+        if on_improvement is not None:
+            on_improvement(greedy_index_groups, greedy_score)
+    if best_index_groups is None:
+        return greedy_index_groups, greedy_score, not timed_out
+    return best_index_groups, best_score, not timed_out
+
+
+def find_feasible_index_groups(
+        group_sizes: Sequence[int], index_constraints: IndexConstraints
+) -> Optional[List[List[int]]]:
+    """Return the first groups of student indices of the given sizes that
+    follow index constraints, or None if there are none.
+
+    >>> find_feasible_index_groups(
+    ...     [2, 2],
+    ...     IndexConstraints(
+    ...         Students('A', 'B', 'C', 'D'),
+    ...         Constraints(never_pairs=[Pair('A', 'B')])))
+    [[0, 2], [1, 3]]
+    >>> find_feasible_index_groups(
+    ...     [2, 1],
+    ...     IndexConstraints(
+    ...         Students('A', 'B', 'C'),
+    ...         Constraints(pinned_groups=[Group('A', 'B', 'C')])))
+    """
+    student_count = sum(group_sizes)
+    index_groups, _, _ = find_min_scoring_index_groups(
+        [[0] * student_count for _ in range(student_count)],
+        group_sizes,
+        index_constraints=index_constraints
+    )
+    return index_groups
+
+
+def solve_for_min_scoring_groups_branch_and_bound(
+        students: Students, group_size: int, historical_pair_counts: PairCounts
+) -> GroupConfig:
+    """Figure out what is the minimum-scoring group config out of all possible
+    group configs creatable from a list of students, without scoring group
+    configs that can't be the minimum.
+
+    Returns the same group config as `solve_for_min_scoring_groups`, or with
+    groups of two, one that ties with it.
+
+    >>> solve_for_min_scoring_groups_branch_and_bound(
+    ...     Students('A', 'B', 'C'),
+    ...     2,
+    ...     PairCounts((Pair('A', 'B'), 1), (Pair('B', 'C'), 1)))
+    GroupConfig(Group('A', 'C'), Group('B'))
+    """
+    cost_rows = calc_index_cost_rows(
+        PairCountMatrix.from_pair_counts(students, historical_pair_counts)
+    )
+    group_sizes = calc_group_sizes(len(students.names), group_size)
+    index_groups, _, _ = find_min_scoring_index_groups(cost_rows, group_sizes)
+    return group_config_from_index_groups(students, index_groups)
@@ -0,0 +1,163 @@
+"""Functions for checking constraints while groups are being built.
+
+Searches build groups of student indices one student at a time, so constraints
+are checked as each student joins a group and again once the group is
+complete. Anything that can't follow the constraints is dropped before it is
+scored.
+"""
+from typing import FrozenSet
+from typing import List
+from typing import Optional
+from typing import Sequence
+
+from .models import Constraints
+from .models import Group
+from .models import Pair
+from .models import Students
+
+
+class IndexConstraints:
+    """Constraints on groups of student indices in a class.
+
+    Plain enough to be sent to worker processes.
+    """
+
+    def __init__(self, students: Students, constraints: Constraints) -> None:
+        """Look up the student indices of constraints.
+
+        >>> IndexConstraints(Students('A'), Constraints([Pair('A', 'B')]))
+        Traceback (most recent call last):
+            ...
+        ValueError: name in constraints not in students: 'B'
+        """
+        indices = {name: index for index, name in enumerate(students.names)}
+        for name in sorted(constraints.get_names()):
+            if name not in indices:
+                raise ValueError(
+                    'name in constraints not in students: {!r}'.format(name)
+                )
+
+        def _to_indices(names: Optional[FrozenSet[str]]
+                        ) -> Optional[FrozenSet[int]]:
+            if names is None:
+                return None
+            return frozenset(indices[name] for name in names)
+
+        self.partners = [
+            _to_indices(constraints.get_partners(name))
+            for name in students.names
+        ]  # type: List[FrozenSet[int]]
+        self.apart = [
+            _to_indices(constraints.get_apart(name))
+            for name in students.names
+        ]  # type: List[FrozenSet[int]]
+        self.pinned_groups = [
+            _to_indices(constraints.get_pinned_group(name))
+            for name in students.names
+        ]  # type: List[Optional[FrozenSet[int]]]
+        # Students with nobody they must be with can be swapped between
+        # groups on their own.
+        self.movable = [
+            len(partners) == 0 and pinned_group is None
+            for partners, pinned_group in zip(
+                self.partners, self.pinned_groups
+            )
+        ]  # type: List[bool]
+
+    def allows_join(self, open_group: Sequence[int], candidate: int) -> bool:
+        """Return if a student can join an incomplete group.
+
+        >>> index_constraints = IndexConstraints(
+        ...     Students('A', 'B', 'C', 'D'),
+        ...     Constraints(never_pairs=[Pair('A', 'B')],
+        ...                 pinned_groups=[Group('C', 'D')]))
+        >>> index_constraints.allows_join([0], 1)
+        False
+        >>> index_constraints.allows_join([0], 2)
+        False
+        >>> index_constraints.allows_join([2], 3)
+        True
+        """
+        apart = self.apart[candidate]
+        for member in open_group:
+            if member in apart:
+                return False
+        pinned_group = self.pinned_groups[candidate]
+        if pinned_group is not None:
+            for member in open_group:
+                if member not in pinned_group:
+                    return False
+        if len(open_group) > 0:
+            pinned_group = self.pinned_groups[open_group[0]]
+            if pinned_group is not None and candidate not in pinned_group:
+                return False
+        return True
+
+    def allows_close(self, group: Sequence[int]) -> bool:
+        """Return if a group can be complete, with everyone who must be with
+        its students in it.
+
+        >>> index_constraints = IndexConstraints(
+        ...     Students('A', 'B', 'C'),
+        ...     Constraints([Pair('A', 'B')], pinned_groups=[Group('C')]))
+        >>> index_constraints.allows_close([0])
+        False
+        >>> index_constraints.allows_close([0, 1])
+        True
+        """
+        members = frozenset(group)
+        for member in group:
+            if not self.partners[member] <= members:
+                return False
+            pinned_group = self.pinned_groups[member]
+            if pinned_group is not None and pinned_group != members:
+                return False
+        return True
+
+    def allows_index_groups(self, index_groups: Sequence[Sequence[int]]
+                            ) -> bool:
+        """Return if complete groups follow every constraint.
+
+        >>> IndexConstraints(
+        ...     Students('A', 'B', 'C'), Constraints([Pair('A', 'B')])
+        ... ).allows_index_groups([[0, 2], [1]])
+        False
+        """
+        for index_group in index_groups:
+            for position, member in enumerate(index_group):
+                if not self.allows_join(index_group[:position], member):
+                    return False
+            if not self.allows_close(index_group):
+                return False
+        return True
+
+    def allows_swap(
+            self, group_a: Sequence[int], position_a: int,
+            group_b: Sequence[int], position_b: int
+    ) -> bool:
+        """Return if the students at two positions in different complete
+        groups can swap groups.
+
+        Students who must be with someone never move.
+
+        >>> index_constraints = IndexConstraints(
+        ...     Students('A', 'B', 'C', 'D'),
+        ...     Constraints(never_pairs=[Pair('A', 'D')]))
+        >>> index_constraints.allows_swap([0, 1], 1, [2, 3], 0)
+        True
+        >>> index_constraints.allows_swap([0, 1], 1, [2, 3], 1)
+        False
+        """
+        student_a = group_a[position_a]
+        student_b = group_b[position_b]
+        if not self.movable[student_a] or not self.movable[student_b]:
+            return False
+        apart_a = self.apart[student_a]
+        apart_b = self.apart[student_b]
+        for member in group_a:
+            if member != student_a and member in apart_b:
+                return False
+        for member in group_b:
+            if member != student_b and member in apart_a:
+                return False
+        return True
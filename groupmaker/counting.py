@@ -1,9 +1,19 @@
 """Functions for creating counts of pairs."""
 from collections import Counter
 from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
 
+from .models import Group
+from .models import GroupConfig
 from .models import Pair
 from .models import PairCounts
+from .pairing import calc_pairs_in_group_config
+
+# Below this, stored counts are rescaled so they don't overflow.
+_MIN_SCALE = 1e-100
 
 
 def count_pairs(pairs: Iterable[Pair]) -> PairCounts:
@@ -15,3 +25,162 @@ def count_pairs(pairs: Iterable[Pair]) -> PairCounts:
     """
     counter = Counter(pairs)
     return PairCounts(*counter.items())
+
+
+def count_weighted_pairs(
+        weighted_group_configs: Iterable[Tuple[GroupConfig, float]]
+) -> PairCounts:
+    """Calculate a summary of pair counts from group configs where each pair
+    in a group config counts for that group config's weight.
+
+    >>> count_weighted_pairs([
+    ...     (GroupConfig(Group('A', 'B')), 0.5),
+    ...     (GroupConfig(Group('A'), Group('B')), 1.0)])
+    PairCounts((Pair('A', 'A'), 1.5), (Pair('A', 'B'), 0.5), (Pair('B', 'B'), 1.5))
+    """
+    counter = Counter()  # type: Counter
+    for group_config, weight in weighted_group_configs:
+        for pair in calc_pairs_in_group_config(group_config):
+            counter[pair] += weight
+    return PairCounts(*counter.items())
+
+
+def calc_decay_weights(ages: Iterable[float], half_life:
+                       float) -> List[float]:
+    """Return how much things of given ages count for if their weight halves
+    every half-life.
+
+    >>> calc_decay_weights([2, 1, 0], 1)
+    [0.25, 0.5, 1.0]
+    >>> calc_decay_weights([1], 0)
+    Traceback (most recent call last):
+        ...
+    ValueError: half-life must be greater than 0: 0
+    """
+    if half_life <= 0:
+        raise ValueError(
+            'half-life must be greater than 0: {}'.format(half_life)
+        )
+    return [0.5 ** (age / half_life) for age in ages]
+
+
+class DecayingPairCounts:
+    """Pair counts of group configs added in order, where each group config
+    counts for half as much every half-life after it was added.
+
+    Decay is kept as one scale factor over all counts, so adding a group
+    config only updates that group config's pairs. Without a half-life, counts
+    stay whole numbers.
+
+    Can be used anywhere pair counts are.
+    """
+
+    def __init__(self, half_life: Optional[float] = None) -> None:
+        """Make new empty decaying pair counts.
+
+        >>> decaying_pair_counts = DecayingPairCounts(1)
+        >>> decaying_pair_counts.add_group_config(GroupConfig(Group('A', 'B')))
+        >>> decaying_pair_counts.add_group_config(GroupConfig(Group('A', 'C')))
+        >>> decaying_pair_counts.get_count(Pair('A', 'B'))
+        0.5
+        >>> decaying_pair_counts.get_count(Pair('A', 'C'))
+        1.0
+        >>> DecayingPairCounts(-1)
+        Traceback (most recent call last):
+            ...
+        ValueError: half-life must be greater than 0: -1
+        """
+        self._decay = 1.0
+        if half_life is not None:
+            if half_life <= 0:
+                raise ValueError(
+                    'half-life must be greater than 0: {}'.format(half_life)
+                )
+            self._decay = 0.5 ** (1 / half_life)
+        self._scale = 1.0
+        self._counter = Counter()  # type: Counter
+
+    def add_pairs(
+            self,
+            pairs: Iterable[Pair],
+            weight: Union[int, float] = 1,
+            elapsed: float = 1
+    ) -> None:
+        """Decay all counts by however many half-lives have elapsed since the
+        last pairs were added, then count each pair for a weight.
+
+        >>> decaying_pair_counts = DecayingPairCounts(1)
+        >>> decaying_pair_counts.add_pairs([Pair('A', 'B')], elapsed=0)
+        >>> decaying_pair_counts.add_pairs([Pair('A', 'C')], elapsed=2)
+        >>> decaying_pair_counts.to_pair_counts()
+        PairCounts((Pair('A', 'B'), 0.25), (Pair('A', 'C'), 1.0))
+        >>> undecaying_pair_counts = DecayingPairCounts()
+        >>> undecaying_pair_counts.add_pairs([Pair('A', 'B')], 2)
+        >>> undecaying_pair_counts.to_pair_counts()
+        PairCounts((Pair('A', 'B'), 2))
+        """
+        if self._decay != 1.0 and elapsed != 0:
+            self._scale *= self._decay ** elapsed
+            if self._scale < _MIN_SCALE:
+                for pair in self._counter:
+                    self._counter[pair] *= self._scale
+                self._scale = 1.0
+        increment = weight
+        if self._scale != 1.0:
+            increment = weight / self._scale
+        for pair in pairs:
+            self._counter[pair] += increment
+
+    def add_group_config(
+            self,
+            group_config: GroupConfig,
+            weight: Union[int, float] = 1,
+            elapsed: float = 1
+    ) -> None:
+        """Decay all counts, then count the pairs in a group config."""
+        self.add_pairs(
+            calc_pairs_in_group_config(group_config), weight, elapsed
+        )
+
+    def add_pair_counts(
+            self, pair_counts: PairCounts, elapsed: float = 1
+    ) -> None:
+        """Decay all counts, then add each pair's count in other pair counts.
+
+        >>> decaying_pair_counts = DecayingPairCounts()
+        >>> decaying_pair_counts.add_pair_counts(
+        ...     PairCounts((Pair('A', 'B'), 2)), elapsed=0)
+        >>> decaying_pair_counts.add_pairs([Pair('A', 'B')])
+        >>> decaying_pair_counts.get_count(Pair('A', 'B'))
+        3
+        """
+        self.add_pairs([], elapsed=elapsed)
+        for pair, count in pair_counts.items():
+            self.add_pairs([pair], count, elapsed=0)
+
+    def __repr__(self) -> str:
+        """Return a description of decaying pair counts.
+
+        >>> DecayingPairCounts(1)
+        <DecayingPairCounts PairCounts()>
+        """
+        return '<DecayingPairCounts {!r}>'.format(self.to_pair_counts())
+
+    def items(self) -> Iterable[Tuple[Pair, Union[int, float]]]:
+        """Yield every pair with a count in sorted order."""
+        for pair, stored_count in sorted(self._counter.items()):
+            if self._scale == 1.0:
+                yield pair, stored_count
+            else:
+                yield pair, stored_count * self._scale
+
+    def get_count(self, pair: Pair) -> Union[int, float]:
+        """Return the current decayed count of a pair."""
+        stored_count = self._counter[pair]
+        if self._scale == 1.0:
+            return stored_count
+        return stored_count * self._scale
+
+    def to_pair_counts(self) -> PairCounts:
+        """Return the current decayed counts as pair counts."""
+        return PairCounts(*self.items())
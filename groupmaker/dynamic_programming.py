@@ -0,0 +1,233 @@
+"""Functions for finding the best groups by dynamic programming over subsets.
+
+The score of a group config is the sum of the scores of its groups, so the best
+way to group any set of students left over doesn't depend on how the other
+students were grouped. Sets of students are kept as bitmasks, the best groups
+of each set are remembered, and each group is only scored once. The lowest
+student left always anchors the next group, like when generating group
+configs.
+"""
+import time
+from collections import Counter
+from heapq import merge
+from itertools import combinations
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from .branch_and_bound import calc_double_lower_bounds
+from .constraints import IndexConstraints
+from .generation import calc_group_sizes
+from .generation import group_config_from_index_groups
+from .models import Constraints
+from .models import GroupConfig
+from .models import Pair
+from .models import PairCountMatrix
+from .models import PairCounts
+from .models import Students
+from .profiling import add_counts
+from .scoring import calc_index_cost_rows
+from .scoring import score_index_groups
+
+_DEADLINE_CHECK_INTERVAL = 1024
+_INF = float('inf')
+
+
+def _yield_partner_bits(other_bits: Sequence[int],
+                        sizes: Sequence[int]) -> Iterable[Tuple[int, ...]]:
+    """Yield the bits of every set of other students that fill a group of one
+    of the sizes along with the anchor, in the order the groups would be
+    generated.
+
+    >>> list(_yield_partner_bits([2, 4], [1, 2]))
+    [(), (2,), (4,)]
+    """
+    if len(sizes) == 1:
+        return combinations(other_bits, sizes[0] - 1)
+    return merge(
+        *(combinations(other_bits, size - 1) for size in sizes)
+    )
+
+
+def find_min_scoring_index_groups_dp(
+        cost_rows: List[List[int]],
+        group_sizes: Sequence[int],
+        deadline: Optional[float] = None,
+        on_improvement: Optional[Callable[[List[List[int]], int],
+                                          None]] = None,
+        index_constraints: Optional[IndexConstraints] = None
+) -> Tuple[Optional[List[List[int]]], float, bool]:
+    """Return the minimum-scoring groups of student indices of the given sizes,
+    their score, and if the search finished.
+
+    Ties go to whichever groups would be generated first. If the
+    `time.monotonic` deadline passes, the rest of the search only takes the
+    first groups that work, so some groups are still returned. Groups are
+    only known once the search ends, so they are passed to `on_improvement`
+    just once.
+
+    With index constraints, groups that break them are never used. If no
+    groups follow the constraints, None and an infinite score are returned.
+
+    >>> find_min_scoring_index_groups_dp(
+    ...     [[0, 1, 0, 1], [1, 0, 1, 0], [0, 1, 0, 1], [1, 0, 1, 0]], [2, 2])
+    ([[0, 2], [1, 3]], 0, True)
+    >>> find_min_scoring_index_groups_dp(
+    ...     [[0, 1, 0, 1], [1, 0, 1, 0], [0, 1, 0, 1], [1, 0, 1, 0]], [2, 2],
+    ...     deadline=0.0)
+    ([[0, 1], [2, 3]], 2, False)
+    >>> find_min_scoring_index_groups_dp(
+    ...     [[0, 1, 0, 1], [1, 0, 1, 0], [0, 1, 0, 1], [1, 0, 1, 0]], [2, 2],
+    ...     index_constraints=IndexConstraints(
+    ...         Students('A', 'B', 'C', 'D'),
+    ...         Constraints(never_pairs=[Pair('A', 'C')])))
+    ([[0, 1], [2, 3]], 2, True)
+    >>> find_min_scoring_index_groups_dp(
+    ...     [[0, 0], [0, 0]], [2],
+    ...     index_constraints=IndexConstraints(
+    ...         Students('A', 'B'), Constraints(never_pairs=[Pair('A', 'B')])))
+    (None, inf, True)
+    """
+    student_count = len(cost_rows)
+    full_mask = (1 << student_count) - 1
+    size_counts = Counter(group_sizes)
+    sizes = sorted(size_counts)
+    # A state is the bitmask of students left, plus above it the count of each
+    # group size left as digits, so taking a group away is a subtraction.
+    size_steps = {
+        size: (student_count + 1)**position << student_count
+        for position, size in enumerate(sizes)
+    }
+    double_lower_bounds = calc_double_lower_bounds(
+        cost_rows, min(group_sizes, default=1)
+    )
+    # The score of each group by bitmask, or infinity if it breaks a
+    # constraint, and twice its score less twice the least score its students
+    # could add.
+    group_entries = {}  # type: Dict[int, Tuple[float, float]]
+    # The best score of the students and group sizes left in a state, and the
+    # bitmask of the first of the best groups.
+    best_entries = {}  # type: Dict[int, Tuple[float, int]]
+    state_count = 0
+    timed_out = False
+
+    def _make_group_entry(group_mask: int) -> Tuple[float, float]:
+        index_group = [
+            index for index in range(student_count) if group_mask >> index & 1
+        ]
+        if index_constraints is not None and \
+                not index_constraints.allows_index_groups([index_group]):
+            return _INF, _INF
+        group_score = score_index_groups(cost_rows, [index_group])
+        return group_score, 2 * group_score - sum(
+            double_lower_bounds[index] for index in index_group
+        )
+
+    def _search(state: int) -> float:
+        nonlocal state_count, timed_out
+        state_count += 1
+        if (deadline is not None and
+                state_count % _DEADLINE_CHECK_INTERVAL == 1 and
+                time.monotonic() >= deadline):
+            timed_out = True
+
+        mask = state & full_mask
+        anchor_bit = mask & -mask
+        other_bits = [
+            1 << index
+            for index in range(anchor_bit.bit_length(), student_count)
+            if mask >> index & 1
+        ]
+        double_bound = sum(
+            double_lower_bounds[index] for index in range(student_count)
+            if mask >> index & 1
+        )
+        left_sizes = [
+            size for size in sizes
+            if state // size_steps[size] % (student_count + 1) > 0
+        ]
+        best_score = _INF
+        best_group_mask = 0
+        # Groups are tried in the order they would be generated, so the
+        # first of any tied groups is kept.
+        for partner_bits in _yield_partner_bits(other_bits, left_sizes):
+            group_mask = anchor_bit + sum(partner_bits)
+            group_entry = group_entries.get(group_mask)
+            if group_entry is None:
+                group_entry = _make_group_entry(group_mask)
+                group_entries[group_mask] = group_entry
+            group_score, group_double_bound = group_entry
+            # Groups that can't beat the best so far, even if the students
+            # left scored as little as they possibly could, are skipped.
+            if group_double_bound + double_bound >= 2 * best_score:
+                continue
+            next_state = (
+                state - group_mask - size_steps[len(partner_bits) + 1]
+            )
+            if next_state & full_mask == 0:
+                score = group_score
+            elif next_state in best_entries:
+                score = group_score + best_entries[next_state][0]
+            else:
+                score = group_score + _search(next_state)
+            if score < best_score:
+                best_score, best_group_mask = score, group_mask
+                if timed_out:
+                    break
+        best_entries[state] = (best_score, best_group_mask)
+        return best_score
+
+    state = full_mask + sum(
+        count * size_steps[size] for size, count in size_counts.items()
+    )
+    best_score = 0  # type: float
+    if student_count > 0:
+        best_score = _search(state)
+    add_counts(
+        dynamic_programming_states=state_count,
+        groups_scored=len(group_entries)
+    )
+    if best_score == _INF:
+        return None, _INF, not timed_out
+
+    index_groups = []
+    while state & full_mask != 0:
+        _, group_mask = best_entries[state]
+        index_group = [
+            index for index in range(student_count) if group_mask >> index & 1
+        ]
+        index_groups.append(index_group)
+        state -= group_mask + size_steps[len(index_group)]
+    if on_improvement is not None:
+        on_improvement(index_groups, best_score)
+    return index_groups, best_score, not timed_out
+
+
+def solve_for_min_scoring_groups_dp(
+        students: Students, group_size: int, historical_pair_counts: PairCounts
+) -> GroupConfig:
+    """Figure out what is the minimum-scoring group config out of all possible
+    group configs creatable from a list of students, solving for each set of
+    students left over only once.
+
+    Returns the same group config as `solve_for_min_scoring_groups`, or with
+    groups of two, one that ties with it.
+
+    >>> solve_for_min_scoring_groups_dp(
+    ...     Students('A', 'B', 'C'),
+    ...     2,
+    ...     PairCounts((Pair('A', 'B'), 1), (Pair('B', 'C'), 1)))
+    GroupConfig(Group('A', 'C'), Group('B'))
+    """
+    cost_rows = calc_index_cost_rows(
+        PairCountMatrix.from_pair_counts(students, historical_pair_counts)
+    )
+    group_sizes = calc_group_sizes(len(students.names), group_size)
+    index_groups, _, _ = find_min_scoring_index_groups_dp(
+        cost_rows, group_sizes
+    )
+    return group_config_from_index_groups(students, index_groups)
@@ -4,14 +4,26 @@ A student file contains one student name on each line.
 
 A groups file contains a student name on each line with a blank line
 between groups.
+
+A constraints file contains one rule on each line: `must:`, `never:` or `pin:`
+followed by comma-separated student names. Every pair of names in a must rule
+are in the same group, every pair of names in a never rule are in different
+groups, and the names in a pin rule are one of the groups exactly. Blank lines
+and lines starting with `#` are ignored.
 """
 from itertools import chain
+from itertools import combinations
 from typing import Iterable
+from typing import List
 
+from .models import Constraints
 from .models import Group
 from .models import GroupConfig
+from .models import Pair
 from .models import Students
 
+_CONSTRAINT_KINDS = ('must', 'never', 'pin')
+
 
 def read_students(students_file: Iterable) -> Students:
     r"""Read student file and return a sorted list of the students.
@@ -76,3 +88,60 @@ def write_group_config(group_config: GroupConfig, file=None) -> None:
         ),
         file=file
     )
+
+
+def read_constraints(constraints_file: Iterable[str]) -> Constraints:
+    r"""Read a constraints file.
+
+    >>> read_constraints([
+    ...     '# Lab partners\n', 'must: A, B, C\n', '\n', 'never: A, D\n',
+    ...     'pin: E, F\n'])
+    ... # doctest: +NORMALIZE_WHITESPACE
+    Constraints((Pair('A', 'B'), Pair('A', 'C'), Pair('B', 'C')),
+                (Pair('A', 'D'),),
+                (Group('E', 'F'),))
+    >>> read_constraints(['always: A, B\n'])
+    Traceback (most recent call last):
+        ...
+    ValueError: line 1: unknown constraint: 'always'
+    >>> read_constraints(['pin: A\n', 'never: B\n'])
+    Traceback (most recent call last):
+        ...
+    ValueError: line 2: never needs at least two names
+    """
+    must_pairs = []  # type: List[Pair]
+    never_pairs = []  # type: List[Pair]
+    pinned_groups = []  # type: List[Group]
+    for line_number, line in enumerate(constraints_file, start=1):
+        line = line.strip()
+        if line == '' or line.startswith('#'):
+            continue
+        kind, separator, names = line.partition(':')
+        kind = kind.strip()
+        if separator == '':
+            raise ValueError(
+                'line {}: expected a constraint like must: A, B'.format(
+                    line_number
+                )
+            )
+        if kind not in _CONSTRAINT_KINDS:
+            raise ValueError(
+                'line {}: unknown constraint: {!r}'.format(line_number, kind)
+            )
+        names = [name.strip() for name in names.split(',')]
+        if '' in names:
+            raise ValueError('line {}: empty name'.format(line_number))
+        if kind == 'pin':
+            pinned_groups.append(Group(*names))
+            continue
+        if len(names) < 2:
+            raise ValueError(
+                'line {}: {} needs at least two names'.format(
+                    line_number, kind
+                )
+            )
+        pairs = must_pairs if kind == 'must' else never_pairs
+        pairs.extend(
+            Pair(name_a, name_b) for name_a, name_b in combinations(names, 2)
+        )
+    return Constraints(must_pairs, never_pairs, pinned_groups)
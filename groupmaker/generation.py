@@ -1,14 +1,24 @@
 """Functions for generating group configs from students."""
-from itertools import permutations, zip_longest
+from collections import Counter
+from heapq import merge
+from itertools import combinations, zip_longest
 from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
 from typing import TypeVar
 
+from .models import Constraints
 from .models import Group
 from .models import GroupConfig
+from .models import Pair
 from .models import Students
 
 T = TypeVar('T')
 
+SIZE_POLICY_NAMES = ('chunk', 'balanced')
+
 
 def _is_not_none(x) -> bool:
     """Return if a value is not None.
@@ -44,30 +54,254 @@ def _chunk(iterable: Iterable[T], size: int) -> Iterable[Iterable[T]]:
 
 def _groups_from_ordering(ordering: Iterable[str], group_size:
                           int) -> Iterable[Group]:
-    """Yield groups from an ordering of students by chunking every group size.
+    """Yield groups from an ordering of unique students by chunking every
+    group size.
 
     >>> list(_groups_from_ordering(['A', 'B', 'C'], 2))
     [Group('A', 'B'), Group('C')]
     """
-    return (Group(*names) for names in _chunk(ordering, group_size))
+    return (
+        Group.from_sorted_names(tuple(sorted(names)))
+        for names in _chunk(ordering, group_size)
+    )
+
+
+def calc_group_sizes(
+        student_count: int,
+        group_size: int,
+        size_policy: str = 'chunk',
+        min_group_size: int = 1
+) -> Tuple[int, ...]:
+    """Return the sizes of groups of at most a group size for a number of
+    students, largest first.
+
+    The chunk size policy makes groups of the group size and one smaller
+    group with the rest, like chunking every ordering of students would. The
+    balanced size policy makes as few groups but with sizes at most one
+    apart.
+
+    Groups smaller than the minimum group size are filled with students from
+    the largest groups, as long as those keep the minimum. If the groups
+    still can't all have the minimum, ValueError is raised.
+
+    >>> calc_group_sizes(7, 3)
+    (3, 3, 1)
+    >>> calc_group_sizes(6, 3)
+    (3, 3)
+    >>> calc_group_sizes(0, 3)
+    ()
+    >>> calc_group_sizes(13, 4, 'balanced')
+    (4, 3, 3, 3)
+    >>> calc_group_sizes(13, 4, min_group_size=2)
+    (4, 4, 3, 2)
+    >>> calc_group_sizes(5, 4, min_group_size=3)
+    Traceback (most recent call last):
+        ...
+    ValueError: can't make groups of 3 to 4 students out of 5 students
+    >>> calc_group_sizes(3, 0)
+    Traceback (most recent call last):
+        ...
+    ValueError: group size must be positive: 0
+    """
+    if group_size < 1:
+        raise ValueError(
+            'group size must be positive: {!r}'.format(group_size)
+        )
+    if size_policy not in SIZE_POLICY_NAMES:
+        raise ValueError('unknown size policy: {!r}'.format(size_policy))
+    if size_policy == 'balanced':
+        group_count = -(-student_count // group_size)
+        small_size, large_count = divmod(student_count, max(group_count, 1))
+        group_sizes = ((small_size + 1, ) * large_count +
+                       (small_size, ) * (group_count - large_count))
+    else:
+        full_group_count, remainder = divmod(student_count, group_size)
+        group_sizes = (group_size, ) * full_group_count
+        if remainder > 0:
+            group_sizes += (remainder, )
+    sizes = list(group_sizes)
+    while len(sizes) > 0 and sizes[-1] < min_group_size:
+        if sizes[0] <= min_group_size:
+            raise ValueError(
+                "can't make groups of {} to {} students out of {} "
+                'students'.format(min_group_size, group_size, student_count)
+            )
+        sizes[0] -= 1
+        sizes[-1] += 1
+        sizes.sort(reverse=True)
+    return tuple(sizes)
+
+
+def resolve_group_sizes(
+        student_count: int,
+        group_size: int,
+        group_sizes: Optional[Sequence[int]] = None
+) -> Tuple[int, ...]:
+    """Return given group sizes for a number of students largest first, or if
+    there are none, the sizes chunking every group size makes.
+
+    >>> resolve_group_sizes(7, 3)
+    (3, 3, 1)
+    >>> resolve_group_sizes(7, 3, [2, 3, 2])
+    (3, 2, 2)
+    >>> resolve_group_sizes(7, 3, [3, 3])
+    Traceback (most recent call last):
+        ...
+    ValueError: group sizes (3, 3) don't add up to 7 students
+    >>> resolve_group_sizes(2, 3, [2, 0])
+    Traceback (most recent call last):
+        ...
+    ValueError: group sizes must be positive: (2, 0)
+    """
+    if group_sizes is None:
+        return calc_group_sizes(student_count, group_size)
+    group_sizes = tuple(sorted(group_sizes, reverse=True))
+    if min(group_sizes, default=1) < 1:
+        raise ValueError(
+            'group sizes must be positive: {!r}'.format(group_sizes)
+        )
+    if sum(group_sizes) != student_count:
+        raise ValueError(
+            "group sizes {!r} don't add up to {} students".format(
+                group_sizes, student_count
+            )
+        )
+    return group_sizes
+
+
+def chunk_index_groups(group_sizes: Sequence[int]) -> List[List[int]]:
+    """Return groups of consecutive student indices of the given sizes.
+
+    >>> chunk_index_groups([3, 3, 1])
+    [[0, 1, 2], [3, 4, 5], [6]]
+    """
+    index_groups = []
+    start = 0
+    for group_size in group_sizes:
+        index_groups.append(list(range(start, start + group_size)))
+        start += group_size
+    return index_groups
+
+
+def _remove_names(names: Tuple[str, ...],
+                  removed_names: Iterable[str]) -> Tuple[str, ...]:
+    """Return names in order without any of the removed names.
+
+    >>> _remove_names(('A', 'B', 'C', 'D'), ('B', 'D'))
+    ('A', 'C')
+    """
+    removed_names = frozenset(removed_names)
+    return tuple(name for name in names if name not in removed_names)
 
 
-def generate_all_group_configs(students: Students, group_size:
-                               int) -> Iterable[GroupConfig]:
+def _yield_anchored_groups(names: Tuple[str, ...], group_sizes:
+                           Counter) -> Iterable[Tuple[str, ...]]:
+    """Yield every group of one of the remaining sizes that contains the first
+    name, in sorted order.
+
+    >>> list(_yield_anchored_groups(('A', 'B', 'C'), Counter([2, 1])))
+    [('A',), ('A', 'B'), ('A', 'C')]
+    """
+    anchor, other_names = names[0], names[1:]
+    return merge(
+        *(
+            ((anchor, ) + partners
+             for partners in combinations(other_names, size - 1))
+            for size in sorted(group_sizes) if group_sizes[size] > 0
+        )
+    )
+
+
+def _yield_partitions(
+        names: Tuple[str, ...],
+        group_sizes: Counter,
+        constraints: Optional[Constraints] = None
+) -> Iterable[Tuple[Tuple[str, ...], ...]]:
+    """Yield every way to partition sorted names into groups of the remaining
+    sizes exactly once, in sorted order.
+
+    The lowest unassigned name always anchors the next group, so no partition
+    is ever produced twice. With constraints, groups that break them are
+    skipped along with every partition that would contain them.
+
+    >>> list(_yield_partitions(('A', 'B', 'C'), Counter([2, 1])))
+    [(('A',), ('B', 'C')), (('A', 'B'), ('C',)), (('A', 'C'), ('B',))]
+    >>> list(_yield_partitions(
+    ...     ('A', 'B', 'C'), Counter([2, 1]), Constraints([Pair('A', 'B')])))
+    [(('A', 'B'), ('C',))]
+    """
+    if len(names) == 0:
+        yield ()
+        return
+    for group in _yield_anchored_groups(names, group_sizes):
+        if constraints is not None and not constraints.allows_group(group):
+            continue
+        group_sizes[len(group)] -= 1
+        remaining_names = _remove_names(names, group)
+        for partition in _yield_partitions(
+                remaining_names, group_sizes, constraints):
+            yield (group, ) + partition
+        group_sizes[len(group)] += 1
+
+
+def group_config_from_index_groups(
+        students: Students, index_groups: Iterable[Iterable[int]]
+) -> GroupConfig:
+    """Make a group config out of groups of student indices.
+
+    >>> group_config_from_index_groups(Students('A', 'B', 'C'), [[2, 0], [1]])
+    GroupConfig(Group('A', 'C'), Group('B'))
+    """
+    names = students.names
+    return GroupConfig.from_sorted_groups(
+        tuple(
+            sorted(
+                Group.from_sorted_names(
+                    tuple(names[index] for index in sorted(index_group))
+                ) for index_group in index_groups
+            )
+        )
+    )
+
+
+def generate_all_group_configs(
+        students: Students,
+        group_size: int,
+        constraints: Optional[Constraints] = None,
+        group_sizes: Optional[Sequence[int]] = None
+) -> Iterable[GroupConfig]:
     """Yield all possible unique groups of a given size from all students.
 
-    Generates every unique ordering of students, then chunks each into groups.
-    Very permutive.
+    Group configs are yielded lazily in sorted order, with the same group sizes
+    chunking every ordering of students would give, or the given group sizes.
+    With constraints, only group configs that follow them are yielded.
+
+    Groups of the same size are never told apart, so each group config is
+    yielded once however many groups share a size.
 
     >>> list(generate_all_group_configs(Students('A', 'B', 'C'), 2))
     ... # doctest: +NORMALIZE_WHITESPACE
     [GroupConfig(Group('A'),      Group('B', 'C')),
      GroupConfig(Group('A', 'B'), Group('C')),
      GroupConfig(Group('A', 'C'), Group('B'))]
+    >>> list(generate_all_group_configs(Students(), 2))
+    [GroupConfig()]
+    >>> len(list(generate_all_group_configs(
+    ...     Students('A', 'B', 'C', 'D', 'E'), 2, group_sizes=[3, 2])))
+    10
+    >>> list(generate_all_group_configs(
+    ...     Students('A', 'B', 'C'), 2,
+    ...     Constraints(never_pairs=[Pair('A', 'B')])))
+    ... # doctest: +NORMALIZE_WHITESPACE
+    [GroupConfig(Group('A'),      Group('B', 'C')),
+     GroupConfig(Group('A', 'C'), Group('B'))]
     """
-    return sorted(
-        frozenset(
-            GroupConfig(*_groups_from_ordering(ordering, group_size))
-            for ordering in permutations(students.names)
-        )
+    size_counts = Counter(
+        resolve_group_sizes(len(students.names), group_size, group_sizes)
     )
+    # Partitions are already in sorted order, with every group sorted.
+    for partition in _yield_partitions(
+            students.names, size_counts, constraints):
+        yield GroupConfig.from_sorted_groups(
+            tuple(map(Group.from_sorted_names, partition))
+        )
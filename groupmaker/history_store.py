@@ -0,0 +1,214 @@
+"""Functions for caching historical pair counts in a history store.
+
+A history store is an SQLite file holding the pair counts of every group file
+it has read, keyed by path, along with their sum. Group files are only read
+again when their modification time, size and content hash change, so loading
+pair counts for a long history costs one query.
+"""
+import hashlib
+import os
+import sqlite3
+from collections import Counter
+from typing import Iterable
+from typing import Optional
+from typing import Tuple
+
+from .counting import count_pairs
+from .file_io import read_group_config
+from .models import Pair
+from .models import PairCounts
+from .pairing import calc_pairs_in_group_config
+
+_SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE file_pair_counts (
+    path TEXT NOT NULL REFERENCES files (path),
+    name_a TEXT NOT NULL,
+    name_b TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (path, name_a, name_b)
+);
+CREATE TABLE pair_counts (
+    name_a TEXT NOT NULL,
+    name_b TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (name_a, name_b)
+);
+"""
+
+
+def _hash_file(path: str) -> str:
+    """Return the hex SHA-256 hash of a file's contents."""
+    file_hash = hashlib.sha256()
+    with open(path, 'rb') as hashed_file:
+        for block in iter(lambda: hashed_file.read(1 << 16), b''):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+def _connect(history_store_path: str) -> sqlite3.Connection:
+    """Open a history store, creating or rebuilding it if it does not have
+    the current schema.
+    """
+    connection = sqlite3.connect(history_store_path)
+    (schema_version, ) = connection.execute('PRAGMA user_version').fetchone()
+    if schema_version != _SCHEMA_VERSION:
+        with connection:
+            for table in ('file_pair_counts', 'files', 'pair_counts'):
+                connection.execute('DROP TABLE IF EXISTS {}'.format(table))
+        connection.executescript(_SCHEMA)
+        connection.execute('PRAGMA user_version = {}'.format(_SCHEMA_VERSION))
+    return connection
+
+
+def _add_pair_counts(
+        connection: sqlite3.Connection, path: str, sign: int
+) -> None:
+    """Add or subtract one file's pair counts to the summed pair counts."""
+    connection.execute(
+        """
+        INSERT OR IGNORE INTO pair_counts (name_a, name_b, count)
+        SELECT name_a, name_b, 0 FROM file_pair_counts WHERE path = ?
+        """, (path, )
+    )
+    connection.execute(
+        """
+        UPDATE pair_counts SET count = count + ? * (
+            SELECT count FROM file_pair_counts
+            WHERE path = ? AND file_pair_counts.name_a = pair_counts.name_a
+                AND file_pair_counts.name_b = pair_counts.name_b
+        )
+        WHERE EXISTS (
+            SELECT 1 FROM file_pair_counts
+            WHERE path = ? AND file_pair_counts.name_a = pair_counts.name_a
+                AND file_pair_counts.name_b = pair_counts.name_b
+        )
+        """, (sign, path, path)
+    )
+    connection.execute('DELETE FROM pair_counts WHERE count = 0')
+
+
+def _forget_file(connection: sqlite3.Connection, path: str) -> None:
+    """Remove everything a history store knows about a file."""
+    _add_pair_counts(connection, path, -1)
+    connection.execute('DELETE FROM file_pair_counts WHERE path = ?', (path, ))
+    connection.execute('DELETE FROM files WHERE path = ?', (path, ))
+
+
+def _ingest_file(
+        connection: sqlite3.Connection, path: str, mtime_ns: int, size: int,
+        sha256: str
+) -> None:
+    """Read a group file and add its pair counts to a history store."""
+    with open(path) as group_config_file:
+        group_config = read_group_config(group_config_file)
+    pair_counts = count_pairs(calc_pairs_in_group_config(group_config))
+    connection.execute(
+        'INSERT INTO files (path, mtime_ns, size, sha256) VALUES (?, ?, ?, ?)',
+        (path, mtime_ns, size, sha256)
+    )
+    connection.executemany(
+        """
+        INSERT INTO file_pair_counts (path, name_a, name_b, count)
+        VALUES (?, ?, ?, ?)
+        """, (
+            (path, pair.names[0], pair.names[1], count)
+            for pair, count in pair_counts.items()
+        )
+    )
+    _add_pair_counts(connection, path, 1)
+
+
+def _update_file(connection: sqlite3.Connection, path: str) -> None:
+    """Make sure a history store has the current pair counts of a file."""
+    stat = os.stat(path)
+    stored = connection.execute(
+        'SELECT mtime_ns, size, sha256 FROM files WHERE path = ?', (path, )
+    ).fetchone()  # type: Optional[Tuple[int, int, str]]
+    if stored is not None and stored[:2] == (stat.st_mtime_ns, stat.st_size):
+        return
+    sha256 = _hash_file(path)
+    if stored is not None and stored[2] == sha256:
+        connection.execute(
+            'UPDATE files SET mtime_ns = ?, size = ? WHERE path = ?',
+            (stat.st_mtime_ns, stat.st_size, path)
+        )
+        return
+    if stored is not None:
+        _forget_file(connection, path)
+    _ingest_file(connection, path, stat.st_mtime_ns, stat.st_size, sha256)
+
+
+def read_history_store_pair_counts(
+        history_store_path: str, group_config_file_paths: Iterable[str]
+) -> PairCounts:
+    """Return the pair counts of all historical group configs in a list of
+    group config file paths, reading only files a history store does not
+    already have current pair counts for.
+
+    The history store is updated to hold exactly those files. A file listed
+    more than once counts once for each time, as it does without a history
+    store.
+
+    >>> import tempfile
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     store_path = os.path.join(directory, 'history.sqlite')
+    ...     group_path = os.path.join(directory, 'groups.txt')
+    ...     with open(group_path, 'w') as group_file:
+    ...         _ = group_file.write('A\\nB\\n\\nC\\n')
+    ...     print(read_history_store_pair_counts(store_path, [group_path]))
+    ...     with open(group_path, 'w') as group_file:
+    ...         _ = group_file.write('A\\nC\\n')
+    ...     print(read_history_store_pair_counts(store_path, [group_path]))
+    ...     print(read_history_store_pair_counts(store_path, []))
+    ...     print(read_history_store_pair_counts(
+    ...         store_path, [group_path, group_path]))
+    ... # doctest: +NORMALIZE_WHITESPACE
+    PairCounts((Pair('A', 'A'), 1), (Pair('A', 'B'), 1), (Pair('B', 'B'), 1),
+               (Pair('C', 'C'), 1))
+    PairCounts((Pair('A', 'A'), 1), (Pair('A', 'C'), 1), (Pair('C', 'C'), 1))
+    PairCounts()
+    PairCounts((Pair('A', 'A'), 2), (Pair('A', 'C'), 2), (Pair('C', 'C'), 2))
+    """
+    path_counts = Counter(
+        os.path.abspath(path) for path in group_config_file_paths
+    )
+    paths = frozenset(path_counts)
+    connection = _connect(history_store_path)
+    try:
+        with connection:
+            stored_paths = frozenset(
+                path for (path, ) in connection.execute('SELECT path FROM files')
+            )
+            for path in sorted(stored_paths - paths):
+                _forget_file(connection, path)
+            for path in sorted(paths):
+                _update_file(connection, path)
+        pair_counts = Counter(
+            {
+                Pair(name_a, name_b): count
+                for name_a, name_b, count in connection.execute(
+                    'SELECT name_a, name_b, count FROM pair_counts'
+                )
+            }
+        )
+        # The store holds each file once, so repeats are added on top.
+        for path, path_count in sorted(path_counts.items()):
+            if path_count == 1:
+                continue
+            for name_a, name_b, count in connection.execute(
+                    """
+                    SELECT name_a, name_b, count FROM file_pair_counts
+                    WHERE path = ?
+                    """, (path, )):
+                pair_counts[Pair(name_a, name_b)] += (path_count - 1) * count
+        return PairCounts(*pair_counts.items())
+    finally:
+        connection.close()
@@ -0,0 +1,157 @@
+"""Functions for counting pairs in large numbers of group files.
+
+Group files are found by directory or glob pattern and read on a pool of
+threads. Each file's pairs are counted straight from its lines without making
+any group configs, and added to a running count as soon as the file is done,
+so memory only grows with the number of distinct pairs, not with the number of
+files. A bad file is reported with the file and line that's wrong.
+"""
+import glob
+import os
+import sys
+from collections import Counter
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, combinations_with_replacement
+from typing import Callable
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from .models import Pair
+from .models import PairCounts
+
+DEFAULT_READ_THREADS = 4
+
+
+def expand_group_file_paths(patterns: Iterable[str]) -> List[str]:
+    """Return the group file paths in directories or matching glob patterns,
+    each once, in sorted order.
+
+    Hidden files in directories are skipped. A pattern that matches nothing
+    is kept as a path, so reading it reports that it is missing. Paths to the
+    same file are only kept once.
+
+    >>> expand_group_file_paths(['missing-*.txt', 'missing.txt'])
+    ['missing-*.txt', 'missing.txt']
+    >>> expand_group_file_paths(['missing.txt', './missing.txt'])
+    ['./missing.txt']
+    """
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths.update(
+                os.path.join(pattern, name) for name in os.listdir(pattern)
+                if not name.startswith('.') and
+                os.path.isfile(os.path.join(pattern, name))
+            )
+            continue
+        matching_paths = glob.glob(pattern)
+        if len(matching_paths) == 0:
+            matching_paths = [pattern]
+        paths.update(matching_paths)
+    return sorted({os.path.abspath(path): path
+                   for path in sorted(paths, reverse=True)}.values())
+
+
+def count_group_file_pairs(group_file: Iterable[str], path: str = '-'
+                           ) -> Counter:
+    r"""Count every pair of names in a group file, keyed by tuples of sorted
+    names.
+
+    Like `read_group_config`, a name repeated in its own group counts once.
+    Raises ValueError with the path and line of the first name already seen
+    in another group of the file.
+
+    >>> sorted(count_group_file_pairs(['B\n', 'A\n', '\n', 'C\n']).items())
+    [(('A', 'A'), 1), (('A', 'B'), 1), (('B', 'B'), 1), (('C', 'C'), 1)]
+    >>> sorted(count_group_file_pairs(['A\n', 'B\n', 'A\n']).items())
+    [(('A', 'A'), 1), (('A', 'B'), 1), (('B', 'B'), 1)]
+    >>> count_group_file_pairs(['A\n', '\n', 'B\n', 'A\n'], 'g.txt')
+    Traceback (most recent call last):
+        ...
+    ValueError: g.txt:4: duplicate name across groups: 'A'
+    """
+    counter = Counter()  # type: Counter
+    seen_names = set()
+    group_names = []  # type: List[str]
+    for line_number, line in enumerate(chain(group_file, ['']), start=1):
+        name = line.strip()
+        if name != '':
+            if name in seen_names:
+                if name in group_names:
+                    continue
+                raise ValueError(
+                    '{}:{}: duplicate name across groups: {!r}'.format(
+                        path, line_number, name
+                    )
+                )
+            seen_names.add(name)
+            group_names.append(sys.intern(name))
+        elif len(group_names) > 0:
+            group_names.sort()
+            counter.update(combinations_with_replacement(group_names, 2))
+            group_names = []
+    return counter
+
+
+def _count_path_pairs(path: str) -> Tuple[Optional[Counter], Optional[str]]:
+    """Count the pairs in a group file, returning the counts or what went
+    wrong.
+    """
+    try:
+        with open(path) as group_file:
+            return count_group_file_pairs(group_file, path), None
+    except UnicodeDecodeError as error:
+        return None, '{}: {}'.format(path, error)
+    except ValueError as error:
+        return None, str(error)
+    except OSError as error:
+        return None, '{}: {}'.format(path, error.strerror)
+
+
+def count_pairs_in_group_files(
+        paths: Iterable[str],
+        threads: int = DEFAULT_READ_THREADS,
+        on_error: Optional[Callable[[str], None]] = None
+) -> PairCounts:
+    """Count the pairs in every group file, reading them on a pool of
+    threads.
+
+    Each bad file is passed to `on_error` as a message starting with its path
+    and skipped. Without `on_error`, the first bad file raises ValueError.
+
+    >>> messages = []
+    >>> count_pairs_in_group_files(['missing.txt'], on_error=messages.append)
+    PairCounts()
+    >>> messages
+    ['missing.txt: No such file or directory']
+    """
+    total_counter = Counter()  # type: Counter
+
+    def _add_result(future: Future) -> None:
+        counter, error = future.result()
+        if error is None:
+            total_counter.update(counter)
+        elif on_error is None:
+            raise ValueError(error)
+        else:
+            on_error(error)
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        # Only a few files are read ahead, so finished counts never pile up.
+        pending = deque()  # type: deque
+        for path in paths:
+            if len(pending) >= threads * 2:
+                _add_result(pending.popleft())
+            pending.append(executor.submit(_count_path_pairs, path))
+        while len(pending) > 0:
+            _add_result(pending.popleft())
+    return PairCounts(
+        *(
+            (Pair.from_sorted_names(name_a, name_b), count)
+            for (name_a, name_b), count in total_counter.items()
+        )
+    )
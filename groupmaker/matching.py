@@ -0,0 +1,587 @@
+"""Functions for finding the best pairs of students by weighted matching.
+
+With groups of two, a group config is a perfect matching of the students, so
+the best one is found in polynomial time by Edmonds' blossom algorithm instead
+of a search. Students left on their own are matched with stand-in students
+that cost nothing to be paired with.
+
+Most students only ever end up with one of their cheapest partners, so pairs
+are first matched using only those. The matching's dual solution then proves
+whether any left out pair could do better, and if so, those pairs are added
+and the students matched again.
+"""
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from .constraints import IndexConstraints
+from .generation import calc_group_sizes
+from .generation import group_config_from_index_groups
+from .models import Constraints
+from .models import GroupConfig
+from .models import Pair
+from .models import PairCountMatrix
+from .models import PairCounts
+from .models import Students
+from .profiling import add_counts
+from .scoring import calc_index_cost_rows
+
+# Each student is first matched using only this many of its cheapest partners.
+DEFAULT_CANDIDATE_PARTNER_COUNT = 8
+
+
+def _match_max_weight(
+        vertex_count: int, edges: Sequence[Tuple[int, int, float]]
+) -> Tuple[List[int], List[float], List[int]]:
+    """Return a maximum-weight matching of a graph as the vertex each vertex
+    is matched with or -1, along with the dual values of the vertices and
+    then the blossoms, and the parent blossom of each vertex and blossom or
+    -1.
+
+    Edges are pairs of different vertices and their weight. Dual values are
+    doubled, so with integer weights they stay integers.
+
+    >>> _match_max_weight(4, [(0, 1, 2), (1, 2, 3), (2, 3, 2)])[0]
+    [1, 0, 3, 2]
+    >>> _match_max_weight(
+    ...     6, [(0, 1, 9), (1, 2, 9), (0, 2, 10), (2, 3, 1), (3, 4, 9),
+    ...         (4, 5, 9), (3, 5, 10)])[0]
+    [2, -1, 0, 5, -1, 3]
+    """
+    is_integer = all(isinstance(weight, int) for _, _, weight in edges)
+    # Endpoint 2k is the first vertex of edge k and 2k + 1 the second, so
+    # flipping the lowest bit gives the other end.
+    endpoints = [vertex for i, j, _ in edges for vertex in (i, j)]
+    neighbour_endpoints = [
+        [] for _ in range(vertex_count)
+    ]  # type: List[List[int]]
+    for k, (i, j, _) in enumerate(edges):
+        neighbour_endpoints[i].append(2 * k + 1)
+        neighbour_endpoints[j].append(2 * k)
+    max_weight = max([0] + [weight for _, _, weight in edges])
+
+    # Vertices are numbered below the vertex count and blossoms above it.
+    blossom_count = 2 * vertex_count
+    mates = [-1] * vertex_count  # endpoint each vertex is matched through
+    # 1 for S, 2 for T, 0 for unlabelled, plus 4 while scanning.
+    labels = [0] * blossom_count
+    label_ends = [-1] * blossom_count
+    top_blossoms = list(range(vertex_count))
+    blossom_parents = [-1] * blossom_count
+    blossom_children = [None] * blossom_count  # type: List[Any]
+    blossom_bases = list(range(vertex_count)) + [-1] * vertex_count
+    blossom_endpoints = [None] * blossom_count  # type: List[Any]
+    best_edges = [-1] * blossom_count
+    blossom_best_edges = [None] * blossom_count  # type: List[Any]
+    unused_blossoms = list(range(vertex_count, blossom_count))
+    dual_values = [max_weight] * vertex_count + [0] * vertex_count
+    allowed_edges = [False] * len(edges)
+    queue = []  # type: List[int]
+
+    def _slack(k: int) -> float:
+        i, j, weight = edges[k]
+        return dual_values[i] + dual_values[j] - 2 * weight
+
+    def _yield_leaves(b: int) -> Iterable[int]:
+        if b < vertex_count:
+            yield b
+        else:
+            for child in blossom_children[b]:
+                yield from _yield_leaves(child)
+
+    def _assign_label(w: int, label: int, p: int) -> None:
+        b = top_blossoms[w]
+        labels[w] = labels[b] = label
+        label_ends[w] = label_ends[b] = p
+        best_edges[w] = best_edges[b] = -1
+        if label == 1:
+            queue.extend(_yield_leaves(b))
+        else:
+            base = blossom_bases[b]
+            _assign_label(endpoints[mates[base]], 1, mates[base] ^ 1)
+
+    def _scan_blossom(v: int, w: int) -> int:
+        # Trace back from both vertices to find a new blossom's base, or -1
+        # if the paths reach different roots and can augment the matching.
+        path = []
+        base = -1
+        while v != -1 or w != -1:
+            b = top_blossoms[v]
+            if labels[b] & 4:
+                base = blossom_bases[b]
+                break
+            path.append(b)
+            labels[b] = 5
+            if label_ends[b] == -1:
+                v = -1
+            else:
+                v = endpoints[label_ends[b]]
+                b = top_blossoms[v]
+                v = endpoints[label_ends[b]]
+            if w != -1:
+                v, w = w, v
+        for b in path:
+            labels[b] = 1
+        return base
+
+    def _add_blossom(base: int, k: int) -> None:
+        v, w, _ = edges[k]
+        base_blossom = top_blossoms[base]
+        bv = top_blossoms[v]
+        bw = top_blossoms[w]
+        b = unused_blossoms.pop()
+        blossom_bases[b] = base
+        blossom_parents[b] = -1
+        blossom_parents[base_blossom] = b
+        children = []
+        child_endpoints = []
+        while bv != base_blossom:
+            blossom_parents[bv] = b
+            children.append(bv)
+            child_endpoints.append(label_ends[bv])
+            v = endpoints[label_ends[bv]]
+            bv = top_blossoms[v]
+        children.append(base_blossom)
+        children.reverse()
+        child_endpoints.reverse()
+        child_endpoints.append(2 * k)
+        while bw != base_blossom:
+            blossom_parents[bw] = b
+            children.append(bw)
+            child_endpoints.append(label_ends[bw] ^ 1)
+            w = endpoints[label_ends[bw]]
+            bw = top_blossoms[w]
+        blossom_children[b] = children
+        blossom_endpoints[b] = child_endpoints
+        labels[b] = 1
+        label_ends[b] = label_ends[base_blossom]
+        dual_values[b] = 0
+        for leaf in _yield_leaves(b):
+            if labels[top_blossoms[leaf]] == 2:
+                queue.append(leaf)
+            top_blossoms[leaf] = b
+
+        # Keep the least-slack edge from the new blossom to each other S
+        # blossom.
+        best_edge_to = [-1] * blossom_count
+        for child in children:
+            if blossom_best_edges[child] is None:
+                edge_lists = [
+                    [p // 2 for p in neighbour_endpoints[leaf]]
+                    for leaf in _yield_leaves(child)
+                ]
+            else:
+                edge_lists = [blossom_best_edges[child]]
+            for edge_list in edge_lists:
+                for edge in edge_list:
+                    i, j, _ = edges[edge]
+                    if top_blossoms[j] == b:
+                        i, j = j, i
+                    bj = top_blossoms[j]
+                    if bj != b and labels[bj] == 1 and (
+                            best_edge_to[bj] == -1 or
+                            _slack(edge) < _slack(best_edge_to[bj])):
+                        best_edge_to[bj] = edge
+            blossom_best_edges[child] = None
+            best_edges[child] = -1
+        blossom_best_edges[b] = [edge for edge in best_edge_to if edge != -1]
+        best_edges[b] = -1
+        for edge in blossom_best_edges[b]:
+            if best_edges[b] == -1 or _slack(edge) < _slack(best_edges[b]):
+                best_edges[b] = edge
+
+    def _expand_blossom(b: int, is_end_of_stage: bool) -> None:
+        for child in blossom_children[b]:
+            blossom_parents[child] = -1
+            if child < vertex_count:
+                top_blossoms[child] = child
+            elif is_end_of_stage and dual_values[child] == 0:
+                _expand_blossom(child, is_end_of_stage)
+            else:
+                for leaf in _yield_leaves(child):
+                    top_blossoms[leaf] = child
+        if not is_end_of_stage and labels[b] == 2:
+            # Relabel the children on the even-length path from where the T
+            # blossom was entered to its base.
+            entry_child = top_blossoms[endpoints[label_ends[b] ^ 1]]
+            children = blossom_children[b]
+            child_endpoints = blossom_endpoints[b]
+            j = children.index(entry_child)
+            if j & 1:
+                j -= len(children)
+                step = 1
+                endpoint_flip = 0
+            else:
+                step = -1
+                endpoint_flip = 1
+            p = label_ends[b]
+            while j != 0:
+                labels[endpoints[p ^ 1]] = 0
+                labels[endpoints[child_endpoints[j - endpoint_flip] ^
+                                 endpoint_flip ^ 1]] = 0
+                _assign_label(endpoints[p ^ 1], 2, p)
+                allowed_edges[child_endpoints[j - endpoint_flip] // 2] = True
+                j += step
+                p = child_endpoints[j - endpoint_flip] ^ endpoint_flip
+                allowed_edges[p // 2] = True
+                j += step
+            bv = children[j]
+            labels[endpoints[p ^ 1]] = labels[bv] = 2
+            label_ends[endpoints[p ^ 1]] = label_ends[bv] = p
+            best_edges[bv] = -1
+            j += step
+            while children[j] != entry_child:
+                bv = children[j]
+                if labels[bv] == 1:
+                    j += step
+                    continue
+                labelled_leaf = next(
+                    (
+                        leaf
+                        for leaf in _yield_leaves(bv) if labels[leaf] != 0
+                    ), None
+                )
+                if labelled_leaf is not None:
+                    labels[labelled_leaf] = 0
+                    labels[endpoints[mates[blossom_bases[bv]]]] = 0
+                    _assign_label(
+                        labelled_leaf, 2, label_ends[labelled_leaf]
+                    )
+                j += step
+        labels[b] = label_ends[b] = -1
+        blossom_children[b] = blossom_endpoints[b] = None
+        blossom_bases[b] = -1
+        blossom_best_edges[b] = None
+        best_edges[b] = -1
+        unused_blossoms.append(b)
+
+    def _augment_blossom(b: int, v: int) -> None:
+        # Rematch the blossom's children so that v becomes its base.
+        child = v
+        while blossom_parents[child] != b:
+            child = blossom_parents[child]
+        if child >= vertex_count:
+            _augment_blossom(child, v)
+        children = blossom_children[b]
+        child_endpoints = blossom_endpoints[b]
+        i = j = children.index(child)
+        if i & 1:
+            j -= len(children)
+            step = 1
+            endpoint_flip = 0
+        else:
+            step = -1
+            endpoint_flip = 1
+        while j != 0:
+            j += step
+            child = children[j]
+            p = child_endpoints[j - endpoint_flip] ^ endpoint_flip
+            if child >= vertex_count:
+                _augment_blossom(child, endpoints[p])
+            j += step
+            child = children[j]
+            if child >= vertex_count:
+                _augment_blossom(child, endpoints[p ^ 1])
+            mates[endpoints[p]] = p ^ 1
+            mates[endpoints[p ^ 1]] = p
+        blossom_children[b] = children[i:] + children[:i]
+        blossom_endpoints[b] = child_endpoints[i:] + child_endpoints[:i]
+        blossom_bases[b] = blossom_bases[blossom_children[b][0]]
+
+    def _augment_matching(k: int) -> None:
+        v, w, _ = edges[k]
+        for s, p in ((v, 2 * k + 1), (w, 2 * k)):
+            while True:
+                bs = top_blossoms[s]
+                if bs >= vertex_count:
+                    _augment_blossom(bs, s)
+                mates[s] = p
+                if label_ends[bs] == -1:
+                    break
+                t = endpoints[label_ends[bs]]
+                bt = top_blossoms[t]
+                s = endpoints[label_ends[bt]]
+                j = endpoints[label_ends[bt] ^ 1]
+                if bt >= vertex_count:
+                    _augment_blossom(bt, j)
+                mates[j] = label_ends[bt]
+                p = label_ends[bt] ^ 1
+
+    for _ in range(vertex_count):
+        # Each stage grows alternating trees from every unmatched vertex
+        # until the matching can be augmented or the duals show it's best.
+        labels[:] = [0] * blossom_count
+        best_edges[:] = [-1] * blossom_count
+        blossom_best_edges[vertex_count:] = [None] * vertex_count
+        allowed_edges[:] = [False] * len(edges)
+        queue[:] = []
+        for v in range(vertex_count):
+            if mates[v] == -1 and labels[top_blossoms[v]] == 0:
+                _assign_label(v, 1, -1)
+        is_augmented = False
+        while True:
+            while queue and not is_augmented:
+                v = queue.pop()
+                for p in neighbour_endpoints[v]:
+                    k = p // 2
+                    w = endpoints[p]
+                    if top_blossoms[v] == top_blossoms[w]:
+                        continue
+                    if not allowed_edges[k]:
+                        edge_slack = _slack(k)
+                        if edge_slack <= 0:
+                            allowed_edges[k] = True
+                    if allowed_edges[k]:
+                        if labels[top_blossoms[w]] == 0:
+                            _assign_label(w, 2, p ^ 1)
+                        elif labels[top_blossoms[w]] == 1:
+                            base = _scan_blossom(v, w)
+                            if base >= 0:
+                                _add_blossom(base, k)
+                            else:
+                                _augment_matching(k)
+                                is_augmented = True
+                                break
+                        elif labels[w] == 0:
+                            labels[w] = 2
+                            label_ends[w] = p ^ 1
+                    elif labels[top_blossoms[w]] == 1:
+                        b = top_blossoms[v]
+                        if best_edges[b] == -1 or \
+                                edge_slack < _slack(best_edges[b]):
+                            best_edges[b] = k
+                    elif labels[w] == 0:
+                        if best_edges[w] == -1 or \
+                                edge_slack < _slack(best_edges[w]):
+                            best_edges[w] = k
+            if is_augmented:
+                break
+
+            # Change the duals by as much as possible without breaking them,
+            # which makes a new edge usable, expands a blossom or ends the
+            # search.
+            delta_type = 1
+            delta = min(dual_values[:vertex_count])
+            delta_edge = delta_blossom = -1
+            for v in range(vertex_count):
+                if labels[top_blossoms[v]] == 0 and best_edges[v] != -1:
+                    edge_slack = _slack(best_edges[v])
+                    if edge_slack < delta:
+                        delta, delta_type = edge_slack, 2
+                        delta_edge = best_edges[v]
+            for b in range(blossom_count):
+                if blossom_parents[b] == -1 and labels[b] == 1 and \
+                        best_edges[b] != -1:
+                    edge_slack = _slack(best_edges[b])
+                    half_slack = edge_slack // 2 if is_integer else \
+                        edge_slack / 2
+                    if half_slack < delta:
+                        delta, delta_type = half_slack, 3
+                        delta_edge = best_edges[b]
+            for b in range(vertex_count, blossom_count):
+                if blossom_bases[b] >= 0 and blossom_parents[b] == -1 and \
+                        labels[b] == 2 and dual_values[b] < delta:
+                    delta, delta_type = dual_values[b], 4
+                    delta_blossom = b
+            for v in range(vertex_count):
+                if labels[top_blossoms[v]] == 1:
+                    dual_values[v] -= delta
+                elif labels[top_blossoms[v]] == 2:
+                    dual_values[v] += delta
+            for b in range(vertex_count, blossom_count):
+                if blossom_bases[b] >= 0 and blossom_parents[b] == -1:
+                    if labels[b] == 1:
+                        dual_values[b] += delta
+                    elif labels[b] == 2:
+                        dual_values[b] -= delta
+            if delta_type == 1:
+                break
+            elif delta_type == 2:
+                allowed_edges[delta_edge] = True
+                i, j, _ = edges[delta_edge]
+                if labels[top_blossoms[i]] == 0:
+                    i, j = j, i
+                queue.append(i)
+            elif delta_type == 3:
+                allowed_edges[delta_edge] = True
+                i, _, _ = edges[delta_edge]
+                queue.append(i)
+            else:
+                _expand_blossom(delta_blossom, False)
+        if not is_augmented:
+            break
+        for b in range(vertex_count, blossom_count):
+            if blossom_parents[b] == -1 and blossom_bases[b] >= 0 and \
+                    labels[b] == 1 and dual_values[b] == 0:
+                _expand_blossom(b, True)
+
+    return [
+        endpoints[mate] if mate >= 0 else -1 for mate in mates
+    ], dual_values, blossom_parents
+
+
+def _calc_full_slack(
+        i: int, j: int, weight: float, dual_values: List[float],
+        blossom_parents: List[int]
+) -> float:
+    """Return the doubled slack of an edge under a matching's dual values,
+    counting every blossom that contains both of its vertices.
+
+    >>> _calc_full_slack(0, 1, 1, [2, 2, 1, 1], [-1, -1, -1, -1])
+    2
+    """
+    slack = dual_values[i] + dual_values[j] - 2 * weight
+    i_blossoms = []
+    b = blossom_parents[i]
+    while b != -1:
+        i_blossoms.append(b)
+        b = blossom_parents[b]
+    if len(i_blossoms) > 0:
+        j_blossoms = set()
+        b = blossom_parents[j]
+        while b != -1:
+            j_blossoms.add(b)
+            b = blossom_parents[b]
+        slack += 2 * sum(
+            dual_values[b] for b in i_blossoms if b in j_blossoms
+        )
+    return slack
+
+
+def find_min_scoring_index_pairs(
+        cost_rows: List[List[int]],
+        group_sizes: Sequence[int],
+        index_constraints: Optional[IndexConstraints] = None,
+        candidate_partner_count: int = DEFAULT_CANDIDATE_PARTNER_COUNT
+) -> Tuple[Optional[List[List[int]]], float]:
+    """Return the minimum-scoring groups of student indices of the given sizes,
+    all one or two, and their score.
+
+    With index constraints, groups that break them are never used. If no
+    groups follow the constraints, None and an infinite score are returned.
+
+    >>> find_min_scoring_index_pairs(
+    ...     [[0, 1, 0, 1], [1, 0, 1, 0], [0, 1, 0, 1], [1, 0, 1, 0]], [2, 2])
+    ([[0, 2], [1, 3]], 0)
+    >>> find_min_scoring_index_pairs(
+    ...     [[1, 4, 0], [4, 1, 9], [0, 9, 1]], [2, 1])
+    ([[0, 2], [1]], 3)
+    >>> find_min_scoring_index_pairs(
+    ...     [[0, 1, 0, 1], [1, 0, 1, 0], [0, 1, 0, 1], [1, 0, 1, 0]], [2, 2],
+    ...     index_constraints=IndexConstraints(
+    ...         Students('A', 'B', 'C', 'D'),
+    ...         Constraints(never_pairs=[Pair('A', 'C')])))
+    ([[0, 1], [2, 3]], 2)
+    >>> find_min_scoring_index_pairs(
+    ...     [[0, 0], [0, 0]], [2],
+    ...     index_constraints=IndexConstraints(
+    ...         Students('A', 'B'), Constraints(never_pairs=[Pair('A', 'B')])))
+    (None, inf)
+    """
+    if any(size not in (1, 2) for size in group_sizes):
+        raise ValueError(
+            'group sizes must all be 1 or 2: {!r}'.format(tuple(group_sizes))
+        )
+    student_count = len(cost_rows)
+    # Each student left on its own is matched with one of these stand-ins.
+    stand_in_count = sum(1 for size in group_sizes if size == 1)
+    vertex_count = student_count + stand_in_count
+
+    allowed_costs = {}  # type: Dict[Tuple[int, int], float]
+    for i in range(student_count):
+        for j in range(i + 1, student_count):
+            if index_constraints is None or \
+                    index_constraints.allows_index_groups([[i, j]]):
+                allowed_costs[(i, j)] = cost_rows[i][j]
+    allows_alone = [
+        index_constraints is None or
+        index_constraints.allows_index_groups([[i]])
+        for i in range(student_count)
+    ]
+    # Any matching with one more pair outweighs every matching with fewer, so
+    # the heaviest matching pairs up everyone if anything can.
+    max_cost = max([0] + list(allowed_costs.values()))
+    heavy_weight = (vertex_count // 2 + 1) * max_cost + 1
+
+    def _to_edge(index_pair: Tuple[int, int]) -> Tuple[int, int, float]:
+        return index_pair + (heavy_weight - allowed_costs[index_pair], )
+
+    partners = [[] for _ in range(student_count)]  # type: List[List[int]]
+    for i, j in allowed_costs:
+        partners[i].append(j)
+        partners[j].append(i)
+    used_pairs = set()
+    for i in range(student_count):
+        for j in sorted(partners[i], key=cost_rows[i].__getitem__
+                        )[:candidate_partner_count]:
+            used_pairs.add((min(i, j), max(i, j)))
+    stand_in_edges = [
+        (i, stand_in, heavy_weight) for i in range(student_count)
+        if allows_alone[i]
+        for stand_in in range(student_count, vertex_count)
+    ]
+
+    round_count = 0
+    while True:
+        round_count += 1
+        edges = [_to_edge(index_pair) for index_pair in sorted(used_pairs)]
+        mates, dual_values, blossom_parents = _match_max_weight(
+            vertex_count, edges + stand_in_edges
+        )
+        missing_pairs = [
+            index_pair for index_pair in allowed_costs
+            if index_pair not in used_pairs and _calc_full_slack(
+                index_pair[0], index_pair[1], heavy_weight -
+                allowed_costs[index_pair], dual_values, blossom_parents
+            ) < 0
+        ]
+        if len(missing_pairs) == 0:
+            break
+        used_pairs.update(missing_pairs)
+    add_counts(
+        matching_rounds=round_count,
+        matching_edges=len(used_pairs) + len(stand_in_edges)
+    )
+
+    if any(mate == -1 for mate in mates):
+        return None, float('inf')
+    index_groups = []
+    for i in range(student_count):
+        if mates[i] >= student_count:
+            index_groups.append([i])
+        elif i < mates[i]:
+            index_groups.append([i, mates[i]])
+    index_groups.sort()
+    return index_groups, sum(
+        cost_rows[i][i] for i in range(student_count)
+    ) + sum(
+        cost_rows[index_group[0]][index_group[1]]
+        for index_group in index_groups if len(index_group) == 2
+    )
+
+
+def solve_for_min_scoring_pairs(
+        students: Students, historical_pair_counts: PairCounts
+) -> GroupConfig:
+    """Figure out a minimum-scoring group config of pairs, with one student on
+    their own if there's an odd number, in polynomial time.
+
+    Returns a group config with the same score as
+    `solve_for_min_scoring_groups` with a group size of two.
+
+    >>> solve_for_min_scoring_pairs(
+    ...     Students('A', 'B', 'C'),
+    ...     PairCounts((Pair('A', 'B'), 1), (Pair('B', 'C'), 1)))
+    GroupConfig(Group('A', 'C'), Group('B'))
+    """
+    cost_rows = calc_index_cost_rows(
+        PairCountMatrix.from_pair_counts(students, historical_pair_counts)
+    )
+    index_groups, _ = find_min_scoring_index_pairs(
+        cost_rows, calc_group_sizes(len(students.names), 2)
+    )
+    return group_config_from_index_groups(students, index_groups)
@@ -1,6 +1,9 @@
 """All group-making container types."""
+from .constraints import Constraints
 from .group import Group
 from .group_config import GroupConfig
 from .pair import Pair
+from .pair_count_matrix import PairCountMatrix
 from .pair_counts import PairCounts
+from .solution import Solution
 from .students import Students
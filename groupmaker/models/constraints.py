@@ -0,0 +1,187 @@
+"""Definition of constraints on groups."""
+from itertools import chain
+from typing import Dict
+from typing import FrozenSet
+from typing import Iterable
+from typing import Optional
+
+from ._util_functions import find_duplicates
+from .group import Group
+from .pair import Pair
+
+
+class Constraints:
+    """Rules every group config must follow, whatever its score.
+
+    The students in each must pair are in the same group, the students in
+    each never pair are in different groups, and each pinned group is one of
+    the groups exactly.
+
+    Treat as immutable.
+    """
+
+    __slots__ = (
+        'must_pairs', 'never_pairs', 'pinned_groups', '_partners', '_apart',
+        '_pinned'
+    )
+
+    def __init__(
+            self,
+            must_pairs: Iterable[Pair] = (),
+            never_pairs: Iterable[Pair] = (),
+            pinned_groups: Iterable[Group] = ()
+    ) -> None:
+        """Make new constraints.
+
+        >>> constraints = Constraints(
+        ...     [Pair('B', 'A')], [Pair('A', 'C')], [Group('D', 'E')])
+        >>> constraints.must_pairs
+        (Pair('A', 'B'),)
+        >>> Constraints(never_pairs=[Pair('A', 'A')])
+        Traceback (most recent call last):
+            ...
+        ValueError: can't keep a student apart from themselves: 'A'
+        >>> Constraints([Pair('A', 'B')], [Pair('B', 'A')])
+        Traceback (most recent call last):
+            ...
+        ValueError: pair must and must never be together: Pair('A', 'B')
+        >>> Constraints(pinned_groups=[Group('A', 'B'), Group('B')])
+        Traceback (most recent call last):
+            ...
+        ValueError: duplicate names across pinned groups: ['B']
+        """
+        self.must_pairs = tuple(sorted(frozenset(must_pairs)))
+        self.never_pairs = tuple(sorted(frozenset(never_pairs)))
+        self.pinned_groups = tuple(sorted(frozenset(pinned_groups)))
+        for pair in self.never_pairs:
+            name_a, name_b = pair.names
+            if name_a == name_b:
+                raise ValueError(
+                    "can't keep a student apart from themselves: {!r}".format(
+                        name_a
+                    )
+                )
+        conflicting_pairs = sorted(
+            frozenset(self.must_pairs) & frozenset(self.never_pairs)
+        )
+        if len(conflicting_pairs) > 0:
+            raise ValueError(
+                'pair must and must never be together: {!r}'.format(
+                    conflicting_pairs[0]
+                )
+            )
+        duplicate_names = sorted(
+            find_duplicates(
+                chain.from_iterable(
+                    group.names for group in self.pinned_groups
+                )
+            )
+        )
+        if len(duplicate_names) > 0:
+            raise ValueError(
+                'duplicate names across pinned groups: {!r}'.format(
+                    duplicate_names
+                )
+            )
+
+        self._partners = _collect_partners(self.must_pairs)
+        self._apart = _collect_partners(self.never_pairs)
+        self._pinned = {
+            name: frozenset(group.names)
+            for group in self.pinned_groups
+            for name in group.names
+        }  # type: Dict[str, FrozenSet[str]]
+
+    def __eq__(self, other: 'Constraints') -> bool:
+        """Return if constraints are equal.
+
+        >>> Constraints([Pair('A', 'B')]) == Constraints([Pair('B', 'A')])
+        True
+        >>> Constraints([Pair('A', 'B')]) == Constraints()
+        False
+        """
+        return (self.must_pairs, self.never_pairs, self.pinned_groups) == (
+            other.must_pairs, other.never_pairs, other.pinned_groups
+        )
+
+    def __hash__(self):
+        return hash((self.must_pairs, self.never_pairs, self.pinned_groups))
+
+    def __repr__(self) -> str:
+        """Return the literal of constraints.
+
+        >>> Constraints([Pair('A', 'B')], pinned_groups=[Group('C')])
+        Constraints((Pair('A', 'B'),), (), (Group('C'),))
+        """
+        return 'Constraints({!r}, {!r}, {!r})'.format(
+            self.must_pairs, self.never_pairs, self.pinned_groups
+        )
+
+    def get_names(self) -> FrozenSet[str]:
+        """Return every name the constraints mention.
+
+        >>> sorted(Constraints(
+        ...     [Pair('A', 'B')], [Pair('A', 'C')], [Group('D')]).get_names())
+        ['A', 'B', 'C', 'D']
+        """
+        return frozenset(
+            chain(
+                chain.from_iterable(
+                    pair.names
+                    for pair in chain(self.must_pairs, self.never_pairs)
+                ),
+                self._pinned
+            )
+        )
+
+    def get_partners(self, name: str) -> FrozenSet[str]:
+        """Return who must be in the same group as a student."""
+        return self._partners.get(name, frozenset())
+
+    def get_apart(self, name: str) -> FrozenSet[str]:
+        """Return who must never be in the same group as a student."""
+        return self._apart.get(name, frozenset())
+
+    def get_pinned_group(self, name: str) -> Optional[FrozenSet[str]]:
+        """Return the pinned group a student is in, or None."""
+        return self._pinned.get(name)
+
+    def allows_group(self, names: Iterable[str]) -> bool:
+        """Return if a whole group breaks none of the constraints.
+
+        >>> constraints = Constraints(
+        ...     [Pair('A', 'B')], [Pair('A', 'C')], [Group('D', 'E')])
+        >>> constraints.allows_group(['A', 'B', 'F'])
+        True
+        >>> constraints.allows_group(['A', 'F'])
+        False
+        >>> constraints.allows_group(['A', 'B', 'C'])
+        False
+        >>> constraints.allows_group(['D', 'E', 'F'])
+        False
+        """
+        names = frozenset(names)
+        for name in names:
+            if not self.get_partners(name) <= names:
+                return False
+            if not self.get_apart(name).isdisjoint(names):
+                return False
+            pinned_group = self._pinned.get(name)
+            if pinned_group is not None and pinned_group != names:
+                return False
+        return True
+
+
+def _collect_partners(pairs: Iterable[Pair]) -> Dict[str, FrozenSet[str]]:
+    """Return everyone each name is paired with.
+
+    >>> partners = _collect_partners([Pair('A', 'B'), Pair('A', 'C')])
+    >>> sorted(partners['A']), sorted(partners['B'])
+    (['B', 'C'], ['A'])
+    """
+    partners = {}  # type: Dict[str, set]
+    for pair in pairs:
+        name_a, name_b = pair.names
+        partners.setdefault(name_a, set()).add(name_b)
+        partners.setdefault(name_b, set()).add(name_a)
+    return {name: frozenset(names) for name, names in partners.items()}
@@ -1,5 +1,7 @@
 """Definition of a group."""
+import sys
 from typing import Iterable
+from typing import Tuple
 
 from ._util_functions import find_duplicates
 
@@ -12,6 +14,8 @@ class Group:
     Treat as immutable.
     """
 
+    __slots__ = ('names', '_hash')
+
     def __init__(self, *names: Iterable[str]) -> None:
         """Make a new group.
 
@@ -31,7 +35,27 @@ class Group:
             raise ValueError(
                 'duplicate names in group: {!r}'.format(duplicate_names)
             )
-        self.names = tuple(sorted(names))
+        self.names = tuple(sorted(map(sys.intern, names)))
+        self._hash = None
+
+    @staticmethod
+    def from_sorted_names(names: Tuple[str, ...]) -> 'Group':
+        """Make a new group out of a tuple of unique names that are already
+        in order, without checking them.
+
+        >>> Group.from_sorted_names(('A', 'B'))
+        Group('A', 'B')
+        """
+        group = Group.__new__(Group)
+        group.names = names
+        group._hash = None
+        return group
+
+    def __reduce__(self) -> Tuple[type, Tuple[str, ...]]:
+        """Pickle only the names, since string hashes differ between
+        processes.
+        """
+        return Group, self.names
 
     def __eq__(self, other: 'Group') -> bool:
         """Return if groups are equal.
@@ -46,7 +70,9 @@ class Group:
         return self.names == other.names
 
     def __hash__(self):
-        return hash(self.names)
+        if self._hash is None:
+            self._hash = hash(self.names)
+        return self._hash
 
     def __lt__(self, other: 'Group') -> bool:
         """Return if a current group is before other group.
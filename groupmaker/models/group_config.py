@@ -1,6 +1,7 @@
 """Definition of a group config."""
 from itertools import chain
 from typing import Iterable
+from typing import Tuple
 
 from ._util_functions import find_duplicates
 from .group import Group
@@ -12,6 +13,8 @@ class GroupConfig:
     Treat as immutable.
     """
 
+    __slots__ = ('groups', '_hash')
+
     def __init__(self, *groups: Iterable[Group]) -> None:
         """Make a new group config.
 
@@ -35,6 +38,26 @@ class GroupConfig:
                 )
             )
         self.groups = tuple(sorted(groups))
+        self._hash = None
+
+    @staticmethod
+    def from_sorted_groups(groups: Tuple[Group, ...]) -> 'GroupConfig':
+        """Make a new group config out of a tuple of groups that are already
+        in order and share no names, without checking them.
+
+        >>> GroupConfig.from_sorted_groups((Group('A'), Group('B')))
+        GroupConfig(Group('A'), Group('B'))
+        """
+        group_config = GroupConfig.__new__(GroupConfig)
+        group_config.groups = groups
+        group_config._hash = None
+        return group_config
+
+    def __reduce__(self) -> Tuple[type, Tuple[Group, ...]]:
+        """Pickle only the groups, since string hashes differ between
+        processes.
+        """
+        return GroupConfig, self.groups
 
     def __eq__(self, other: 'GroupConfig') -> bool:
         """Return if group configs are equal.
@@ -55,7 +78,9 @@ class GroupConfig:
         return self.groups == other.groups
 
     def __hash__(self):
-        return hash(self.groups)
+        if self._hash is None:
+            self._hash = hash(self.groups)
+        return self._hash
 
     def __lt__(self, other: 'GroupConfig') -> bool:
         """Return if a current group config is before other group config.
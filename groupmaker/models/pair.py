@@ -1,4 +1,6 @@
 """Definition of a pair."""
+import sys
+from typing import Tuple
 
 
 class Pair:
@@ -10,6 +12,8 @@ class Pair:
     Treat as immutable.
     """
 
+    __slots__ = ('names', '_hash')
+
     def __init__(self, name_a: str, name_b: str) -> None:
         """Make a new pair.
 
@@ -20,7 +24,32 @@ class Pair:
         >>> pair.names
         ('A', 'B')
         """
-        self.names = tuple(sorted((name_a, name_b)))
+        self.names = tuple(sorted((sys.intern(name_a), sys.intern(name_b))))
+        self._hash = None
+
+    @staticmethod
+    def from_sorted_names(name_a: str, name_b: str) -> 'Pair':
+        """Make a new pair out of names that are already in order, without
+        checking them.
+
+        >>> Pair.from_sorted_names('A', 'B')
+        Pair('A', 'B')
+        """
+        pair = Pair.__new__(Pair)
+        pair.names = (name_a, name_b)
+        pair._hash = None
+        return pair
+
+    def __reduce__(self) -> Tuple[type, Tuple[str, ...]]:
+        """Pickle only the names, since string hashes differ between
+        processes.
+
+        >>> import pickle
+        >>> pair = pickle.loads(pickle.dumps(Pair('A', 'B')))
+        >>> pair, hash(pair) == hash(Pair('A', 'B'))
+        (Pair('A', 'B'), True)
+        """
+        return Pair, self.names
 
     def __eq__(self, other: 'Pair') -> bool:
         """Return if pairs are equal.
@@ -33,7 +62,9 @@ class Pair:
         return self.names == other.names
 
     def __hash__(self):
-        return hash(self.names)
+        if self._hash is None:
+            self._hash = hash(self.names)
+        return self._hash
 
     def __lt__(self, other: 'Pair') -> bool:
         """Return if a current pair is before other pair.
@@ -0,0 +1,307 @@
+"""Definition of a dense matrix of pair counts."""
+from array import array
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Sequence
+from typing import Tuple
+
+from .pair import Pair
+from .pair_counts import PairCounts
+from .students import Students
+
+
+def calc_packed_count_length(student_count: int) -> int:
+    """Return how many counts the packed upper triangle of a pair count
+    matrix holds.
+
+    >>> calc_packed_count_length(3)
+    6
+    """
+    return student_count * (student_count + 1) // 2
+
+
+def _get_typecode(packed_counts: Sequence[int]) -> str:
+    """Return the array typecode of packed counts in an array or memoryview.
+
+    >>> _get_typecode(array('q'))
+    'q'
+    >>> _get_typecode(memoryview(array('q')))
+    'q'
+    """
+    if isinstance(packed_counts, memoryview):
+        return packed_counts.format
+    return packed_counts.typecode
+
+
+class PairCountMatrix:
+    """A summary of the number of times pairs of students in a class have
+    existed, indexed by each student's position in the class.
+
+    Counts are stored as the packed upper triangle of a symmetric matrix, row
+    by row, so looking up a pair of student indices never builds a pair.
+
+    Treat as immutable.
+    """
+
+    def __init__(
+            self, students: Students, *pair_counts:
+            Iterable[Tuple[Pair, int]]
+    ) -> None:
+        """Make a new pair count matrix.
+
+        >>> pair_count_matrix = PairCountMatrix(
+        ...     Students('A', 'B'), (Pair('A', 'A'), 1), (Pair('A', 'B'), 2))
+        >>> pair_count_matrix.get_index_count(0, 0)
+        1
+        >>> pair_count_matrix.get_index_count(1, 0)
+        2
+        >>> PairCountMatrix(
+        ...     Students('A', 'B'), (Pair('A', 'B'), 0.5)).get_index_count(0, 1)
+        0.5
+        >>> PairCountMatrix(Students('A'), (Pair('A', 'B'), 1))
+        Traceback (most recent call last):
+            ...
+        ValueError: name not in students: 'B'
+        """
+        self.students = students
+        self.indices = {
+            name: index
+            for index, name in enumerate(students.names)
+        }  # type: Dict[str, int]
+        self._size = len(students.names)
+        # Adding a column index to a row's offset gives where the count is,
+        # as long as the column is not before the row.
+        self._row_offsets = [
+            index * self._size - index * (index + 1) // 2
+            for index in range(self._size)
+        ]
+        typecode = 'q'
+        if any(isinstance(count, float) for _, count in pair_counts):
+            typecode = 'd'
+        self._counts = array(typecode, [0]) * calc_packed_count_length(
+            self._size
+        )
+        for pair, count in pair_counts:
+            index_a, index_b = self._index_pair(pair)
+            self._counts[self._row_offsets[index_a] + index_b] = count
+
+    @staticmethod
+    def from_pair_counts(
+            students: Students, pair_counts: PairCounts
+    ) -> 'PairCountMatrix':
+        """Make a pair count matrix for a class out of any pair counts.
+
+        Counts of pairs with students not in the class are dropped.
+
+        >>> PairCountMatrix.from_pair_counts(
+        ...     Students('A', 'B'),
+        ...     PairCounts((Pair('A', 'B'), 2), (Pair('A', 'C'), 1)))
+        PairCountMatrix(Students('A', 'B'), (Pair('A', 'B'), 2))
+        """
+        if isinstance(pair_counts, PairCountMatrix
+                      ) and pair_counts.students == students:
+            return pair_counts
+        names = frozenset(students.names)
+        return PairCountMatrix(
+            students, *(
+                (pair, count) for pair, count in pair_counts.items()
+                if names.issuperset(pair.names)
+            )
+        )
+
+    @staticmethod
+    def from_packed_counts(
+            students: Students, packed_counts: Sequence[int]
+    ) -> 'PairCountMatrix':
+        """Make a pair count matrix for a class that uses the packed upper
+        triangle of counts as is, such as a memoryview of a mapped file.
+
+        >>> PairCountMatrix.from_packed_counts(
+        ...     Students('A', 'B'), array('q', [0, 2, 1]))
+        PairCountMatrix(Students('A', 'B'), (Pair('A', 'B'), 2), (Pair('B', 'B'), 1))
+        >>> PairCountMatrix.from_packed_counts(Students('A', 'B'), [0])
+        Traceback (most recent call last):
+            ...
+        ValueError: expected 3 packed counts for 2 students, got 1
+        """
+        expected_length = calc_packed_count_length(len(students.names))
+        if len(packed_counts) != expected_length:
+            raise ValueError(
+                'expected {} packed counts for {} students, got {}'.format(
+                    expected_length, len(students.names), len(packed_counts)
+                )
+            )
+        pair_count_matrix = PairCountMatrix(students)
+        pair_count_matrix._counts = packed_counts
+        return pair_count_matrix
+
+    def get_packed_counts(self) -> Sequence[int]:
+        """Return the packed upper triangle of counts, row by row.
+
+        >>> PairCountMatrix(
+        ...     Students('A', 'B'), (Pair('A', 'B'), 2)).get_packed_counts()
+        array('q', [0, 2, 0])
+        """
+        return self._counts
+
+    def get_typecode(self) -> str:
+        """Return the array typecode of the packed counts, 'q' for whole
+        counts or 'd' for fractional counts.
+
+        >>> PairCountMatrix(
+        ...     Students('A', 'B'), (Pair('A', 'B'), 2)).get_typecode()
+        'q'
+        >>> PairCountMatrix.from_packed_counts(
+        ...     Students('A'), memoryview(array('d', [0.5]))).get_typecode()
+        'd'
+        """
+        return _get_typecode(self._counts)
+
+    def to_pair_counts(self) -> PairCounts:
+        """Return the same counts keyed by pairs.
+
+        >>> PairCountMatrix(
+        ...     Students('A', 'B'), (Pair('A', 'B'), 2)).to_pair_counts()
+        PairCounts((Pair('A', 'B'), 2))
+        """
+        return PairCounts(*self.items())
+
+    def __eq__(self, other: 'PairCountMatrix') -> bool:
+        """Return if pair count matrices are equal.
+
+        >>> (PairCountMatrix(Students('A'), (Pair('A', 'A'), 1)) ==
+        ...  PairCountMatrix(Students('A'), (Pair('A', 'A'), 1)))
+        True
+        >>> (PairCountMatrix(Students('A'), (Pair('A', 'A'), 1)) ==
+        ...  PairCountMatrix(Students('A')))
+        False
+        """
+        return self.students == other.students and \
+            self._counts.tolist() == other._counts.tolist()
+
+    def __hash__(self):
+        return hash((self.students, tuple(self._counts)))
+
+    def __add__(self, other: 'PairCountMatrix') -> 'PairCountMatrix':
+        """Sum together two pair count matrices of the same class, pair by
+        pair.
+
+        >>> (PairCountMatrix(Students('A', 'B'), (Pair('A', 'B'), 1)) +
+        ...  PairCountMatrix(Students('A', 'B'), (Pair('A', 'B'), 1),
+        ...                  (Pair('B', 'B'), 1)))
+        PairCountMatrix(Students('A', 'B'), (Pair('A', 'B'), 2), (Pair('B', 'B'), 1))
+        >>> (PairCountMatrix(Students('A')) +
+        ...  PairCountMatrix(Students('B')))
+        Traceback (most recent call last):
+            ...
+        ValueError: can't add pair count matrices of different students
+        """
+        if self.students != other.students:
+            raise ValueError(
+                "can't add pair count matrices of different students"
+            )
+        typecode = 'q'
+        if 'd' in (_get_typecode(self._counts), _get_typecode(other._counts)):
+            typecode = 'd'
+        sum_counts = PairCountMatrix(self.students)
+        sum_counts._counts = array(
+            typecode, (a + b for a, b in zip(self._counts, other._counts))
+        )
+        return sum_counts
+
+    def __repr__(self) -> str:
+        """Return the literal of a pair count matrix.
+
+        >>> repr(PairCountMatrix(Students('A', 'B'), (Pair('A', 'B'), 1)))
+        "PairCountMatrix(Students('A', 'B'), (Pair('A', 'B'), 1))"
+        >>> repr(PairCountMatrix(Students()))
+        'PairCountMatrix(Students())'
+        """
+        arg_list = ', '.join(
+            [repr(self.students)] + [repr(item) for item in self.items()]
+        )
+        return 'PairCountMatrix({})'.format(arg_list)
+
+    def _index_pair(self, pair: Pair) -> Tuple[int, int]:
+        """Return the student indices of both names in a pair."""
+        for name in pair.names:
+            if name not in self.indices:
+                raise ValueError('name not in students: {!r}'.format(name))
+        name_a, name_b = pair.names
+        return self.indices[name_a], self.indices[name_b]
+
+    def items(self) -> Iterable[Tuple[Pair, int]]:
+        """Yield every pair with a count in sorted order.
+
+        >>> list(PairCountMatrix(
+        ...     Students('A', 'B'), (Pair('B', 'B'), 1), (Pair('A', 'B'), 2)
+        ... ).items())
+        [(Pair('A', 'B'), 2), (Pair('B', 'B'), 1)]
+        """
+        names = self.students.names
+        for index_a in range(self._size):
+            row_offset = self._row_offsets[index_a]
+            for index_b in range(index_a, self._size):
+                count = self._counts[row_offset + index_b]
+                if count != 0:
+                    yield Pair.from_sorted_names(
+                        names[index_a], names[index_b]
+                    ), count
+
+    def get_count(self, pair: Pair) -> int:
+        """Return how many times a pair has existed.
+
+        Pairs with students not in the class have never existed.
+
+        >>> pair_count_matrix = PairCountMatrix(
+        ...     Students('A', 'B'), (Pair('A', 'B'), 2))
+        >>> pair_count_matrix.get_count(Pair('B', 'A'))
+        2
+        >>> pair_count_matrix.get_count(Pair('A', 'C'))
+        0
+        """
+        name_a, name_b = pair.names
+        if name_a not in self.indices or name_b not in self.indices:
+            return 0
+        return self.get_index_count(self.indices[name_a], self.indices[name_b])
+
+    def get_index_count(self, index_a: int, index_b: int) -> int:
+        """Return how many times the students at two indices have been paired.
+
+        >>> PairCountMatrix(
+        ...     Students('A', 'B'), (Pair('A', 'B'), 2)).get_index_count(0, 1)
+        2
+        """
+        if index_a > index_b:
+            index_a, index_b = index_b, index_a
+        return self._counts[self._row_offsets[index_a] + index_b]
+
+    def get_counts(self, index_pairs: Iterable[Tuple[int, int]]) -> List[int]:
+        """Return the counts of a batch of student index pairs in order.
+
+        >>> PairCountMatrix(
+        ...     Students('A', 'B'), (Pair('A', 'B'), 2), (Pair('B', 'B'), 1)
+        ... ).get_counts([(0, 1), (1, 1), (0, 0)])
+        [2, 1, 0]
+        """
+        counts, row_offsets = self._counts, self._row_offsets
+        return [
+            counts[row_offsets[index_a] + index_b] if index_a <= index_b else
+            counts[row_offsets[index_b] + index_a]
+            for index_a, index_b in index_pairs
+        ]
+
+    def get_row(self, index: int) -> List[int]:
+        """Return the counts of the student at an index with every student.
+
+        >>> PairCountMatrix(
+        ...     Students('A', 'B'), (Pair('A', 'B'), 2)).get_row(1)
+        [2, 0]
+        """
+        counts, row_offsets = self._counts, self._row_offsets
+        row_offset = row_offsets[index]
+        return [
+            counts[row_offsets[other_index] + index]
+            for other_index in range(index)
+        ] + counts[row_offset + index:row_offset + self._size].tolist()
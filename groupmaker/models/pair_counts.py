@@ -12,6 +12,8 @@ class PairCounts:
     Treat as immutable.
     """
 
+    __slots__ = ('_counter', )
+
     def __init__(self, *pair_counts: Iterable[Tuple[Pair, int]]) -> None:
         """Make a new pair count.
 
@@ -55,13 +57,19 @@ class PairCounts:
         >>> repr(PairCounts())
         'PairCounts()'
         """
-        pair_count_arg_list = ', '.join(
-            repr(item) for item in sorted(self._counter.items())
-        )
+        pair_count_arg_list = ', '.join(repr(item) for item in self.items())
         return 'PairCounts({})'.format(pair_count_arg_list)
 
-    def get_count(self, pair: Pair) -> int:
+    def items(self) -> Iterable[Tuple[Pair, int]]:
+        """Yield every pair with a count in sorted order.
+
+        >>> list(PairCounts((Pair('A', 'B'), 2), (Pair('A', 'A'), 1)).items())
+        [(Pair('A', 'A'), 1), (Pair('A', 'B'), 2)]
         """
+        return iter(sorted(self._counter.items()))
+
+    def get_count(self, pair: Pair) -> int:
+        """Return how many times a pair has existed.
 
         >>> pair_counts = PairCounts((Pair('A', 'A'), 1), (Pair('A', 'B'), 2))
         >>> pair_counts.get_count(Pair('A', 'A'))
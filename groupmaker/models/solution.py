@@ -0,0 +1,53 @@
+"""Definition of a solution."""
+from .group_config import GroupConfig
+
+
+class Solution:
+    """A group config found by a solver, its score, and if it is known to be
+    the minimum-scoring group config.
+
+    Treat as immutable.
+    """
+
+    def __init__(
+            self, group_config: GroupConfig, score: int, is_optimal: bool
+    ) -> None:
+        """Make a new solution.
+
+        >>> solution = Solution(GroupConfig(), 0, True)
+        >>> solution.group_config
+        GroupConfig()
+        >>> solution.score
+        0
+        >>> solution.is_optimal
+        True
+        """
+        self.group_config = group_config
+        self.score = score
+        self.is_optimal = is_optimal
+
+    def __eq__(self, other: 'Solution') -> bool:
+        """Return if solutions are equal.
+
+        >>> Solution(GroupConfig(), 0, True) == Solution(GroupConfig(), 0, True)
+        True
+        >>> Solution(GroupConfig(), 0, True) == Solution(
+        ...     GroupConfig(), 0, False)
+        False
+        """
+        return (self.group_config, self.score, self.is_optimal) == (
+            other.group_config, other.score, other.is_optimal
+        )
+
+    def __hash__(self):
+        return hash((self.group_config, self.score, self.is_optimal))
+
+    def __repr__(self) -> str:
+        """Return the literal of a solution.
+
+        >>> repr(Solution(GroupConfig(), 0, True))
+        'Solution(GroupConfig(), 0, True)'
+        """
+        return 'Solution({!r}, {!r}, {!r})'.format(
+            self.group_config, self.score, self.is_optimal
+        )
@@ -1,5 +1,7 @@
 """Definition of a student set."""
+import sys
 from typing import Iterable
+from typing import Tuple
 
 from ._util_functions import find_duplicates
 
@@ -10,6 +12,8 @@ class Students:
     Treat as immutable.
     """
 
+    __slots__ = ('names', '_hash')
+
     def __init__(self, *names: Iterable[str]) -> None:
         """Make a new set of students.
 
@@ -29,7 +33,14 @@ class Students:
             raise ValueError(
                 'duplicate names in students: {!r}'.format(duplicate_names)
             )
-        self.names = tuple(sorted(names))
+        self.names = tuple(sorted(map(sys.intern, names)))
+        self._hash = None
+
+    def __reduce__(self) -> Tuple[type, Tuple[str, ...]]:
+        """Pickle only the names, since string hashes differ between
+        processes.
+        """
+        return Students, self.names
 
     def __eq__(self, other: 'Students') -> bool:
         """Return if student sets are equal.
@@ -42,7 +53,9 @@ class Students:
         return self.names == other.names
 
     def __hash__(self):
-        return hash(self.names)
+        if self._hash is None:
+            self._hash = hash(self.names)
+        return self._hash
 
     def __repr__(self) -> str:
         """Return the literal of a student set.
@@ -1,6 +1,8 @@
 """Functions for counting pairs in historical groups."""
 from itertools import chain, combinations_with_replacement
 from typing import Iterable
+from typing import Mapping
+from typing import Tuple
 
 from .models import Group
 from .models import GroupConfig
@@ -8,12 +10,12 @@ from .models import Pair
 
 
 def _tuple_to_pair(t: tuple) -> Pair:
-    """Convert a two tuple to a pair.
+    """Convert a sorted two tuple to a pair.
 
     >>> _tuple_to_pair(('A', 'B'))
     Pair('A', 'B')
     """
-    return Pair(*t)
+    return Pair.from_sorted_names(*t)
 
 
 def calc_pairs_in_group(group: Group) -> Iterable[Pair]:
@@ -53,3 +55,20 @@ def calc_pairs_in_group_configs(group_configs: Iterable[GroupConfig]) -> \
         calc_pairs_in_group_config(group_config)
         for group_config in group_configs
     )
+
+
+def calc_index_pairs_in_group_config(
+        group_config: GroupConfig, indices: Mapping[str, int]
+) -> Iterable[Tuple[int, int]]:
+    """Yield all pairs in a group config in order as pairs of student indices.
+
+    >>> list(calc_index_pairs_in_group_config(
+    ...     GroupConfig(Group('A', 'B'), Group('C')),
+    ...     {'A': 0, 'B': 1, 'C': 2}))
+    [(0, 0), (0, 1), (1, 1), (2, 2)]
+    """
+    return chain.from_iterable(
+        combinations_with_replacement(
+            [indices[name] for name in group.names], 2
+        ) for group in group_config.groups
+    )
@@ -0,0 +1,384 @@
+"""Functions for finding groups using every core.
+
+Workers are sent the historical pair counts once, as a pair count matrix, and
+build their own score lookups from it. Exact searches share the best score any
+worker has found so far to prune with. Results are reduced in the order work
+was handed out so ties go the same way as on one core.
+"""
+import random
+import time
+from heapq import merge
+from itertools import combinations
+from multiprocessing import Lock
+from multiprocessing import RawArray
+from multiprocessing.pool import Pool
+from typing import Callable
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from .annealing import DEFAULT_ITERATIONS
+from .annealing import anneal_index_groups
+from .branch_and_bound import calc_lower_bound
+from .branch_and_bound import find_feasible_index_groups
+from .branch_and_bound import find_greedy_index_groups
+from .branch_and_bound import find_min_scoring_index_groups
+from .constraints import IndexConstraints
+from .generation import calc_group_sizes
+from .generation import chunk_index_groups
+from .generation import group_config_from_index_groups
+from .models import Group
+from .models import GroupConfig
+from .models import Pair
+from .models import PairCountMatrix
+from .models import PairCounts
+from .models import Students
+from .scoring import calc_index_cost_rows
+from .scoring import score_index_groups
+
+_INF = float('inf')
+
+
+class _SharedBest:
+    """The best score any worker has found so far, and the earliest search
+    that found it, in shared memory.
+
+    Each worker process sets which search it is running so groups tying an
+    earlier search's best can be skipped.
+    """
+
+    def __init__(self, upper_bound: float) -> None:
+        # Written search order first and read score first, so a reader never
+        # pairs a new score with a stale order.
+        self._score_and_search_order = RawArray('d', [upper_bound, _INF])
+        self._lock = Lock()
+        self.search_order = 0
+
+    def allows(self, score: float) -> bool:
+        """Return if groups with a score could still be the best."""
+        best_score = self._score_and_search_order[0]
+        best_search_order = self._score_and_search_order[1]
+        if score != best_score:
+            return score < best_score
+        return self.search_order < best_search_order
+
+    def offer(self, score: float) -> None:
+        """Record the score of groups found by the current search."""
+        with self._lock:
+            if self.allows(score):
+                self._score_and_search_order[1] = self.search_order
+                self._score_and_search_order[0] = score
+
+
+_worker_cost_rows = None  # type: Optional[List[List[int]]]
+_worker_shared_best = None  # type: Optional[_SharedBest]
+_worker_index_constraints = None  # type: Optional[IndexConstraints]
+
+
+def _init_worker(
+        historical_pair_count_matrix: PairCountMatrix,
+        shared_best: Optional[_SharedBest],
+        index_constraints: Optional[IndexConstraints]
+) -> None:
+    """Build the score lookups once in each worker process."""
+    global _worker_cost_rows, _worker_shared_best, _worker_index_constraints
+    _worker_cost_rows = calc_index_cost_rows(historical_pair_count_matrix)
+    _worker_shared_best = shared_best
+    _worker_index_constraints = index_constraints
+
+
+def _calc_first_index_groups(group_sizes:
+                             Sequence[int]) -> Iterable[Tuple[int, ...]]:
+    """Yield every possible first group of student indices in the order group
+    configs are generated.
+
+    >>> list(_calc_first_index_groups([2, 1]))
+    [(0,), (0, 1), (0, 2)]
+    """
+    student_count = sum(group_sizes)
+    return merge(
+        *(
+            ((0, ) + partners
+             for partners in combinations(range(1, student_count), size - 1))
+            for size in sorted(set(group_sizes))
+        )
+    )
+
+
+def _find_min_scoring_index_groups_in_worker(
+        task: Tuple[Sequence[int], Optional[float], int, Sequence[int]]
+) -> Tuple[List[List[int]], int, bool]:
+    """Search the group configs starting with one first group."""
+    group_sizes, deadline, search_order, first_index_group = task
+    _worker_shared_best.search_order = search_order
+    return find_min_scoring_index_groups(
+        _worker_cost_rows,
+        group_sizes,
+        first_index_group,
+        _worker_shared_best,
+        deadline,
+        index_constraints=_worker_index_constraints
+    )
+
+
+def _anneal_index_groups_in_worker(
+        task: Tuple[List[List[int]], int, Optional[float], float,
+                    Optional[int]]
+) -> Tuple[List[List[int]], int]:
+    """Run one simulated annealing restart."""
+    seed_index_groups, iterations, deadline, lower_bound, seed = task
+    return anneal_index_groups(
+        _worker_cost_rows,
+        seed_index_groups,
+        random.Random(seed),
+        iterations,
+        deadline,
+        lower_bound=lower_bound,
+        index_constraints=_worker_index_constraints
+    )
+
+
+def _make_pool(
+        jobs: int,
+        historical_pair_count_matrix: PairCountMatrix,
+        shared_best: Optional[_SharedBest] = None,
+        index_constraints: Optional[IndexConstraints] = None
+) -> Pool:
+    """Start worker processes that share the historical pair counts.
+
+    The shared best score can only be handed to a worker as it starts, which
+    a process pool executor can't do before Python 3.7.
+    """
+    return Pool(
+        jobs, _init_worker,
+        (historical_pair_count_matrix, shared_best, index_constraints)
+    )
+
+
+def _reduce_min_score_results(
+        results: Iterable[Tuple[Optional[List[List[int]]], float, bool]],
+        on_improvement: Optional[Callable[[List[List[int]], int], None]]
+) -> Tuple[Optional[List[List[int]]], float, bool]:
+    """Return the groups with the lowest score, earliest first on ties, their
+    score, and if every search finished.
+
+    Each time a result beats the results before it, it is passed to
+    `on_improvement`. Searches that found no groups are skipped.
+
+    >>> _reduce_min_score_results(
+    ...     [([[0]], 2, True), ([[1]], 1, False), ([[2]], 1, True),
+    ...      (None, _INF, True)], print)
+    [[0]] 2
+    [[1]] 1
+    ([[1]], 1, False)
+    >>> _reduce_min_score_results([], None)
+    (None, inf, True)
+    """
+    best_index_groups, best_score = None, _INF
+    all_finished = True
+    for index_groups, score, is_finished in results:
+        all_finished = all_finished and is_finished
+        if index_groups is not None and (
+                best_index_groups is None or score < best_score):
+            best_index_groups, best_score = index_groups, score
+            if on_improvement is not None:
+                on_improvement(best_index_groups, best_score)
+    return best_index_groups, best_score, all_finished
+
+
+def find_min_scoring_index_groups_parallel(
+        historical_pair_count_matrix: PairCountMatrix,
+        group_sizes: Sequence[int],
+        jobs: int,
+        deadline: Optional[float] = None,
+        on_improvement: Optional[Callable[[List[List[int]], int],
+                                          None]] = None,
+        index_constraints: Optional[IndexConstraints] = None
+) -> Tuple[Optional[List[List[int]]], float, bool]:
+    """Return the minimum-scoring groups of student indices of the given sizes,
+    their score, and if the search finished, searching the groups starting with
+    each possible first group in a separate process.
+
+    If the `time.monotonic` deadline passes, the best groups found so far are
+    returned instead. Better groups are passed to `on_improvement` as each
+    first group's search finishes. With index constraints, only groups that
+    follow them are searched. If the deadline passes before any groups that
+    follow them are found, the first groups that do are returned, and if there
+    are none, None and an infinite score are returned.
+
+    >>> find_min_scoring_index_groups_parallel(
+    ...     PairCountMatrix(
+    ...         Students('A', 'B', 'C'),
+    ...         (Pair('A', 'B'), 1), (Pair('B', 'C'), 1)),
+    ...     [2, 1],
+    ...     2)
+    ([[0, 2], [1]], 0, True)
+    """
+    if len(group_sizes) == 0:
+        return [], 0, True
+    first_index_groups = [
+        first_index_group
+        for first_index_group in _calc_first_index_groups(group_sizes)
+        if index_constraints is None or
+        index_constraints.allows_index_groups([first_index_group])
+    ]
+    cost_rows = calc_index_cost_rows(historical_pair_count_matrix)
+    greedy_index_groups = find_greedy_index_groups(cost_rows, group_sizes)
+    upper_bound = _INF
+    if index_constraints is None or index_constraints.allows_index_groups(
+            greedy_index_groups):
+        upper_bound = score_index_groups(cost_rows, greedy_index_groups)
+    shared_best = _SharedBest(upper_bound)
+    with _make_pool(
+            jobs, historical_pair_count_matrix, shared_best, index_constraints
+    ) as pool:
+        results = pool.imap(
+            _find_min_scoring_index_groups_in_worker, [
+                (group_sizes, deadline, search_order, first_index_group)
+                for search_order, first_index_group in enumerate(
+                    first_index_groups
+                )
+            ],
+            chunksize=max(len(first_index_groups) // (jobs * 4), 1)
+        )
+        index_groups, score, finished = _reduce_min_score_results(
+            results, on_improvement
+        )
+    if index_groups is None and not finished:
+        # Running out of time isn't proof that no groups follow the
+        # constraints, so look for any that do without a deadline.
+        index_groups = find_feasible_index_groups(
+            group_sizes, index_constraints
+        )
+        if index_groups is None:
+            return None, _INF, True
+        score = score_index_groups(cost_rows, index_groups)
+        if on_improvement is not None:
+            on_improvement(index_groups, score)
+    return index_groups, score, finished
+
+
+def anneal_index_groups_parallel(
+        historical_pair_count_matrix: PairCountMatrix,
+        group_sizes: Sequence[int],
+        jobs: int,
+        seed: Optional[int] = None,
+        iterations: int = DEFAULT_ITERATIONS,
+        deadline: Optional[float] = None,
+        on_improvement: Optional[Callable[[List[List[int]], int],
+                                          None]] = None,
+        index_constraints: Optional[IndexConstraints] = None
+) -> Tuple[Optional[List[List[int]]], float]:
+    """Return the lowest-scoring groups of student indices found by running an
+    independent simulated annealing restart in each process, and their score.
+
+    Restart seeds count up from the seed. Better groups are passed to
+    `on_improvement` as each restart finishes. With index constraints, every
+    restart starts from the first groups that follow them and only makes
+    swaps that keep following them; if there are none, None and an infinite
+    score are returned.
+
+    >>> anneal_index_groups_parallel(
+    ...     PairCountMatrix(
+    ...         Students('A', 'B', 'C', 'D'),
+    ...         (Pair('A', 'B'), 1), (Pair('A', 'D'), 1), (Pair('B', 'C'), 1),
+    ...         (Pair('C', 'D'), 1)),
+    ...     [2, 2],
+    ...     2,
+    ...     seed=0,
+    ...     iterations=1000)[1]
+    0
+    """
+    seeds = [
+        None if seed is None else seed + restart for restart in range(jobs)
+    ]
+    if index_constraints is None:
+        seed_index_groups = chunk_index_groups(group_sizes)
+    else:
+        seed_index_groups = find_feasible_index_groups(
+            group_sizes, index_constraints
+        )
+        if seed_index_groups is None:
+            return None, _INF
+    lower_bound = calc_lower_bound(
+        calc_index_cost_rows(historical_pair_count_matrix), group_sizes
+    )
+    with _make_pool(
+            jobs, historical_pair_count_matrix, None, index_constraints
+    ) as pool:
+        results = pool.imap(
+            _anneal_index_groups_in_worker, [
+                (seed_index_groups, iterations, deadline, lower_bound,
+                 restart_seed) for restart_seed in seeds
+            ]
+        )
+        index_groups, score, _ = _reduce_min_score_results(
+            (
+                (index_groups, score, True)
+                for index_groups, score in results
+            ), on_improvement
+        )
+    return index_groups, score
+
+
+def solve_for_min_scoring_groups_parallel(
+        students: Students, group_size: int,
+        historical_pair_counts: PairCounts, jobs: int
+) -> GroupConfig:
+    """Figure out what is the minimum-scoring group config out of all possible
+    group configs creatable from a list of students, searching the group
+    configs starting with each possible first group in a separate process.
+
+    Returns the same group config as `solve_for_min_scoring_groups`, or with
+    groups of two, one that ties with it.
+
+    >>> solve_for_min_scoring_groups_parallel(
+    ...     Students('A', 'B', 'C'),
+    ...     2,
+    ...     PairCounts((Pair('A', 'B'), 1), (Pair('B', 'C'), 1)),
+    ...     2)
+    GroupConfig(Group('A', 'C'), Group('B'))
+    """
+    index_groups, _, _ = find_min_scoring_index_groups_parallel(
+        PairCountMatrix.from_pair_counts(students, historical_pair_counts),
+        calc_group_sizes(len(students.names), group_size), jobs
+    )
+    return group_config_from_index_groups(students, index_groups)
+
+
+def solve_for_min_scoring_groups_annealing_parallel(
+        students: Students,
+        group_size: int,
+        historical_pair_counts: PairCounts,
+        jobs: int,
+        seed: Optional[int] = None,
+        iterations: int = DEFAULT_ITERATIONS,
+        time_limit: Optional[float] = None
+) -> GroupConfig:
+    """Search for a low-scoring group config of a list of students by running
+    an independent simulated annealing restart in each process.
+
+    Restart seeds count up from the seed.
+
+    >>> solve_for_min_scoring_groups_annealing_parallel(
+    ...     Students('A', 'B', 'C', 'D'),
+    ...     2,
+    ...     PairCounts(
+    ...         (Pair('A', 'B'), 1), (Pair('A', 'D'), 1), (Pair('B', 'C'), 1),
+    ...         (Pair('C', 'D'), 1)),
+    ...     2,
+    ...     seed=0,
+    ...     iterations=1000)
+    GroupConfig(Group('A', 'C'), Group('B', 'D'))
+    """
+    deadline = None
+    if time_limit is not None:
+        deadline = time.monotonic() + time_limit
+    index_groups, _ = anneal_index_groups_parallel(
+        PairCountMatrix.from_pair_counts(students, historical_pair_counts),
+        calc_group_sizes(len(students.names), group_size), jobs, seed,
+        iterations, deadline
+    )
+    return group_config_from_index_groups(students, index_groups)
@@ -0,0 +1,164 @@
+"""Functions for recording where the time of a run goes.
+
+Profiling is off until `start_profile` is called. While it is off, stages and
+counts cost one global lookup each, and solvers only report counts once per
+search, so nothing is added inside their loops.
+"""
+import sys
+import time
+from collections import Counter
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterator
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+_active_profile = None  # type: Optional[Profile]
+
+
+def get_peak_rss_bytes() -> Optional[int]:
+    """Return the most memory this process has had resident so far, or None
+    if the platform can't tell.
+    """
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, everything else kilobytes.
+    if sys.platform == 'darwin':
+        return peak_rss
+    return peak_rss * 1024
+
+
+class Profile:
+    """The wall time of each stage of a run and counts of the work done.
+
+    Each hook is called with a stage's name and wall time in seconds when it
+    finishes.
+    """
+
+    def __init__(self, *hooks: Callable[[str, float], None]) -> None:
+        """Make a new empty profile.
+
+        >>> profile = Profile(print)
+        >>> with profile.stage('nothing'):
+        ...     pass  # doctest: +ELLIPSIS
+        nothing ...
+        >>> list(profile.stage_seconds)
+        ['nothing']
+        """
+        self.hooks = hooks
+        self.stage_seconds = OrderedDict()  # type: Dict[str, float]
+        self.counts = Counter()  # type: Counter
+        self.peak_rss_bytes = get_peak_rss_bytes()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the body of a with block as a named stage.
+
+        Running a stage again adds to its time.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.stage_seconds[name] = self.stage_seconds.get(
+                name, 0.0
+            ) + seconds
+            self.peak_rss_bytes = get_peak_rss_bytes()
+            for hook in self.hooks:
+                hook(name, seconds)
+
+    def add_counts(self, **counts: int) -> None:
+        """Add to the named counts of work done.
+
+        >>> profile = Profile()
+        >>> profile.add_counts(pairs_scored=2)
+        >>> profile.add_counts(pairs_scored=1, group_configs_scored=1)
+        >>> sorted(profile.counts.items())
+        [('group_configs_scored', 1), ('pairs_scored', 3)]
+        """
+        self.counts.update(counts)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the profile ready to be dumped as JSON."""
+        return {
+            'stage_seconds': dict(self.stage_seconds),
+            'counts': dict(self.counts),
+            'peak_rss_bytes': self.peak_rss_bytes,
+        }
+
+    def format_summary(self) -> str:
+        """Return a human readable summary of the profile.
+
+        >>> profile = Profile()
+        >>> profile.stage_seconds['solve'] = 1.5
+        >>> profile.add_counts(pairs_scored=3)
+        >>> profile.peak_rss_bytes = 2 * 1024 * 1024
+        >>> print(profile.format_summary())
+        solve: 1.500000s
+        pairs_scored: 3
+        peak RSS: 2.0 MiB
+        """
+        lines = [
+            '{}: {:.6f}s'.format(name, seconds)
+            for name, seconds in self.stage_seconds.items()
+        ]
+        lines.extend(
+            '{}: {}'.format(name, count)
+            for name, count in sorted(self.counts.items())
+        )
+        if self.peak_rss_bytes is not None:
+            lines.append(
+                'peak RSS: {:.1f} MiB'.format(
+                    self.peak_rss_bytes / (1024 * 1024)
+                )
+            )
+        return '\n'.join(lines)
+
+
+def start_profile(*hooks: Callable[[str, float], None]) -> Profile:
+    """Start recording stages and counts into a new profile and return it."""
+    global _active_profile
+    _active_profile = Profile(*hooks)
+    return _active_profile
+
+
+def stop_profile() -> Optional[Profile]:
+    """Stop recording and return the profile that was being recorded into."""
+    global _active_profile
+    profile, _active_profile = _active_profile, None
+    return profile
+
+
+@contextmanager
+def profile_stage(name: str) -> Iterator[None]:
+    """Time the body of a with block as a named stage of the active profile,
+    if any.
+
+    >>> with profile_stage('nothing'):
+    ...     pass
+    >>> profile = start_profile()
+    >>> with profile_stage('something'):
+    ...     pass
+    >>> stop_profile() is profile, list(profile.stage_seconds)
+    (True, ['something'])
+    """
+    if _active_profile is None:
+        yield
+        return
+    with _active_profile.stage(name):
+        yield
+
+
+def add_counts(**counts: int) -> None:
+    """Add to the named counts of work done in the active profile, if any."""
+    if _active_profile is not None:
+        _active_profile.add_counts(**counts)
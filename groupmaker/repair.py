@@ -0,0 +1,513 @@
+"""Functions for repairing groups after the class roster changes.
+
+Students who left are taken out of their groups and students who joined are
+added without solving from scratch. Only a small region of groups is searched:
+the groups that lost students, any group whose size no longer fits, and the
+neighbouring groups whose students have worked least with the students who
+need a new place. Every other group is kept as is.
+
+Small regions are searched exhaustively. Regions with too many group configs
+to score are instead improved by swapping students between their groups,
+starting from the groups that keep the most students in place.
+"""
+from collections import Counter
+from math import factorial
+from typing import Callable
+from typing import FrozenSet
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from .generation import generate_all_group_configs
+from .generation import group_config_from_index_groups
+from .generation import resolve_group_sizes
+from .models import Group
+from .models import GroupConfig
+from .models import Pair
+from .models import PairCountMatrix
+from .models import PairCounts
+from .models import Solution
+from .models import Students
+from .profiling import add_counts
+from .scoring import calc_index_cost_rows
+from .scoring import make_group_config_scorer
+from .scoring import score_group_config
+from .scoring import score_index_groups
+
+DEFAULT_NEIGHBOUR_COUNT = 1
+# Regions with more group configs than this are searched by swapping students
+# instead.
+MAX_EXHAUSTIVE_REPAIR_GROUP_CONFIGS = 2000
+
+_INF = float('inf')
+
+
+def _assign_max_weight(weight_rows: Sequence[Sequence[int]]) -> List[int]:
+    """Return the column assigned to each row so the total weight is the most,
+    using each column at most once, by the Hungarian algorithm.
+
+    There must be no more rows than columns.
+
+    >>> _assign_max_weight([[1, 3, 0], [2, 4, 1]])
+    [1, 0]
+    >>> _assign_max_weight([])
+    []
+    """
+    row_count = len(weight_rows)
+    if row_count == 0:
+        return []
+    column_count = len(weight_rows[0])
+    # Potentials and matches are 1-based, with row and column 0 standing for
+    # none.
+    row_potentials = [0] * (row_count + 1)
+    column_potentials = [0] * (column_count + 1)
+    column_rows = [0] * (column_count + 1)
+    previous_columns = [0] * (column_count + 1)
+    for row in range(1, row_count + 1):
+        column_rows[0] = row
+        column = 0
+        min_slacks = [_INF] * (column_count + 1)
+        used = [False] * (column_count + 1)
+        while column_rows[column] != 0:
+            used[column] = True
+            used_row = column_rows[column]
+            delta = _INF
+            next_column = 0
+            for other_column in range(1, column_count + 1):
+                if used[other_column]:
+                    continue
+                slack = (
+                    -weight_rows[used_row - 1][other_column - 1] -
+                    row_potentials[used_row] -
+                    column_potentials[other_column]
+                )
+                if slack < min_slacks[other_column]:
+                    min_slacks[other_column] = slack
+                    previous_columns[other_column] = column
+                if min_slacks[other_column] < delta:
+                    delta = min_slacks[other_column]
+                    next_column = other_column
+            for other_column in range(column_count + 1):
+                if used[other_column]:
+                    row_potentials[column_rows[other_column]] += delta
+                    column_potentials[other_column] -= delta
+                else:
+                    min_slacks[other_column] -= delta
+            column = next_column
+        while column != 0:
+            previous_column = previous_columns[column]
+            column_rows[column] = column_rows[previous_column]
+            column = previous_column
+    row_columns = [0] * row_count
+    for column in range(1, column_count + 1):
+        if column_rows[column] != 0:
+            row_columns[column_rows[column] - 1] = column - 1
+    return row_columns
+
+
+def _find_retained_names(
+        old_groups: Sequence[FrozenSet[str]],
+        new_groups: Sequence[FrozenSet[str]]
+) -> FrozenSet[str]:
+    """Return the most students that can stay with their old group, where
+    each new group takes the place of a different old group.
+
+    >>> sorted(_find_retained_names(
+    ...     [frozenset('AB'), frozenset('CD')],
+    ...     [frozenset('C'), frozenset('ABE'), frozenset('D')]))
+    ['A', 'B', 'C']
+    """
+    if len(old_groups) < len(new_groups):
+        old_groups, new_groups = new_groups, old_groups
+    old_indices = _assign_max_weight(
+        [
+            [len(old_group & new_group) for old_group in old_groups]
+            for new_group in new_groups
+        ]
+    )
+    return frozenset().union(
+        *(
+            old_groups[old_index] & new_group
+            for old_index, new_group in zip(old_indices, new_groups)
+        )
+    )
+
+
+def _count_group_configs(group_sizes: Sequence[int]) -> int:
+    """Return how many group configs of the given group sizes there are.
+
+    >>> _count_group_configs([2, 2])
+    3
+    >>> _count_group_configs([3, 3, 3, 3])
+    15400
+    """
+    count = factorial(sum(group_sizes))
+    for size in group_sizes:
+        count //= factorial(size)
+    for size_count in Counter(group_sizes).values():
+        count //= factorial(size_count)
+    return count
+
+
+def _seed_region_index_groups(
+        old_index_groups: Sequence[Sequence[int]],
+        joined_indices: Sequence[int],
+        group_sizes: Sequence[int]
+) -> List[List[int]]:
+    """Return groups of the given sizes that keep students with their old
+    group where they can, the largest old group filling the largest group.
+
+    >>> _seed_region_index_groups([[1, 2], [3]], [0], [2, 2])
+    [[1, 2], [3, 0]]
+    >>> _seed_region_index_groups([[1, 2, 3], [4]], [0], [2, 2, 1])
+    [[1, 2], [4, 3], [0]]
+    """
+    sorted_old_index_groups = sorted(old_index_groups, key=len, reverse=True)
+    sorted_sizes = sorted(group_sizes, reverse=True)
+    index_groups = []  # type: List[List[int]]
+    free_indices = []  # type: List[int]
+    for position, size in enumerate(sorted_sizes):
+        old_index_group = []  # type: Sequence[int]
+        if position < len(sorted_old_index_groups):
+            old_index_group = sorted_old_index_groups[position]
+        index_groups.append(list(old_index_group[:size]))
+        free_indices.extend(old_index_group[size:])
+    for old_index_group in sorted_old_index_groups[len(sorted_sizes):]:
+        free_indices.extend(old_index_group)
+    free_indices.extend(joined_indices)
+    for index_group, size in zip(index_groups, sorted_sizes):
+        while len(index_group) < size:
+            index_group.append(free_indices.pop(0))
+    return index_groups
+
+
+def _swap_region_index_groups(
+        cost_rows: List[List[int]],
+        index_groups: List[List[int]],
+        calc_moved_count: Callable[[List[List[int]]], int],
+        max_moves: Optional[int]
+) -> None:
+    """Swap students between groups in place while a swap lowers the score,
+    or moves fewer students without raising it, taking the best swap each
+    time. Groups moving more than the max moves are first brought under it.
+    """
+
+    def _calc_key(index_groups: List[List[int]],
+                  score: int) -> Tuple[int, int, int]:
+        moved_count = calc_moved_count(index_groups)
+        excess_count = 0
+        if max_moves is not None:
+            excess_count = max(moved_count - max_moves, 0)
+        return excess_count, score, moved_count
+
+    key = _calc_key(index_groups, score_index_groups(cost_rows, index_groups))
+    swap_count = 0
+    while True:
+        best_key, best_swap = key, None
+        for group_a, index_group_a in enumerate(index_groups):
+            for group_b in range(group_a + 1, len(index_groups)):
+                index_group_b = index_groups[group_b]
+                for position_a, index_a in enumerate(index_group_a):
+                    costs_a = cost_rows[index_a]
+                    for position_b, index_b in enumerate(index_group_b):
+                        costs_b = cost_rows[index_b]
+                        delta = sum(
+                            costs_b[index] - costs_a[index]
+                            for index in index_group_a if index != index_a
+                        ) + sum(
+                            costs_a[index] - costs_b[index]
+                            for index in index_group_b if index != index_b
+                        )
+                        # Only swaps that could beat the best so far need
+                        # their moved students counted.
+                        if best_key[0] == 0 and \
+                                key[1] + delta > best_key[1]:
+                            continue
+                        index_group_a[position_a] = index_b
+                        index_group_b[position_b] = index_a
+                        swapped_key = _calc_key(index_groups, key[1] + delta)
+                        index_group_a[position_a] = index_a
+                        index_group_b[position_b] = index_b
+                        if swapped_key < best_key:
+                            best_key = swapped_key
+                            best_swap = (
+                                group_a, position_a, group_b, position_b
+                            )
+        if best_swap is None:
+            break
+        group_a, position_a, group_b, position_b = best_swap
+        index_groups[group_a][position_a], \
+            index_groups[group_b][position_b] = \
+            index_groups[group_b][position_b], \
+            index_groups[group_a][position_a]
+        key = best_key
+        swap_count += 1
+    add_counts(repair_swaps=swap_count)
+
+
+def _calc_neighbour_order(
+        kept_groups: Sequence[Tuple[int, Tuple[str, ...]]],
+        free_names: Sequence[str],
+        historical_pair_counts: PairCounts
+) -> List[int]:
+    """Return the indices of kept groups, those whose students have been
+    paired least with the free students first.
+
+    >>> _calc_neighbour_order(
+    ...     [(0, ('A', 'B')), (1, ('C', 'D'))], ['E'],
+    ...     PairCounts((Pair('A', 'E'), 2)))
+    [1, 0]
+    """
+
+    def _calc_affinity(kept_group: Tuple[int, Tuple[str, ...]]) -> int:
+        _, names = kept_group
+        return sum(
+            min(
+                (
+                    historical_pair_counts.get_count(Pair(name, free_name))
+                    for free_name in free_names
+                ),
+                default=0
+            ) for name in names
+        )
+
+    return [
+        index for index, _ in sorted(kept_groups, key=_calc_affinity)
+    ]
+
+
+def repair_group_config(
+        group_config: GroupConfig,
+        students: Students,
+        group_size: int,
+        historical_pair_counts: PairCounts,
+        max_moves: Optional[int] = None,
+        neighbour_count: int = DEFAULT_NEIGHBOUR_COUNT,
+        group_sizes: Optional[Sequence[int]] = None
+) -> Tuple[Solution, List[str]]:
+    """Change a group config to fit a new list of students, and return it as
+    a solution along with the names of the students who changed groups.
+
+    Only groups in the repaired region change. Within it, the lowest-scoring
+    group config is chosen, moving as few students as possible on ties and
+    never more than the max moves. Regions with too many group configs to
+    score get a low-scoring group config found by swapping students instead.
+    Students who joined don't count as moving. The repaired groups have the
+    given group sizes, or if there are none, the sizes chunking every group
+    size makes.
+
+    >>> solution, moved_names = repair_group_config(
+    ...     GroupConfig(Group('A', 'B'), Group('C', 'D'), Group('E', 'F')),
+    ...     Students('A', 'C', 'D', 'E', 'F', 'G'),
+    ...     2,
+    ...     PairCounts((Pair('A', 'G'), 1)),
+    ...     neighbour_count=0)
+    >>> solution
+    Solution(GroupConfig(Group('A', 'G'), Group('C', 'D'), Group('E', 'F')), 1, False)
+    >>> moved_names
+    []
+    >>> solution, moved_names = repair_group_config(
+    ...     GroupConfig(Group('A', 'B'), Group('C', 'D'), Group('E', 'F')),
+    ...     Students('A', 'C', 'D', 'E', 'F', 'G'),
+    ...     2,
+    ...     PairCounts((Pair('A', 'G'), 1)))
+    >>> solution.group_config
+    GroupConfig(Group('A', 'C'), Group('D', 'G'), Group('E', 'F'))
+    >>> moved_names
+    ['C']
+    >>> repair_group_config(
+    ...     GroupConfig(Group('A', 'B'), Group('C', 'D'), Group('E', 'F')),
+    ...     Students('A', 'C', 'D', 'E', 'F', 'G'),
+    ...     2,
+    ...     PairCounts((Pair('A', 'G'), 1)),
+    ...     max_moves=0)[0].group_config
+    GroupConfig(Group('A', 'G'), Group('C', 'D'), Group('E', 'F'))
+    >>> repair_group_config(
+    ...     GroupConfig(Group('A', 'B'), Group('C', 'D'), Group('E')),
+    ...     Students('A', 'B', 'C', 'D'),
+    ...     2,
+    ...     PairCounts((Pair('A', 'B'), 1)))
+    (Solution(GroupConfig(Group('A', 'B'), Group('C', 'D')), 1, False), [])
+    >>> repair_group_config(
+    ...     GroupConfig(Group('A', 'B'), Group('C', 'D'), Group('E', 'F')),
+    ...     Students('A', 'B', 'E', 'F'),
+    ...     2,
+    ...     PairCounts())
+    (Solution(GroupConfig(Group('A', 'B'), Group('E', 'F')), 0, False), [])
+    >>> repair_group_config(
+    ...     GroupConfig(Group('A', 'B')), Students('A', 'B'), 2, PairCounts(),
+    ...     neighbour_count=-1)
+    Traceback (most recent call last):
+        ...
+    ValueError: neighbour count must be at least 0: -1
+    """
+    if max_moves is not None and max_moves < 0:
+        raise ValueError(
+            'max moves must be at least 0: {}'.format(max_moves)
+        )
+    if neighbour_count < 0:
+        raise ValueError(
+            'neighbour count must be at least 0: {}'.format(neighbour_count)
+        )
+    names = frozenset(students.names)
+    old_names = frozenset(
+        name for group in group_config.groups for name in group.names
+    )
+    joined_names = sorted(names - old_names)
+    remaining_groups = [
+        tuple(name for name in group.names if name in names)
+        for group in group_config.groups
+    ]
+    region = {
+        index
+        for index, group in enumerate(group_config.groups)
+        if len(remaining_groups[index]) != len(group.names)
+    }
+
+    # Groups outside the region have to be groups a solve could make.
+    target_sizes = Counter(
+        resolve_group_sizes(len(names), group_size, group_sizes)
+    )
+    while True:
+        kept_indices = [
+            index for index in range(len(remaining_groups))
+            if index not in region
+        ]
+        extra_sizes = Counter(
+            len(remaining_groups[index]) for index in kept_indices
+        ) - target_sizes
+        if len(extra_sizes) == 0:
+            break
+        region.add(
+            next(
+                index for index in kept_indices
+                if len(remaining_groups[index]) in extra_sizes
+            )
+        )
+
+    free_names = joined_names + [
+        name for index in sorted(region) for name in remaining_groups[index]
+    ]
+    if len(free_names) == 0:
+        # Only whole groups left, so the rest of the groups stay as they are.
+        kept_group_config = GroupConfig(
+            *(
+                Group(*remaining_group)
+                for remaining_group in remaining_groups
+                if len(remaining_group) != 0
+            )
+        )
+        return Solution(
+            kept_group_config,
+            score_group_config(kept_group_config, historical_pair_counts),
+            False
+        ), []
+    region.update(
+        _calc_neighbour_order(
+            [
+                (index, remaining_groups[index]) for index in kept_indices
+            ], free_names, historical_pair_counts
+        )[:neighbour_count]
+    )
+
+    old_region_groups = [
+        frozenset(remaining_groups[index]) for index in sorted(region)
+    ]
+    region_students = Students(
+        *(joined_names + [name for group in old_region_groups
+                          for name in group])
+    )
+    staying_count = len(region_students.names) - len(joined_names)
+    region_pair_count_matrix = PairCountMatrix.from_pair_counts(
+        region_students, historical_pair_counts
+    )
+    best_key = None  # type: Optional[Tuple[int, int]]
+    best_groups = ()  # type: Tuple[Group, ...]
+    best_retained_names = frozenset()  # type: FrozenSet[str]
+    region_sizes = list((target_sizes - Counter(
+        len(remaining_groups[index]) for index in range(len(remaining_groups))
+        if index not in region
+    )).elements())
+    if _count_group_configs(region_sizes) > \
+            MAX_EXHAUSTIVE_REPAIR_GROUP_CONFIGS:
+        region_names = region_students.names
+        region_indices = region_pair_count_matrix.indices
+
+        def _calc_moved_count(index_groups: List[List[int]]) -> int:
+            return staying_count - len(
+                _find_retained_names(
+                    old_region_groups, [
+                        frozenset(region_names[index] for index in index_group)
+                        for index_group in index_groups
+                    ]
+                )
+            )
+
+        index_groups = _seed_region_index_groups(
+            [
+                sorted(region_indices[name] for name in old_group)
+                for old_group in old_region_groups
+            ], [region_indices[name] for name in joined_names], region_sizes
+        )
+        _swap_region_index_groups(
+            calc_index_cost_rows(region_pair_count_matrix), index_groups,
+            _calc_moved_count, max_moves
+        )
+        moved_count = _calc_moved_count(index_groups)
+        if max_moves is None or moved_count <= max_moves:
+            region_group_config = group_config_from_index_groups(
+                region_students, index_groups
+            )
+            best_key = (0, moved_count)
+            best_groups = region_group_config.groups
+            best_retained_names = _find_retained_names(
+                old_region_groups, [
+                    frozenset(group.names)
+                    for group in region_group_config.groups
+                ]
+            )
+    else:
+        score_region_group_config = make_group_config_scorer(
+            region_pair_count_matrix
+        )
+        for region_group_config in generate_all_group_configs(
+                region_students, group_size, group_sizes=region_sizes):
+            score = score_region_group_config(region_group_config)
+            if best_key is not None and score > best_key[0]:
+                continue
+            retained_names = _find_retained_names(
+                old_region_groups, [
+                    frozenset(group.names)
+                    for group in region_group_config.groups
+                ]
+            )
+            moved_count = staying_count - len(retained_names)
+            if max_moves is not None and moved_count > max_moves:
+                continue
+            if best_key is None or (score, moved_count) < best_key:
+                best_key = (score, moved_count)
+                best_groups = region_group_config.groups
+                best_retained_names = retained_names
+    if best_key is None:
+        raise ValueError(
+            'no repair moves at most {} students'.format(max_moves)
+        )
+
+    repaired_group_config = GroupConfig(
+        *(
+            [group_config.groups[index] for index in range(
+                len(remaining_groups)
+            ) if index not in region] + list(best_groups)
+        )
+    )
+    moved_names = sorted(
+        frozenset(
+            name for group in old_region_groups for name in group
+        ) - best_retained_names
+    )
+    return Solution(
+        repaired_group_config,
+        score_group_config(repaired_group_config, historical_pair_counts),
+        False
+    ), moved_names
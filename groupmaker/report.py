@@ -0,0 +1,405 @@
+"""Functions to report on the pair counts of a class, however large.
+
+Every report reads the packed counts of a pair count matrix directly, a row at
+a time, so no pairs are made for pairs that are not reported. The full matrix
+is streamed out row by row rather than built as a table first, and big classes
+can be summed up by their most repeated pairs or by student instead.
+
+Table printing and the export formats import their modules where they are
+used, so the command line script can read the view names without slowing its
+start.
+"""
+import sys
+from array import array
+from heapq import nlargest
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from .models import Pair
+from .models import PairCountMatrix
+from .models import Students
+
+REPORT_VIEW_NAMES = ('matrix', 'top', 'students')
+EXPORT_EXTENSIONS = ('.csv', '.npy')
+DEFAULT_TOP_PAIR_COUNT = 10
+# Classes larger than this get the top pairs by default instead of a matrix
+# too wide for a terminal.
+MAX_MATRIX_STUDENT_COUNT = 20
+
+_NPY_DESCRS = {'q': '<i8', 'd': '<f8'}
+
+
+def choose_report_view(student_count: int) -> str:
+    """Return the report view to show for a class with no view asked for.
+
+    >>> choose_report_view(4)
+    'matrix'
+    >>> choose_report_view(300)
+    'top'
+    """
+    if student_count > MAX_MATRIX_STUDENT_COUNT:
+        return 'top'
+    return 'matrix'
+
+
+def iter_count_rows(
+        pair_count_matrix: PairCountMatrix
+) -> Iterable[Tuple[str, List[int]]]:
+    """Yield each student's name and counts with every student, in class
+    order, one row at a time.
+
+    >>> list(iter_count_rows(PairCountMatrix(
+    ...     Students('A', 'B'), (Pair('A', 'B'), 2))))
+    [('A', [0, 2]), ('B', [2, 0])]
+    """
+    for index, name in enumerate(pair_count_matrix.students.names):
+        yield name, pair_count_matrix.get_row(index)
+
+
+def _format_count(count: float) -> str:
+    """Format a count like tabulate does, with whole floats left whole.
+
+    >>> _format_count(2), _format_count(0.5), _format_count(2.0)
+    ('2', '0.5', '2')
+    >>> _format_count(12345678), _format_count(12345678.0)
+    ('12345678', '1.23457e+07')
+    """
+    if isinstance(count, int):
+        return str(count)
+    return '{:g}'.format(count)
+
+
+def _count_decimal_places(count_text: str) -> int:
+    """Return how many characters follow the decimal point of a formatted
+    count, or its exponent if it has no point, or -1 if it has neither.
+
+    Like tabulate, counts are aligned on their decimal points by padding them
+    on the right up to the most decimal places in their column.
+
+    >>> (_count_decimal_places('12'), _count_decimal_places('0.25'),
+    ...  _count_decimal_places('1e-07'), _count_decimal_places('1.5e-07'))
+    (-1, 2, 3, 5)
+    """
+    position = count_text.rfind('.')
+    if position < 0:
+        position = count_text.rfind('e')
+    if position < 0:
+        return -1
+    return len(count_text) - position - 1
+
+
+def print_pair_count_matrix(
+        pair_count_matrix: PairCountMatrix, file=None
+) -> None:
+    """Print out a matrix of pair counts of all students, a row at a time.
+
+    Column widths and decimal places come from one pass over the packed
+    counts, so only one row of the matrix is held at once.
+
+    >>> print_pair_count_matrix(PairCountMatrix(
+    ...     Students('A', 'Bo'), (Pair('A', 'A'), 12), (Pair('A', 'Bo'), 1)))
+    +----+-----+------+
+    |    |   A |   Bo |
+    |----+-----+------|
+    | A  |  12 |    1 |
+    | Bo |   1 |    0 |
+    +----+-----+------+
+    >>> print_pair_count_matrix(PairCountMatrix(
+    ...     Students('A', 'B'), (Pair('A', 'A'), 1.25), (Pair('A', 'B'), 0.5),
+    ...     (Pair('B', 'B'), 10.0)))
+    +----+------+------+
+    |    |    A |    B |
+    |----+------+------|
+    | A  | 1.25 |  0.5 |
+    | B  | 0.5  | 10   |
+    +----+------+------+
+    """
+    if file is None:
+        file = sys.stdout
+    names = pair_count_matrix.students.names
+    packed_counts = pair_count_matrix.get_packed_counts()
+    # Headers get two extra spaces, like tabulate.
+    name_width = max([len(name) for name in names] + [2])
+    whole_widths = [0] * len(names)
+    decimal_places = [-1] * len(names)
+    position = 0
+    for index_a in range(len(names)):
+        for index_b in range(index_a, len(names)):
+            count_text = _format_count(packed_counts[position])
+            position += 1
+            places = _count_decimal_places(count_text)
+            for index in (index_a, index_b):
+                whole_widths[index] = max(
+                    whole_widths[index], len(count_text) - places
+                )
+                decimal_places[index] = max(decimal_places[index], places)
+    widths = [
+        max(len(name) + 2, whole_width + places)
+        for name, whole_width, places in zip(
+            names, whole_widths, decimal_places
+        )
+    ]
+
+    rule = '+'.join(['-' * (name_width + 2)] +
+                    ['-' * (width + 2) for width in widths])
+    print('+{}+'.format(rule), file=file)
+    print(
+        '| {} |'.format(
+            ' | '.join([' ' * name_width] + [
+                name.rjust(width) for name, width in zip(names, widths)
+            ])
+        ),
+        file=file
+    )
+    print('|{}|'.format(rule), file=file)
+    for name, counts in iter_count_rows(pair_count_matrix):
+        row_texts = [name.ljust(name_width)]
+        for count, width, places in zip(counts, widths, decimal_places):
+            count_text = _format_count(count)
+            row_texts.append(
+                (
+                    count_text + ' ' *
+                    (places - _count_decimal_places(count_text))
+                ).rjust(width)
+            )
+        print('| {} |'.format(' | '.join(row_texts)), file=file)
+    print('+{}+'.format(rule), file=file)
+
+
+def find_top_pairs(
+        pair_count_matrix: PairCountMatrix,
+        top_count: int = DEFAULT_TOP_PAIR_COUNT
+) -> List[Tuple[Pair, int]]:
+    """Return the pairs of different students that have been paired the most,
+    most first, up to the top count.
+
+    Pairs never paired are left out, and ties are in sorted order.
+
+    >>> find_top_pairs(PairCountMatrix(
+    ...     Students('A', 'B', 'C'), (Pair('A', 'A'), 5), (Pair('A', 'C'), 1),
+    ...     (Pair('B', 'C'), 2), (Pair('A', 'B'), 1)), 2)
+    [(Pair('B', 'C'), 2), (Pair('A', 'B'), 1)]
+    """
+    names = pair_count_matrix.students.names
+    packed_counts = pair_count_matrix.get_packed_counts()
+
+    def _iter_index_counts() -> Iterable[Tuple[int, int, int]]:
+        position = 0
+        for index_a in range(len(names)):
+            # Skip the student's count with themselves.
+            position += 1
+            for index_b in range(index_a + 1, len(names)):
+                count = packed_counts[position]
+                position += 1
+                if count != 0:
+                    yield count, index_a, index_b
+
+    return [
+        (Pair.from_sorted_names(names[index_a], names[index_b]), count)
+        for count, index_a, index_b in nlargest(
+            top_count, _iter_index_counts(), key=lambda entry: entry[0]
+        )
+    ]
+
+
+def print_top_pairs(
+        pair_count_matrix: PairCountMatrix,
+        top_count: int = DEFAULT_TOP_PAIR_COUNT,
+        file=None
+) -> None:
+    """Print out the pairs of different students that have been paired the
+    most.
+
+    >>> print_top_pairs(PairCountMatrix(
+    ...     Students('A', 'B', 'C'), (Pair('A', 'C'), 1), (Pair('B', 'C'), 2)))
+    +-----------+-----------+---------+
+    | student   | student   |   count |
+    |-----------+-----------+---------|
+    | B         | C         |       2 |
+    | A         | C         |       1 |
+    +-----------+-----------+---------+
+    """
+    from tabulate import tabulate
+    print(
+        tabulate(
+            [
+                list(pair.names) + [count] for pair, count in
+                find_top_pairs(pair_count_matrix, top_count)
+            ], ['student', 'student', 'count'],
+            tablefmt='psql'
+        ),
+        file=file
+    )
+
+
+def calc_student_pair_summaries(
+        pair_count_matrix: PairCountMatrix
+) -> Iterable[Tuple[str, int, int, Optional[str], int]]:
+    """Yield for each student their name, how many other students they have
+    been paired with, their total count with other students, and who they
+    have been paired with most and how often.
+
+    Students never paired with anyone have been paired most with nobody.
+
+    >>> list(calc_student_pair_summaries(PairCountMatrix(
+    ...     Students('A', 'B', 'C'), (Pair('A', 'A'), 5), (Pair('A', 'B'), 1),
+    ...     (Pair('A', 'C'), 2))))
+    [('A', 2, 3, 'C', 2), ('B', 1, 1, 'A', 1), ('C', 1, 2, 'A', 2)]
+    >>> list(calc_student_pair_summaries(PairCountMatrix(Students('A'))))
+    [('A', 0, 0, None, 0)]
+    """
+    names = pair_count_matrix.students.names
+    for index, (name, counts) in enumerate(iter_count_rows(pair_count_matrix)):
+        counts[index] = 0
+        most_count = max(counts, default=0)
+        most_name = None  # type: Optional[str]
+        if most_count != 0:
+            most_name = names[counts.index(most_count)]
+        yield (
+            name, sum(1 for count in counts if count != 0), sum(counts),
+            most_name, most_count
+        )
+
+
+def print_student_pair_summaries(
+        pair_count_matrix: PairCountMatrix, file=None
+) -> None:
+    """Print out how many students and how often each student has been paired
+    with, and who they have been paired with most.
+
+    >>> print_student_pair_summaries(PairCountMatrix(
+    ...     Students('A', 'B', 'C'), (Pair('A', 'B'), 1), (Pair('A', 'C'), 2)))
+    +-----------+------------+---------+-------------+--------------+
+    | student   |   partners |   total | most with   |   most count |
+    |-----------+------------+---------+-------------+--------------|
+    | A         |          2 |       3 | C           |            2 |
+    | B         |          1 |       1 | A           |            1 |
+    | C         |          1 |       2 | A           |            2 |
+    +-----------+------------+---------+-------------+--------------+
+    """
+    from tabulate import tabulate
+    print(
+        tabulate(
+            list(calc_student_pair_summaries(pair_count_matrix)), [
+                'student', 'partners', 'total', 'most with', 'most count'
+            ],
+            tablefmt='psql'
+        ),
+        file=file
+    )
+
+
+def print_pair_report(
+        pair_count_matrix: PairCountMatrix,
+        view: Optional[str] = None,
+        top_count: int = DEFAULT_TOP_PAIR_COUNT,
+        file=None
+) -> None:
+    """Print out one of the report views of pair counts, or the view that
+    suits the size of the class.
+
+    >>> print_pair_report(PairCountMatrix(
+    ...     Students('A', 'B'), (Pair('A', 'B'), 1)), 'top', top_count=1)
+    +-----------+-----------+---------+
+    | student   | student   |   count |
+    |-----------+-----------+---------|
+    | A         | B         |       1 |
+    +-----------+-----------+---------+
+    >>> print_pair_report(PairCountMatrix(Students('A')), 'rows')
+    Traceback (most recent call last):
+        ...
+    ValueError: unknown report view: 'rows'
+    """
+    if view is None:
+        view = choose_report_view(len(pair_count_matrix.students.names))
+    if view == 'matrix':
+        print_pair_count_matrix(pair_count_matrix, file)
+    elif view == 'top':
+        print_top_pairs(pair_count_matrix, top_count, file)
+    elif view == 'students':
+        print_student_pair_summaries(pair_count_matrix, file)
+    else:
+        raise ValueError('unknown report view: {!r}'.format(view))
+
+
+def write_pair_count_csv(pair_count_matrix: PairCountMatrix, file) -> None:
+    """Write the full matrix of pair counts as CSV, with student names as the
+    first row and column, a row at a time.
+
+    >>> import io
+    >>> csv_file = io.StringIO()
+    >>> write_pair_count_csv(PairCountMatrix(
+    ...     Students('A', 'B'), (Pair('A', 'B'), 2)), csv_file)
+    >>> print(csv_file.getvalue().replace('\\r\\n', '\\n'), end='')
+    ,A,B
+    A,0,2
+    B,2,0
+    """
+    import csv
+    writer = csv.writer(file)
+    writer.writerow([''] + list(pair_count_matrix.students.names))
+    for name, counts in iter_count_rows(pair_count_matrix):
+        writer.writerow([name] + counts)
+
+
+def write_pair_count_npy(pair_count_matrix: PairCountMatrix, file) -> None:
+    """Write the full matrix of pair counts as a NumPy `.npy` array, a row at
+    a time, without needing NumPy.
+
+    Rows and columns are in class order. Whole counts are 64-bit integers and
+    fractional counts 64-bit floats.
+
+    >>> import io
+    >>> npy_file = io.BytesIO()
+    >>> write_pair_count_npy(PairCountMatrix(
+    ...     Students('A', 'B'), (Pair('A', 'B'), 2)), npy_file)
+    >>> npy_bytes = npy_file.getvalue()
+    >>> len(npy_bytes), npy_bytes[:6], npy_bytes[10:56]
+    (160, b'\\x93NUMPY', b"{'descr': '<i8', 'fortran_order': False, 'shap")
+    >>> array('q', npy_bytes[128:]).tolist()
+    [0, 2, 2, 0]
+    """
+    import struct
+    typecode = pair_count_matrix.get_typecode()
+    student_count = len(pair_count_matrix.students.names)
+    header = "{{'descr': '{}', 'fortran_order': False, 'shape': ({}, {}), }}" \
+        .format(_NPY_DESCRS[typecode], student_count, student_count)
+    # The magic string, version and header length take 10 bytes, and the
+    # header is padded with spaces and a newline so the data starts at a
+    # multiple of 64 bytes.
+    header += ' ' * (63 - (10 + len(header)) % 64) + '\n'
+    file.write(b'\x93NUMPY\x01\x00')
+    file.write(struct.pack('<H', len(header)))
+    file.write(header.encode('latin1'))
+    for _, counts in iter_count_rows(pair_count_matrix):
+        row = array(typecode, counts)
+        if sys.byteorder == 'big':
+            row.byteswap()
+        file.write(row.tobytes())
+
+
+def export_pair_counts(
+        pair_count_matrix: PairCountMatrix, file_path: str
+) -> None:
+    """Write the full matrix of pair counts to a `.csv` or `.npy` file, by the
+    file's extension.
+
+    >>> export_pair_counts(PairCountMatrix(Students('A')), 'counts.txt')
+    Traceback (most recent call last):
+        ...
+    ValueError: export file must end in .csv or .npy: 'counts.txt'
+    """
+    if file_path.endswith('.csv'):
+        with open(file_path, 'w', newline='') as csv_file:
+            write_pair_count_csv(pair_count_matrix, csv_file)
+    elif file_path.endswith('.npy'):
+        with open(file_path, 'wb') as npy_file:
+            write_pair_count_npy(pair_count_matrix, npy_file)
+    else:
+        raise ValueError(
+            'export file must end in {}: {!r}'.format(
+                ' or '.join(EXPORT_EXTENSIONS), file_path
+            )
+        )
@@ -0,0 +1,368 @@
+"""Functions for finding consecutive rounds of groups.
+
+Each round is solved against the historical pair counts plus every round
+before it. The running pair counts are updated with only the new round's pairs,
+so history is never counted again. Rounds can then be improved together by
+simulated annealing, swapping students within any round.
+"""
+import math
+import random
+import time
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from .annealing import DEFAULT_ITERATIONS
+from .constraints import IndexConstraints
+from .counting import DecayingPairCounts
+from .generation import group_config_from_index_groups
+from .models import Constraints
+from .models import Group
+from .models import GroupConfig
+from .models import Pair
+from .models import PairCountMatrix
+from .models import PairCounts
+from .models import Solution
+from .models import Students
+from .profiling import add_counts
+from .scoring import score_group_config
+from .solver import solve
+
+_DEADLINE_CHECK_INTERVAL = 256
+_END_TEMPERATURE_RATIO = 0.001
+_TEMPERATURE_SAMPLE_COUNT = 100
+
+
+def score_index_rounds(
+        count_rows: List[List[float]], index_rounds: List[List[List[int]]]
+) -> float:
+    """Return the total score of consecutive rounds of groups of student
+    indices, where each round is scored against the historical counts plus
+    every round before it.
+
+    >>> score_index_rounds([[0, 1], [1, 0]], [[[0, 1]], [[0, 1]]])
+    7
+    """
+    extra_counts = {}  # type: Dict[Tuple[int, int], int]
+    score = 0
+    for index_groups in index_rounds:
+        for index_group in index_groups:
+            for position, index_a in enumerate(index_group):
+                for index_b in index_group[position:]:
+                    key = (min(index_a, index_b), max(index_a, index_b))
+                    extra_count = extra_counts.get(key, 0)
+                    score += (count_rows[index_a][index_b] + extra_count) ** 2
+                    extra_counts[key] = extra_count + 1
+    return score
+
+
+def _calc_round_swap_delta(
+        count_rows: List[List[float]], extra_count_rows: List[List[int]],
+        group_a: List[int], position_a: int, group_b: List[int],
+        position_b: int
+) -> float:
+    """Return how much the total score of rounds changes if the students at
+    two positions in different groups of one round swap groups.
+
+    A pair's rounds add up to the same score in any order, so only the pairs
+    with one of the swapped students in that round change.
+
+    >>> _calc_round_swap_delta(
+    ...     [[0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]],
+    ...     [[0, 2, 0, 0], [2, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]],
+    ...     [0, 1], 1, [2, 3], 0)
+    -2
+    """
+    student_a = group_a[position_a]
+    student_b = group_b[position_b]
+    delta = 0
+    for leaving, joining, members in (
+            (student_a, student_b, group_a), (student_b, student_a, group_b)):
+        leaving_counts = count_rows[leaving]
+        leaving_extra_counts = extra_count_rows[leaving]
+        joining_counts = count_rows[joining]
+        joining_extra_counts = extra_count_rows[joining]
+        for member in members:
+            if member != leaving:
+                delta += (
+                    joining_counts[member] + joining_extra_counts[member]
+                ) ** 2 - (
+                    leaving_counts[member] + leaving_extra_counts[member] - 1
+                ) ** 2
+    return delta
+
+
+def _swap_round_students(
+        extra_count_rows: List[List[int]], group_a: List[int], position_a:
+        int, group_b: List[int], position_b: int
+) -> None:
+    """Swap the students at two positions in different groups of one round
+    and update how many times each pair is together in all rounds.
+    """
+    student_a = group_a[position_a]
+    student_b = group_b[position_b]
+    for leaving, joining, members in (
+            (student_a, student_b, group_a), (student_b, student_a, group_b)):
+        for member in members:
+            if member != leaving:
+                extra_count_rows[leaving][member] -= 1
+                extra_count_rows[member][leaving] -= 1
+                extra_count_rows[joining][member] += 1
+                extra_count_rows[member][joining] += 1
+    group_a[position_a], group_b[position_b] = student_b, student_a
+
+
+def _pick_round_swap(
+        rng: random.Random, index_rounds: List[List[List[int]]]
+) -> Tuple[List[List[int]], int, int, int, int]:
+    """Return a random round, a random pair of its groups and a position in
+    each to swap.
+    """
+    index_groups = rng.choice(index_rounds)
+    group_index_a, group_index_b = rng.sample(range(len(index_groups)), 2)
+    return (
+        index_groups, group_index_a,
+        rng.randrange(len(index_groups[group_index_a])), group_index_b,
+        rng.randrange(len(index_groups[group_index_b]))
+    )
+
+
+def anneal_index_rounds(
+        count_rows: List[List[float]],
+        index_rounds: List[List[List[int]]],
+        rng: random.Random,
+        iterations: int = DEFAULT_ITERATIONS,
+        deadline: Optional[float] = None,
+        index_constraints: Optional[IndexConstraints] = None
+) -> Tuple[List[List[List[int]]], float]:
+    """Return the lowest-scoring consecutive rounds of groups of student
+    indices found by swapping students between groups within any round, and
+    their total score.
+
+    Each round is scored against the historical counts in the count rows plus
+    every round before it, like `score_index_rounds`. Stops after a number of
+    swap attempts or once the `time.monotonic` deadline passes. With index
+    constraints, swaps that would break them are never made.
+
+    >>> index_rounds, score = anneal_index_rounds(
+    ...     [[0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]],
+    ...     [[[0, 1], [2, 3]], [[0, 1], [2, 3]], [[0, 1], [2, 3]]],
+    ...     random.Random(0), iterations=1000)
+    >>> score
+    20
+    >>> sorted(sorted(sorted(index_group) for index_group in index_groups)
+    ...        for index_groups in index_rounds)
+    [[[0, 1], [2, 3]], [[0, 2], [1, 3]], [[0, 3], [1, 2]]]
+    """
+    index_rounds = [
+        [list(index_group) for index_group in index_groups]
+        for index_groups in index_rounds
+    ]
+    score = score_index_rounds(count_rows, index_rounds)
+    best_index_rounds = [
+        [list(index_group) for index_group in index_groups]
+        for index_groups in index_rounds
+    ]
+    best_score = score
+    swappable_rounds = [
+        index_groups for index_groups in index_rounds if len(index_groups) > 1
+    ]
+    if len(swappable_rounds) == 0:
+        return best_index_rounds, best_score
+
+    extra_count_rows = [[0] * len(count_rows) for _ in count_rows]
+    for index_groups in index_rounds:
+        for index_group in index_groups:
+            for index_a in index_group:
+                for index_b in index_group:
+                    if index_a != index_b:
+                        extra_count_rows[index_a][index_b] += 1
+
+    deltas = []
+    for _ in range(_TEMPERATURE_SAMPLE_COUNT):
+        index_groups, group_index_a, position_a, group_index_b, position_b = \
+            _pick_round_swap(rng, swappable_rounds)
+        deltas.append(
+            abs(
+                _calc_round_swap_delta(
+                    count_rows, extra_count_rows, index_groups[group_index_a],
+                    position_a, index_groups[group_index_b], position_b
+                )
+            )
+        )
+    start_temperature = sum(deltas) / len(deltas) or 1.0
+    cooling_rate = _END_TEMPERATURE_RATIO ** (1 / max(iterations, 1))
+    temperature = start_temperature
+    swap_count = 0
+    for swap_count in range(1, iterations + 1):
+        if (deadline is not None and
+                swap_count % _DEADLINE_CHECK_INTERVAL == 1 and
+                time.monotonic() >= deadline):
+            swap_count -= 1
+            break
+        index_groups, group_index_a, position_a, group_index_b, position_b = \
+            _pick_round_swap(rng, swappable_rounds)
+        group_a = index_groups[group_index_a]
+        group_b = index_groups[group_index_b]
+        if index_constraints is not None and not index_constraints.allows_swap(
+                group_a, position_a, group_b, position_b):
+            temperature *= cooling_rate
+            continue
+        delta = _calc_round_swap_delta(
+            count_rows, extra_count_rows, group_a, position_a, group_b,
+            position_b
+        )
+        if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+            _swap_round_students(
+                extra_count_rows, group_a, position_a, group_b, position_b
+            )
+            score += delta
+            if score < best_score:
+                best_score = score
+                best_index_rounds = [
+                    [list(index_group) for index_group in index_groups]
+                    for index_groups in index_rounds
+                ]
+        temperature *= cooling_rate
+    add_counts(anneal_swaps_tried=swap_count)
+    return best_index_rounds, best_score
+
+
+def _score_rounds(
+        students: Students,
+        group_configs: List[GroupConfig],
+        historical_pair_counts: PairCounts,
+        half_life: Optional[float] = None
+) -> List[Solution]:
+    """Score each round of group configs against the historical pair counts
+    plus every round before it.
+    """
+    running_pair_counts = DecayingPairCounts(half_life)
+    running_pair_counts.add_pair_counts(historical_pair_counts, elapsed=0)
+    solutions = []
+    for group_config in group_configs:
+        solutions.append(
+            Solution(
+                group_config,
+                score_group_config(group_config, running_pair_counts), False
+            )
+        )
+        running_pair_counts.add_group_config(group_config)
+    return solutions
+
+
+def improve_rounds_jointly(
+        students: Students,
+        group_configs: List[GroupConfig],
+        historical_pair_counts: PairCounts,
+        seed: Optional[int] = None,
+        iterations: int = DEFAULT_ITERATIONS,
+        time_limit: Optional[float] = None,
+        constraints: Optional[Constraints] = None
+) -> List[GroupConfig]:
+    """Search for lower total-scoring rounds of group configs by swapping
+    students within any round.
+
+    The total score is the sum of every round's score against the historical
+    pair counts plus every round before it. With constraints, which the group
+    configs must already follow, only swaps that keep following them are made.
+
+    >>> sorted(improve_rounds_jointly(
+    ...     Students('A', 'B', 'C', 'D'),
+    ...     [GroupConfig(Group('A', 'B'), Group('C', 'D')),
+    ...      GroupConfig(Group('A', 'B'), Group('C', 'D'))],
+    ...     PairCounts((Pair('A', 'C'), 1), (Pair('B', 'D'), 1)),
+    ...     seed=0), key=repr)
+    [GroupConfig(Group('A', 'B'), Group('C', 'D')), GroupConfig(Group('A', 'D'), Group('B', 'C'))]
+    """
+    deadline = None
+    if time_limit is not None:
+        deadline = time.monotonic() + time_limit
+    historical_pair_count_matrix = PairCountMatrix.from_pair_counts(
+        students, historical_pair_counts
+    )
+    count_rows = [
+        historical_pair_count_matrix.get_row(index)
+        for index in range(len(students.names))
+    ]
+    indices = historical_pair_count_matrix.indices
+    index_rounds = [
+        [[indices[name] for name in group.names] for group in
+         group_config.groups] for group_config in group_configs
+    ]
+    index_constraints = None
+    if constraints is not None:
+        index_constraints = IndexConstraints(students, constraints)
+    index_rounds, _ = anneal_index_rounds(
+        count_rows, index_rounds, random.Random(seed), iterations, deadline,
+        index_constraints
+    )
+    return [
+        group_config_from_index_groups(students, index_groups)
+        for index_groups in index_rounds
+    ]
+
+
+def solve_rounds(
+        students: Students,
+        group_size: int,
+        historical_pair_counts: PairCounts,
+        round_count: int,
+        solver: str = 'exhaustive',
+        jobs: int = 1,
+        seed: Optional[int] = None,
+        iterations: int = DEFAULT_ITERATIONS,
+        time_limit: Optional[float] = None,
+        half_life: Optional[float] = None,
+        joint: bool = False,
+        constraints: Optional[Constraints] = None,
+        group_sizes: Optional[Sequence[int]] = None
+) -> List[Solution]:
+    """Find low-scoring group configs for a number of consecutive rounds.
+
+    Each round is solved with a named solver like `solve`, with the time limit
+    in seconds applying to each round. With a half-life in rounds, historical
+    pair counts and earlier rounds decay by one round per round. If joint,
+    the rounds are then improved together by `improve_rounds_jointly`, which
+    ignores decay between the new rounds; a solution is only known to be
+    optimal if no round changed. Every round follows the constraints and
+    has the given group sizes, if any.
+
+    >>> for solution in solve_rounds(
+    ...         Students('A', 'B', 'C', 'D'),
+    ...         2,
+    ...         PairCounts((Pair('A', 'B'), 1), (Pair('C', 'D'), 1)),
+    ...         3):
+    ...     print(solution)
+    Solution(GroupConfig(Group('A', 'D'), Group('B', 'C')), 0, True)
+    Solution(GroupConfig(Group('A', 'C'), Group('B', 'D')), 4, True)
+    Solution(GroupConfig(Group('A', 'D'), Group('B', 'C')), 18, True)
+    """
+    running_pair_counts = DecayingPairCounts(half_life)
+    running_pair_counts.add_pair_counts(historical_pair_counts, elapsed=0)
+    solutions = []  # type: List[Solution]
+    for round_index in range(round_count):
+        round_seed = None if seed is None else seed + round_index
+        solution = solve(
+            students, group_size, running_pair_counts, solver, jobs,
+            round_seed, iterations, time_limit,
+            constraints=constraints,
+            group_sizes=group_sizes
+        )
+        solutions.append(solution)
+        running_pair_counts.add_group_config(solution.group_config)
+
+    if joint and round_count > 1:
+        group_configs = [solution.group_config for solution in solutions]
+        joint_group_configs = improve_rounds_jointly(
+            students, group_configs, historical_pair_counts, seed,
+            iterations, time_limit, constraints
+        )
+        if joint_group_configs != group_configs:
+            return _score_rounds(
+                students, joint_group_configs, historical_pair_counts,
+                half_life
+            )
+    return solutions
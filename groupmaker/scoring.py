@@ -1,8 +1,22 @@
 """Functions for scoring current pairs based on historical pairings."""
+from itertools import combinations_with_replacement
+from typing import Callable
+from typing import Dict
 from typing import Iterable
+from typing import List
+from typing import Sequence
+from typing import Tuple
+from typing import Union
 
+from .models import Group
+from .models import GroupConfig
 from .models import Pair
+from .models import PairCountMatrix
 from .models import PairCounts
+from .models import Students
+from .pairing import calc_index_pairs_in_group_config
+from .pairing import calc_pairs_in_group
+from .pairing import calc_pairs_in_group_config
 
 
 def score_pairs(pairs: Iterable[Pair], historical_pair_counts:
@@ -19,3 +33,139 @@ def score_pairs(pairs: Iterable[Pair], historical_pair_counts:
     5
     """
     return sum(historical_pair_counts.get_count(pair) ** 2 for pair in pairs)
+
+
+def score_index_pairs(
+        index_pairs: Iterable[Tuple[int, int]],
+        historical_pair_count_matrix: PairCountMatrix
+) -> int:
+    """Given a current list of pairs of student indices, return the same score
+    as `score_pairs` would for those students.
+
+    >>> score_index_pairs(
+    ...     [(0, 1), (0, 2), (1, 2)],
+    ...     PairCountMatrix(
+    ...         Students('A', 'B', 'C'),
+    ...         (Pair('A', 'B'), 1), (Pair('A', 'C'), 2)))
+    5
+    """
+    return sum(
+        count ** 2
+        for count in historical_pair_count_matrix.get_counts(index_pairs)
+    )
+
+
+def score_group_config(
+        group_config: GroupConfig,
+        historical_pair_counts: Union[PairCounts, PairCountMatrix]
+) -> int:
+    """Return the score of all pairs in a group config.
+
+    Pair count matrices are looked up by student index without building any
+    pairs.
+
+    >>> score_group_config(
+    ...     GroupConfig(Group('A', 'B', 'C')),
+    ...     PairCounts((Pair('A', 'B'), 1), (Pair('A', 'C'), 2)))
+    5
+    >>> score_group_config(
+    ...     GroupConfig(Group('A', 'B', 'C')),
+    ...     PairCountMatrix(
+    ...         Students('A', 'B', 'C'),
+    ...         (Pair('A', 'B'), 1), (Pair('A', 'C'), 2)))
+    5
+    """
+    if isinstance(historical_pair_counts, PairCountMatrix):
+        return score_index_pairs(
+            calc_index_pairs_in_group_config(
+                group_config, historical_pair_counts.indices
+            ), historical_pair_counts
+        )
+    return score_pairs(
+        calc_pairs_in_group_config(group_config), historical_pair_counts
+    )
+
+
+def _score_group(
+        group: Group,
+        historical_pair_counts: Union[PairCounts, PairCountMatrix]
+) -> int:
+    """Return the score of all pairs in a group.
+
+    >>> _score_group(
+    ...     Group('A', 'B'),
+    ...     PairCountMatrix(Students('A', 'B'), (Pair('A', 'B'), 2)))
+    4
+    """
+    if isinstance(historical_pair_counts, PairCountMatrix):
+        indices = historical_pair_counts.indices
+        return score_index_pairs(
+            combinations_with_replacement(
+                [indices[name] for name in group.names], 2
+            ), historical_pair_counts
+        )
+    return score_pairs(calc_pairs_in_group(group), historical_pair_counts)
+
+
+def make_group_config_scorer(
+        historical_pair_counts: Union[PairCounts, PairCountMatrix]
+) -> Callable[[GroupConfig], int]:
+    """Return a function that scores group configs like `score_group_config`,
+    but only scores each group the first time it sees it.
+
+    Searching many group configs of a class sees the same groups over and
+    over, so most group configs are scored by adding up a few known scores.
+
+    >>> score = make_group_config_scorer(
+    ...     PairCounts((Pair('A', 'B'), 1), (Pair('A', 'C'), 2)))
+    >>> score(GroupConfig(Group('A', 'B'), Group('C')))
+    1
+    >>> score(GroupConfig(Group('A', 'C'), Group('B')))
+    4
+    """
+    group_scores = {}  # type: Dict[Tuple[str, ...], int]
+
+    def _score_group_config(group_config: GroupConfig) -> int:
+        score = 0
+        for group in group_config.groups:
+            group_score = group_scores.get(group.names)
+            if group_score is None:
+                group_score = _score_group(group, historical_pair_counts)
+                group_scores[group.names] = group_score
+            score += group_score
+        return score
+
+    return _score_group_config
+
+
+def calc_index_cost_rows(
+        historical_pair_count_matrix: PairCountMatrix
+) -> List[List[int]]:
+    """Return the score each pair of student indices adds to a group config,
+    as a list of rows.
+
+    >>> calc_index_cost_rows(
+    ...     PairCountMatrix(
+    ...         Students('A', 'B'), (Pair('A', 'A'), 1), (Pair('A', 'B'), 2)))
+    [[1, 4], [4, 0]]
+    """
+    return [
+        [count ** 2 for count in historical_pair_count_matrix.get_row(index)]
+        for index in range(len(historical_pair_count_matrix.students.names))
+    ]
+
+
+def score_index_groups(
+        cost_rows: List[List[int]], index_groups: Sequence[Sequence[int]]
+) -> int:
+    """Return the score of groups of student indices given the score each pair
+    of student indices adds.
+
+    >>> score_index_groups([[1, 4], [4, 0]], [[0, 1]])
+    5
+    """
+    return sum(
+        cost_rows[index_a][index_b] for index_group in index_groups
+        for position, index_a in enumerate(index_group)
+        for index_b in index_group[position:]
+    )
@@ -2,45 +2,290 @@
 """Make student groups, ensuring that students work with those they have worked
 with the fewest times before.
 """
+# Modules only some options need, like table printing and the history store,
+# are imported where they are used so plain runs start quickly.
 import argparse
+import os
 import sys
+from collections import Counter
 from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
 
-from groupmaker.counting import count_pairs
-from groupmaker.file_io import read_group_configs, read_students, \
-    write_group_config
+from groupmaker.annealing import DEFAULT_ITERATIONS
+from groupmaker.counting import DecayingPairCounts, count_pairs
+from groupmaker.file_io import read_constraints, read_group_config, \
+    read_group_configs, read_students, write_group_config
+from groupmaker.generation import SIZE_POLICY_NAMES, calc_group_sizes
+from groupmaker.models import Constraints
+from groupmaker.models import PairCountMatrix
+from groupmaker.models import PairCounts
+from groupmaker.models import Solution
 from groupmaker.pairing import calc_pairs_in_group_configs
-from groupmaker.solver import solve_for_min_scoring_groups
-from groupmaker.table import print_student_pair_count_matrix
+from groupmaker.profiling import profile_stage, start_profile, stop_profile
+from groupmaker.repair import DEFAULT_NEIGHBOUR_COUNT, repair_group_config
+from groupmaker.report import DEFAULT_TOP_PAIR_COUNT, EXPORT_EXTENSIONS, \
+    MAX_MATRIX_STUDENT_COUNT, REPORT_VIEW_NAMES, export_pair_counts, \
+    print_pair_report
+from groupmaker.rounds import solve_rounds
+from groupmaker.solver import SOLVER_NAMES, solve, solve_top
+
+
+def _print_solution_score(solution: Solution) -> None:
+    """Print the score of a solution to stderr."""
+    print(
+        'score: {} ({})'.format(
+            solution.score,
+            'optimal' if solution.is_optimal else 'best found'
+        ),
+        file=sys.stderr
+    )
+
+
+def _parse_group_sizes(text: str) -> Tuple[int, ...]:
+    """Parse comma-separated group sizes.
+
+    >>> _parse_group_sizes('4, 3,3')
+    (4, 3, 3)
+    >>> _parse_group_sizes('4,three')
+    Traceback (most recent call last):
+        ...
+    argparse.ArgumentTypeError: invalid group sizes: '4,three'
+    """
+    try:
+        return tuple(int(size) for size in text.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            'invalid group sizes: {!r}'.format(text)
+        )
+
+
+def _read_decaying_pair_counts(
+        historical_groups_file_paths: Iterable[str],
+        half_life: Optional[float] = None,
+        half_life_days: Optional[float] = None
+) -> PairCounts:
+    """Read historical groups oldest first, where each group file counts for
+    half as much every half-life of group files after it or every half-life of
+    days of modification time before the newest group file.
+    """
+    paths = list(historical_groups_file_paths)  # type: List[str]
+    if half_life_days is not None:
+        paths.sort(key=lambda path: os.stat(path).st_mtime)
+        day_counts = [
+            os.stat(path).st_mtime / (24 * 60 * 60) for path in paths
+        ]
+        elapseds = [0.0] + [
+            day_count - previous_day_count for previous_day_count, day_count
+            in zip(day_counts, day_counts[1:])
+        ]
+        decaying_pair_counts = DecayingPairCounts(half_life_days)
+    else:
+        elapseds = [1.0] * len(paths)
+        decaying_pair_counts = DecayingPairCounts(half_life)
+    for group_config, elapsed in zip(read_group_configs(paths), elapseds):
+        decaying_pair_counts.add_group_config(group_config, elapsed=elapsed)
+    return decaying_pair_counts.to_pair_counts()
 
 
 def _run_main(
-        students_file_path: str, group_size: int, historical_groups_file_paths:
-        Iterable[str], verbosity: int
+        students_file_path: str,
+        group_size: int,
+        historical_groups_file_paths: Iterable[str],
+        verbosity: int,
+        solver: str = 'exhaustive',
+        seed: Optional[int] = None,
+        iterations: int = DEFAULT_ITERATIONS,
+        time_limit: Optional[float] = None,
+        jobs: int = 1,
+        history_store_path: Optional[str] = None,
+        half_life: Optional[float] = None,
+        half_life_days: Optional[float] = None,
+        round_count: int = 1,
+        joint: bool = False,
+        output_dir_path: Optional[str] = None,
+        top_count: Optional[int] = None,
+        print_histogram: bool = False,
+        constraints_file_path: Optional[str] = None,
+        repair_file_path: Optional[str] = None,
+        max_moves: Optional[int] = None,
+        neighbour_count: int = DEFAULT_NEIGHBOUR_COUNT,
+        history_patterns: Sequence[str] = (),
+        skip_bad_files: bool = False,
+        size_policy: str = 'chunk',
+        min_group_size: int = 1,
+        group_sizes: Optional[Tuple[int, ...]] = None,
+        report_view: Optional[str] = None,
+        report_top_count: int = DEFAULT_TOP_PAIR_COUNT,
+        export_file_path: Optional[str] = None
 ) -> None:
     """Read a list of students, a requested group size, and historical groups,
     then generate a new group of the requested size with the fewest students
     that have worked together before.
-    """
-    with open(students_file_path) as students_file:
-        students = read_students(students_file)
-    historical_group_configs = list(
-        read_group_configs(historical_groups_file_paths)
-    )
 
-    historical_pair_counts = count_pairs(
-        calc_pairs_in_group_configs(historical_group_configs)
-    )
+    With more than one round, each round's groups are written to a numbered
+    group file in the output directory. With a top count, that many of the
+    lowest-scoring group configs are written, each after a comment line with
+    its rank and score. With a constraints file, every group config follows
+    its rules. With a group file to repair, its groups are changed as little
+    as possible to fit the students instead.
 
-    if verbosity > 0:
-        print_student_pair_count_matrix(
-            students, historical_pair_counts, file=sys.stderr
+    Group files in history directories or matching history glob patterns are
+    counted along with the historical group files. Bad group files are
+    reported to stderr, and unless skipped, stop the run.
+
+    Groups have the given group sizes, or if there are none, sizes of at most
+    the group size made by the size policy.
+
+    Verbose runs or a report view print a report of the historical pair
+    counts, and with an export file, the full matrix of them is written to it.
+    """
+    with profile_stage('read_students'):
+        with open(students_file_path) as students_file:
+            students = read_students(students_file)
+    constraints = None  # type: Optional[Constraints]
+    if constraints_file_path is not None:
+        with profile_stage('read_constraints'):
+            with open(constraints_file_path) as constraints_file:
+                constraints = read_constraints(constraints_file)
+    if group_sizes is None:
+        group_sizes = calc_group_sizes(
+            len(students.names), group_size, size_policy, min_group_size
         )
+    if history_store_path is not None:
+        from groupmaker.history_store import read_history_store_pair_counts
+        with profile_stage('read_history_store'):
+            historical_pair_counts = read_history_store_pair_counts(
+                history_store_path, historical_groups_file_paths
+            )
+    elif len(history_patterns) > 0:
+        from groupmaker.ingest import count_pairs_in_group_files, \
+            expand_group_file_paths
+        with profile_stage('count_group_file_pairs'):
+            bad_file_messages = []  # type: List[str]
+            # A group file given on its own isn't counted again when the
+            # history patterns match it too.
+            given_abs_paths = {
+                os.path.abspath(path) for path in historical_groups_file_paths
+            }
+            historical_pair_counts = count_pairs_in_group_files(
+                list(historical_groups_file_paths) + [
+                    path for path in expand_group_file_paths(history_patterns)
+                    if os.path.abspath(path) not in given_abs_paths
+                ],
+                on_error=bad_file_messages.append
+            )
+        for message in bad_file_messages:
+            print(
+                '{}: {}'.format(
+                    'skipped' if skip_bad_files else 'error', message
+                ),
+                file=sys.stderr
+            )
+        if len(bad_file_messages) > 0 and not skip_bad_files:
+            sys.exit(1)
+    elif half_life is not None or half_life_days is not None:
+        with profile_stage('read_decaying_pair_counts'):
+            historical_pair_counts = _read_decaying_pair_counts(
+                historical_groups_file_paths, half_life, half_life_days
+            )
+    else:
+        with profile_stage('read_group_configs'):
+            historical_group_configs = list(
+                read_group_configs(historical_groups_file_paths)
+            )
+        with profile_stage('count_pairs'):
+            historical_pair_counts = count_pairs(
+                calc_pairs_in_group_configs(historical_group_configs)
+            )
 
-    min_scoring_group_config = solve_for_min_scoring_groups(
-        students, group_size, historical_pair_counts
-    )
-    write_group_config(min_scoring_group_config)
+    if verbosity > 0 or report_view is not None or \
+            export_file_path is not None:
+        pair_count_matrix = PairCountMatrix.from_pair_counts(
+            students, historical_pair_counts
+        )
+        if verbosity > 0 or report_view is not None:
+            with profile_stage('print_pair_report'):
+                print_pair_report(
+                    pair_count_matrix, report_view, report_top_count,
+                    file=sys.stderr
+                )
+        if export_file_path is not None:
+            with profile_stage('export_pair_counts'):
+                export_pair_counts(pair_count_matrix, export_file_path)
+
+    if repair_file_path is not None:
+        with profile_stage('read_repair_group_config'):
+            with open(repair_file_path) as repair_file:
+                group_config = read_group_config(repair_file)
+        with profile_stage('repair'):
+            solution, moved_names = repair_group_config(
+                group_config, students, group_size, historical_pair_counts,
+                max_moves, neighbour_count, group_sizes
+            )
+        if verbosity > 0:
+            _print_solution_score(solution)
+            print(
+                'moved: {}'.format(', '.join(moved_names) or 'nobody'),
+                file=sys.stderr
+            )
+        write_group_config(solution.group_config)
+        return
+
+    if round_count > 1:
+        with profile_stage('solve'):
+            solutions = solve_rounds(
+                students, group_size, historical_pair_counts, round_count,
+                solver, jobs, seed, iterations, time_limit, half_life, joint,
+                constraints, group_sizes
+            )
+        round_number_width = len(str(round_count))
+        for round_number, solution in enumerate(solutions, start=1):
+            if verbosity > 0:
+                print(
+                    'round {}:'.format(round_number), end=' ', file=sys.stderr
+                )
+                _print_solution_score(solution)
+            round_file_path = os.path.join(
+                output_dir_path, 'round-{:0{}}.txt'.format(
+                    round_number, round_number_width
+                )
+            )
+            with open(round_file_path, 'w') as round_file:
+                write_group_config(solution.group_config, round_file)
+        return
+
+    if top_count is not None or print_histogram:
+        score_counts = Counter() if print_histogram else None
+        with profile_stage('solve'):
+            solutions = solve_top(
+                students, group_size, historical_pair_counts, top_count or 1,
+                score_counts, constraints, group_sizes
+            )
+        if print_histogram:
+            from groupmaker.table import print_score_histogram
+            print_score_histogram(score_counts, file=sys.stderr)
+        for rank, solution in enumerate(solutions, start=1):
+            if rank > 1:
+                print()
+            print('# rank {}, score {}'.format(rank, solution.score))
+            write_group_config(solution.group_config)
+        return
+
+    on_improvement = None
+    if verbosity > 1:
+        on_improvement = _print_solution_score
+
+    with profile_stage('solve'):
+        solution = solve(
+            students, group_size, historical_pair_counts, solver, jobs, seed,
+            iterations, time_limit, on_improvement, constraints, group_sizes
+        )
+    if verbosity > 0:
+        _print_solution_score(solution)
+    write_group_config(solution.group_config)
 
 
 def main() -> None:
@@ -54,13 +299,231 @@ def main() -> None:
         default=3,
         help='form groups of this many students (default: %(default)s)'
     )
+    sizes_group = parser.add_mutually_exclusive_group()
+    sizes_group.add_argument(
+        '--size-policy',
+        choices=SIZE_POLICY_NAMES,
+        default='chunk',
+        help='make groups of GROUP_SIZE and one smaller group with the rest, '
+        'or as few groups with sizes at most one apart (default: '
+        '%(default)s)'
+    )
+    sizes_group.add_argument(
+        '--sizes',
+        dest='group_sizes',
+        metavar='SIZES',
+        type=_parse_group_sizes,
+        help='make groups of exactly these comma-separated sizes, which must '
+        'add up to the number of students'
+    )
+    parser.add_argument(
+        '--min-size',
+        dest='min_group_size',
+        metavar='N',
+        type=int,
+        default=1,
+        help='make groups of at least N students, moving students out of '
+        'the largest groups into smaller ones, and stop if that is not '
+        'possible; with --sizes, stop if any size is under N (default: '
+        '%(default)s)'
+    )
     parser.add_argument(
         '-v',
         dest='verbosity',
         action='count',
         default=0,
         help='print out historical pair counts to stderr before calculating '
-        'new groups'
+        'new groups and the score of the new groups after; repeat to also '
+        'print the score of each better group config as it is found'
+    )
+    parser.add_argument(
+        '--pair-report',
+        dest='report_view',
+        choices=REPORT_VIEW_NAMES,
+        help='print historical pair counts to stderr as a matrix, the most '
+        'repeated pairs, or a summary per student (default with -v: matrix '
+        'for up to {} students, top otherwise)'.format(
+            MAX_MATRIX_STUDENT_COUNT
+        )
+    )
+    parser.add_argument(
+        '--report-top',
+        dest='report_top_count',
+        metavar='N',
+        type=int,
+        default=DEFAULT_TOP_PAIR_COUNT,
+        help='number of most repeated pairs to print (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--export-pairs',
+        dest='export_file_path',
+        metavar='FILE',
+        help='write the full matrix of historical pair counts to this .csv '
+        'or NumPy .npy file, rows and columns in student file order'
+    )
+    parser.add_argument(
+        '-j',
+        dest='jobs',
+        metavar='N',
+        type=int,
+        default=1,
+        help='search using N processes; the exhaustive and branch-and-bound '
+        'solvers split up the search and the anneal solver runs one restart '
+        'per process (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--solver',
+        choices=SOLVER_NAMES,
+        default='exhaustive',
+        help='search every group config, search while skipping group configs '
+        'that cannot be the best, find the best groups of each set of '
+        'students left over once, or quickly find good but not necessarily '
+        'best groups by simulated annealing (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        help='random seed for the anneal solver'
+    )
+    parser.add_argument(
+        '--iterations',
+        type=int,
+        default=DEFAULT_ITERATIONS,
+        help='number of swaps the anneal solver tries (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--time-limit',
+        metavar='SECONDS',
+        type=float,
+        help='stop searching after this many seconds and use the best '
+        'groups found so far'
+    )
+    parser.add_argument(
+        '--history-store',
+        dest='history_store_path',
+        metavar='STORE_FILE',
+        help='cache historical pair counts in this file, only reading group '
+        'files that are new or have changed since the last run'
+    )
+    parser.add_argument(
+        '--history-dir',
+        dest='history_patterns',
+        metavar='DIR_OR_GLOB',
+        action='append',
+        default=[],
+        help='also count every group file in this directory or matching this '
+        'glob pattern, reading files in parallel and reporting bad ones by '
+        'file and line; repeat for more'
+    )
+    parser.add_argument(
+        '--skip-bad-files',
+        action='store_true',
+        help='leave out bad group files found with --history-dir instead of '
+        'stopping'
+    )
+    parser.add_argument(
+        '--rounds',
+        dest='round_count',
+        metavar='R',
+        type=int,
+        default=1,
+        help='make groups for R consecutive rounds, each avoiding the pairs '
+        'of the rounds before it, and write them to numbered group files in '
+        'the output directory (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--joint',
+        action='store_true',
+        help='after making all rounds, swap students within rounds to lower '
+        'the total score of every round'
+    )
+    parser.add_argument(
+        '--output-dir',
+        dest='output_dir_path',
+        metavar='DIR',
+        help='directory to write group files to when making multiple rounds'
+    )
+    parser.add_argument(
+        '--top',
+        dest='top_count',
+        metavar='K',
+        type=int,
+        help='search every group config and output the K lowest-scoring, each '
+        'after a comment line with its rank and score'
+    )
+    parser.add_argument(
+        '--histogram',
+        action='store_true',
+        help='search every group config and print how many have each score to '
+        'stderr'
+    )
+    parser.add_argument(
+        '--constraints',
+        dest='constraints_file_path',
+        metavar='CONSTRAINTS_FILE',
+        help='file of rules every group config must follow, one per line: '
+        '"must: A, B" keeps students together, "never: A, B" keeps them '
+        'apart and "pin: A, B" makes them a group by themselves'
+    )
+    parser.add_argument(
+        '--repair',
+        dest='repair_file_path',
+        metavar='GROUP_FILE',
+        help='instead of making new groups, change the groups in this file '
+        'as little as possible to fit the students, taking out students who '
+        'left and adding students who joined'
+    )
+    parser.add_argument(
+        '--max-moves',
+        metavar='N',
+        type=int,
+        help='when repairing, move at most N students to another group'
+    )
+    parser.add_argument(
+        '--neighbours',
+        dest='neighbour_count',
+        metavar='N',
+        type=int,
+        default=DEFAULT_NEIGHBOUR_COUNT,
+        help='when repairing, also rearrange the N unchanged groups that '
+        'have worked least with the students needing a new group (default: '
+        '%(default)s)'
+    )
+    decay_group = parser.add_mutually_exclusive_group()
+    decay_group.add_argument(
+        '--half-life',
+        metavar='FILES',
+        type=float,
+        help='count historical groups for half as much for every FILES group '
+        'files given after them; give group files oldest first'
+    )
+    decay_group.add_argument(
+        '--half-life-days',
+        metavar='DAYS',
+        type=float,
+        help='count historical groups for half as much for every DAYS days '
+        'their group file was modified before the newest group file'
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='print how long each stage took and how much work the solver '
+        'did to stderr'
+    )
+    parser.add_argument(
+        '--profile-json',
+        dest='profile_json_file',
+        metavar='JSON_FILE',
+        type=argparse.FileType('w'),
+        help='write how long each stage took and how much work the solver '
+        'did to this file as JSON'
+    )
+    parser.add_argument(
+        '--cprofile',
+        dest='cprofile_path',
+        metavar='STATS_FILE',
+        help='write cProfile stats of the whole run to this file, for use '
+        'with pstats'
     )
     parser.add_argument(
         'student_file_path',
@@ -76,7 +539,124 @@ def main() -> None:
     )
 
     args = parser.parse_args()
-    _run_main(
-        args.student_file_path, args.group_size,
-        args.historical_groups_file_paths, args.verbosity
+    if args.half_life is not None and args.half_life <= 0:
+        parser.error('argument --half-life: must be greater than 0')
+    if args.half_life_days is not None and args.half_life_days <= 0:
+        parser.error('argument --half-life-days: must be greater than 0')
+    if args.history_store_path is not None and (
+            args.half_life is not None or args.half_life_days is not None):
+        parser.error(
+            'argument --history-store: not allowed with argument --half-life '
+            'or --half-life-days'
+        )
+    if len(args.history_patterns) > 0 and (
+            args.history_store_path is not None or
+            args.half_life is not None or args.half_life_days is not None):
+        parser.error(
+            'argument --history-dir: not allowed with --history-store, '
+            '--half-life or --half-life-days'
+        )
+    if args.jobs < 1:
+        parser.error('argument -j: must be at least 1')
+    if args.min_group_size < 1:
+        parser.error('argument --min-size: must be at least 1')
+    if args.group_sizes is not None and \
+            min(args.group_sizes, default=1) < args.min_group_size:
+        parser.error(
+            'argument --sizes: sizes must be at least --min-size {}'.format(
+                args.min_group_size
+            )
+        )
+    if args.report_top_count < 1:
+        parser.error('argument --report-top: must be at least 1')
+    if args.export_file_path is not None and \
+            not args.export_file_path.endswith(EXPORT_EXTENSIONS):
+        parser.error(
+            'argument --export-pairs: must end in {}'.format(
+                ' or '.join(EXPORT_EXTENSIONS)
+            )
+        )
+    if args.round_count < 1:
+        parser.error('argument --rounds: must be at least 1')
+    if args.round_count > 1 and args.output_dir_path is None:
+        parser.error(
+            'argument --rounds: more than one round needs --output-dir'
+        )
+    if args.top_count is not None or args.histogram:
+        if args.top_count is not None and args.top_count < 1:
+            parser.error('argument --top: must be at least 1')
+        if args.solver != 'exhaustive' or args.jobs > 1 or \
+                args.round_count > 1:
+            parser.error(
+                'arguments --top and --histogram: only allowed with the '
+                'exhaustive solver, one process and one round'
+            )
+    if args.max_moves is not None and args.max_moves < 0:
+        parser.error('argument --max-moves: must be at least 0')
+    if args.neighbour_count < 0:
+        parser.error('argument --neighbours: must be at least 0')
+    if args.repair_file_path is not None and (
+            args.round_count > 1 or args.top_count is not None or
+            args.histogram or args.constraints_file_path is not None or
+            args.solver != 'exhaustive' or args.jobs > 1 or
+            args.time_limit is not None or args.seed is not None or
+            args.iterations != DEFAULT_ITERATIONS):
+        parser.error(
+            'argument --repair: not allowed with --rounds, --top, '
+            '--histogram, --constraints, --solver, -j, --time-limit, --seed '
+            'or --iterations'
+        )
+    if args.profile or args.profile_json_file is not None:
+        start_profile()
+    run_kwargs = dict(
+        students_file_path=args.student_file_path,
+        group_size=args.group_size,
+        historical_groups_file_paths=args.historical_groups_file_paths,
+        verbosity=args.verbosity,
+        solver=args.solver,
+        seed=args.seed,
+        iterations=args.iterations,
+        time_limit=args.time_limit,
+        jobs=args.jobs,
+        history_store_path=args.history_store_path,
+        half_life=args.half_life,
+        half_life_days=args.half_life_days,
+        round_count=args.round_count,
+        joint=args.joint,
+        output_dir_path=args.output_dir_path,
+        top_count=args.top_count,
+        print_histogram=args.histogram,
+        constraints_file_path=args.constraints_file_path,
+        repair_file_path=args.repair_file_path,
+        max_moves=args.max_moves,
+        neighbour_count=args.neighbour_count,
+        history_patterns=args.history_patterns,
+        skip_bad_files=args.skip_bad_files,
+        size_policy=args.size_policy,
+        min_group_size=args.min_group_size,
+        group_sizes=args.group_sizes,
+        report_view=args.report_view,
+        report_top_count=args.report_top_count,
+        export_file_path=args.export_file_path
     )
+    if args.cprofile_path is not None:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.runcall(_run_main, **run_kwargs)
+        profiler.dump_stats(args.cprofile_path)
+    else:
+        _run_main(**run_kwargs)
+
+    profile = stop_profile()
+    if profile is not None:
+        if args.profile:
+            print(profile.format_summary(), file=sys.stderr)
+        if args.profile_json_file is not None:
+            import json
+            json.dump(
+                profile.to_dict(),
+                args.profile_json_file,
+                indent=2,
+                sort_keys=True
+            )
+            args.profile_json_file.write('\n')
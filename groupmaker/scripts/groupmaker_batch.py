@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Make student groups for every job in a JSON manifest, reading each shared
+group file once and solving jobs in parallel.
+"""
+import argparse
+import os
+import sys
+
+from groupmaker.batch import read_manifest, run_batch
+
+
+def main() -> None:
+    """Command line script entry point."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '-j',
+        dest='workers',
+        metavar='N',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='solve up to N jobs at once in separate processes (default: '
+        'number of CPUs)'
+    )
+    parser.add_argument(
+        'manifest_file_path',
+        metavar='MANIFEST_FILE',
+        help='JSON list of jobs, each with "students", "output" and '
+        'optionally "group_size", "history", "solver" and "constraints"; '
+        'relative paths are relative to the manifest'
+    )
+
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error('argument -j: must be at least 1')
+    with open(args.manifest_file_path) as manifest_file:
+        try:
+            jobs = read_manifest(
+                manifest_file, os.path.dirname(args.manifest_file_path)
+            )
+        except ValueError as error:
+            parser.error('{}: {}'.format(args.manifest_file_path, error))
+
+    failed_count = 0
+    for job, (solution, error) in zip(jobs, run_batch(jobs, args.workers)):
+        if error is not None:
+            failed_count += 1
+            print(
+                '{}: failed: {}'.format(job.output_file_path, error),
+                file=sys.stderr
+            )
+        else:
+            print(
+                '{}: score {} ({})'.format(
+                    job.output_file_path, solution.score,
+                    'optimal' if solution.is_optimal else 'best found'
+                ),
+                file=sys.stderr
+            )
+    if failed_count > 0:
+        print(
+            '{} of {} jobs failed'.format(failed_count, len(jobs)),
+            file=sys.stderr
+        )
+        sys.exit(1)
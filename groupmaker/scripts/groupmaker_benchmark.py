@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Time each stage of making groups for a synthetic class and history, and
+print the results as JSON.
+"""
+import argparse
+import json
+import sys
+
+from groupmaker.benchmark import DEFAULT_EXHAUSTIVE_STUDENT_COUNT, \
+    DEFAULT_REPEAT, run_benchmarks
+from groupmaker.solver import SOLVER_NAMES
+
+
+def main() -> None:
+    """Command line script entry point."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '-s',
+        dest='student_count',
+        metavar='STUDENT_COUNT',
+        type=int,
+        default=30,
+        help='number of students in the class (default: %(default)s)'
+    )
+    parser.add_argument(
+        '-k',
+        dest='round_count',
+        metavar='ROUND_COUNT',
+        type=int,
+        default=20,
+        help='number of past rounds of groups (default: %(default)s)'
+    )
+    parser.add_argument(
+        '-n',
+        dest='group_size',
+        metavar='GROUP_SIZE',
+        type=int,
+        default=3,
+        help='form groups of this many students (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=DEFAULT_REPEAT,
+        help='time each stage this many times (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--exhaustive-students',
+        dest='exhaustive_student_count',
+        metavar='COUNT',
+        type=int,
+        default=DEFAULT_EXHAUSTIVE_STUDENT_COUNT,
+        help='only use this many students when generating every group config '
+        'and comparing solvers (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--solver',
+        dest='solver_names',
+        action='append',
+        choices=SOLVER_NAMES,
+        help='only compare this solver; repeat for more (default: all)'
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=0,
+        help='random seed for the synthetic history and the anneal solver '
+        '(default: %(default)s)'
+    )
+    parser.add_argument(
+        '--max-startup-ms',
+        dest='max_startup_ms',
+        metavar='MS',
+        type=float,
+        help='exit with an error if the fastest start of the groupmaker '
+        'script takes longer than this many milliseconds'
+    )
+    parser.add_argument(
+        '-o',
+        dest='output_file',
+        metavar='OUTPUT_FILE',
+        type=argparse.FileType('w'),
+        default=sys.stdout,
+        help='write JSON results to this file (default: stdout)'
+    )
+
+    args = parser.parse_args()
+    results = run_benchmarks(
+        args.student_count, args.round_count, args.group_size, args.seed,
+        args.repeat, args.exhaustive_student_count, args.solver_names
+    )
+    json.dump(results, args.output_file, indent=2, sort_keys=True)
+    args.output_file.write('\n')
+
+    startup_ms = results['startup']['min_seconds'] * 1000
+    if args.max_startup_ms is not None and startup_ms > args.max_startup_ms:
+        print(
+            'startup took {:.1f} ms, more than {:g} ms'.format(
+                startup_ms, args.max_startup_ms
+            ),
+            file=sys.stderr
+        )
+        sys.exit(1)
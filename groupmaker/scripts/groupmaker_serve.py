@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Serve student groups to other programs, keeping each class's students and
+pair counts in memory between requests.
+
+Clients send one JSON request per line: "load" a class's files, "append_round"
+a new round of groups, or "solve" for new groups.
+"""
+import argparse
+import asyncio
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from groupmaker.service import GroupServer, start_group_server
+
+
+def main() -> None:
+    """Command line script entry point."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    address_group = parser.add_mutually_exclusive_group()
+    address_group.add_argument(
+        '--socket',
+        dest='socket_path',
+        metavar='SOCKET_FILE',
+        help='listen on this Unix socket'
+    )
+    address_group.add_argument(
+        '--port',
+        type=int,
+        default=0,
+        help='listen on this TCP port of localhost (default: any free port)'
+    )
+    parser.add_argument(
+        '--host',
+        default='localhost',
+        help='listen on this host when using TCP (default: %(default)s)'
+    )
+    parser.add_argument(
+        '-j',
+        dest='workers',
+        metavar='N',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='load and solve up to N requests at once in separate processes '
+        '(default: number of CPUs)'
+    )
+
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error('argument -j: must be at least 1')
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        server = loop.run_until_complete(
+            start_group_server(
+                GroupServer(executor), args.socket_path, args.host, args.port
+            )
+        )
+        for socket in server.sockets:
+            address = socket.getsockname()
+            if isinstance(address, tuple):
+                address = '{}:{}'.format(*address[:2])
+            print('listening on {}'.format(address), file=sys.stderr)
+        try:
+            loop.run_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+            loop.run_until_complete(server.wait_closed())
+            loop.close()
@@ -0,0 +1,383 @@
+"""Functions for serving groups to other programs from a long-running process.
+
+Clients send one JSON request object per line and get back one JSON response
+object per line. Each request has an `op`:
+
+- `load` reads a `class`'s `students` file and optional `history` list of
+  group files, with an optional `half_life` in rounds.
+- `append_round` counts the pairs in a `class`'s new round of `groups`, given
+  as lists of names.
+- `solve` makes groups of `group_size` for a `class`, optionally with a
+  `solver`, `seed`, `iterations`, `time_limit`, `constraints` given as
+  constraints file lines, and `append` to append the groups as a new round.
+
+Responses have `ok` and either the results or an `error`.
+
+Each class's students and pair counts are kept in memory, so appending a round
+only counts that round's pairs and nothing is read twice. Loading and solving
+run in worker processes so the server keeps answering other requests.
+"""
+import asyncio
+import json
+from concurrent.futures import Executor
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Sequence
+
+from .annealing import DEFAULT_ITERATIONS
+from .counting import DecayingPairCounts
+from .file_io import read_constraints
+from .file_io import read_group_configs
+from .file_io import read_students
+from .models import Group
+from .models import GroupConfig
+from .models import PairCounts
+from .models import Solution
+from .models import Students
+from .solver import solve
+
+# Requests are limited so one client can't exhaust memory.
+_MAX_REQUEST_BYTES = 1 << 24
+_REQUIRED = object()
+_TYPE_DESCRIPTIONS = {
+    str: 'a string',
+    int: 'an integer',
+    float: 'a number',
+    bool: 'true or false',
+    list: 'a list',
+}
+
+
+class _CachedClass:
+    """A class's students and pair counts of every round so far."""
+
+    __slots__ = ('students', 'pair_counts', '_pair_counts_snapshot')
+
+    def __init__(self, students: Students,
+                 pair_counts: DecayingPairCounts) -> None:
+        self.students = students
+        self.pair_counts = pair_counts
+        self._pair_counts_snapshot = None  # type: Optional[PairCounts]
+
+    def append_round(self, group_config: GroupConfig) -> None:
+        """Count the pairs in a new round of groups."""
+        missing_names = sorted(
+            frozenset(
+                name for group in group_config.groups for name in group.names
+            ) - frozenset(self.students.names)
+        )
+        if len(missing_names) > 0:
+            raise ValueError(
+                'names in round not in students: {!r}'.format(missing_names)
+            )
+        self.pair_counts.add_group_config(group_config)
+        self._pair_counts_snapshot = None
+
+    def get_pair_counts(self) -> PairCounts:
+        """Return the pair counts as they are now, which later rounds don't
+        change.
+        """
+        if self._pair_counts_snapshot is None:
+            self._pair_counts_snapshot = self.pair_counts.to_pair_counts()
+        return self._pair_counts_snapshot
+
+
+def _read_class(
+        students_file_path: str,
+        historical_groups_file_paths: Iterable[str],
+        half_life: Optional[float] = None
+) -> _CachedClass:
+    """Read a class's students and historical groups, oldest first."""
+    with open(students_file_path) as students_file:
+        students = read_students(students_file)
+    pair_counts = DecayingPairCounts(half_life)
+    for group_config in read_group_configs(historical_groups_file_paths):
+        pair_counts.add_group_config(group_config)
+    return _CachedClass(students, pair_counts)
+
+
+def _solve_request(
+        students: Students,
+        group_size: int,
+        historical_pair_counts: PairCounts,
+        solver: str,
+        seed: Optional[int],
+        iterations: int,
+        time_limit: Optional[float],
+        constraint_lines: Optional[List[str]]
+) -> Solution:
+    """Solve for groups, reading constraints file lines first."""
+    constraints = None
+    if constraint_lines is not None:
+        constraints = read_constraints(constraint_lines)
+    return solve(
+        students,
+        group_size,
+        historical_pair_counts,
+        solver,
+        seed=seed,
+        iterations=iterations,
+        time_limit=time_limit,
+        constraints=constraints
+    )
+
+
+def _get_field(
+        request: Dict[str, Any],
+        key: str,
+        field_type: type = object,
+        default: Any = _REQUIRED
+) -> Any:
+    """Return a field of a request, checking that it has the field type.
+
+    Fields with a default are optional, and when the default is None, null
+    counts as not given. Numbers can be integers, but true and false are never
+    numbers.
+
+    >>> _get_field({'op': 'load'}, 'class')
+    Traceback (most recent call last):
+        ...
+    ValueError: missing 'class'
+    >>> _get_field({'group_size': True}, 'group_size', int)
+    Traceback (most recent call last):
+        ...
+    ValueError: 'group_size' must be an integer
+    >>> _get_field({'time_limit': 1}, 'time_limit', float, None)
+    1
+    >>> _get_field({'seed': None}, 'seed', int, None)
+    """
+    if key not in request or (default is None and request[key] is None):
+        if default is _REQUIRED:
+            raise ValueError('missing {!r}'.format(key))
+        return default
+    value = request[key]
+    field_types = (int, float) if field_type is float else (field_type,)
+    if not isinstance(value, field_types) or (
+            isinstance(value, bool) and field_type is not bool):
+        raise ValueError(
+            '{!r} must be {}'.format(key, _TYPE_DESCRIPTIONS[field_type])
+        )
+    return value
+
+
+def _get_string_list_field(
+        request: Dict[str, Any], key: str, default: Any = _REQUIRED
+) -> Any:
+    """Return a field of a request that is a list of strings.
+
+    >>> _get_string_list_field({'history': ['a.txt', 1]}, 'history')
+    Traceback (most recent call last):
+        ...
+    ValueError: 'history' must be a list of strings
+    """
+    values = _get_field(request, key, list, default)
+    if values is not default and not all(
+            isinstance(value, str) for value in values):
+        raise ValueError('{!r} must be a list of strings'.format(key))
+    return values
+
+
+def _check_at_least(key: str, value: Any, minimum: float) -> None:
+    """Raise ValueError if a field given a value is below a minimum.
+
+    >>> _check_at_least('group_size', 0, 1)
+    Traceback (most recent call last):
+        ...
+    ValueError: 'group_size' must be at least 1
+    """
+    if value is not None and value < minimum:
+        raise ValueError('{!r} must be at least {}'.format(key, minimum))
+
+
+def _make_group_config(key: str, names_lists: Sequence[Any]) -> GroupConfig:
+    """Make a group config out of a request's lists of names.
+
+    >>> _make_group_config('groups', [['A', 'B'], ['C']])
+    GroupConfig(Group('A', 'B'), Group('C'))
+    >>> _make_group_config('groups', 'AB')
+    Traceback (most recent call last):
+        ...
+    ValueError: 'groups' must be a list of lists of names
+    """
+    if not isinstance(names_lists, list) or not all(
+            isinstance(names, list) and len(names) > 0 and
+            all(isinstance(name, str) for name in names)
+            for names in names_lists):
+        raise ValueError('{!r} must be a list of lists of names'.format(key))
+    return GroupConfig(*(Group(*names) for names in names_lists))
+
+
+class GroupServer:
+    """Answers requests about classes whose pair counts it keeps in memory.
+
+    Loading and solving run in an executor; without one, they run in the
+    event loop's default executor.
+    """
+
+    def __init__(self, executor: Optional[Executor] = None) -> None:
+        self._executor = executor
+        self._classes = {}  # type: Dict[str, _CachedClass]
+
+    def _get_class(self, request: Dict[str, Any]) -> _CachedClass:
+        class_name = _get_field(request, 'class', str)
+        if class_name not in self._classes:
+            raise ValueError('class not loaded: {!r}'.format(class_name))
+        return self._classes[class_name]
+
+    async def _load(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        class_name = _get_field(request, 'class', str)
+        half_life = _get_field(request, 'half_life', float, None)
+        if half_life is not None and half_life <= 0:
+            raise ValueError("'half_life' must be greater than 0")
+        cached_class = await asyncio.get_event_loop().run_in_executor(
+            self._executor, _read_class, _get_field(request, 'students', str),
+            _get_string_list_field(request, 'history', []), half_life
+        )
+        self._classes[class_name] = cached_class
+        return {'students': list(cached_class.students.names)}
+
+    async def _append_round(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        cached_class = self._get_class(request)
+        cached_class.append_round(
+            _make_group_config('groups', _get_field(request, 'groups'))
+        )
+        return {}
+
+    async def _solve(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        cached_class = self._get_class(request)
+        group_size = _get_field(request, 'group_size', int)
+        _check_at_least('group_size', group_size, 1)
+        iterations = _get_field(
+            request, 'iterations', int, DEFAULT_ITERATIONS
+        )
+        _check_at_least('iterations', iterations, 0)
+        time_limit = _get_field(request, 'time_limit', float, None)
+        _check_at_least('time_limit', time_limit, 0)
+        append = _get_field(request, 'append', bool, False)
+        solution = await asyncio.get_event_loop().run_in_executor(
+            self._executor, _solve_request, cached_class.students, group_size,
+            cached_class.get_pair_counts(),
+            _get_field(request, 'solver', str, 'exhaustive'),
+            _get_field(request, 'seed', int, None), iterations, time_limit,
+            _get_string_list_field(request, 'constraints', None)
+        )
+        if append:
+            cached_class.append_round(solution.group_config)
+        return {
+            'groups': [
+                list(group.names) for group in solution.group_config.groups
+            ],
+            'score': solution.score,
+            'optimal': solution.is_optimal,
+        }
+
+    async def handle_request(self, request: Any) -> Dict[str, Any]:
+        """Answer one request, with any error in the response.
+
+        Bad requests get their error message. Anything else that goes wrong,
+        like a broken worker process, is reported with the exception's type,
+        so one request can't drop the connection.
+
+        >>> loop = asyncio.new_event_loop()
+        >>> server = GroupServer()
+        >>> def print_response(request):
+        ...     response = loop.run_until_complete(
+        ...         server.handle_request(request))
+        ...     print(json.dumps(response, sort_keys=True))
+        >>> print_response({'op': 'solve', 'class': 'A', 'group_size': 2})
+        {"error": "class not loaded: 'A'", "ok": false}
+        >>> server._classes['A'] = _CachedClass(
+        ...     Students('A', 'B', 'C', 'D'), DecayingPairCounts())
+        >>> print_response({'op': 'append_round', 'class': 'A',
+        ...                 'groups': [['A', 'B'], ['C', 'D']]})
+        {"ok": true}
+        >>> print_response({'op': 'solve', 'class': 'A', 'group_size': 2,
+        ...                 'constraints': ['never: A, C'], 'append': True})
+        {"groups": [["A", "D"], ["B", "C"]], "ok": true, "optimal": true, "score": 4}
+        >>> print_response({'op': 'solve', 'class': 'A', 'group_size': 2})
+        {"groups": [["A", "C"], ["B", "D"]], "ok": true, "optimal": true, "score": 16}
+        >>> print_response({'op': 'append_round', 'class': 'A',
+        ...                 'groups': 'AB'})
+        {"error": "'groups' must be a list of lists of names", "ok": false}
+        >>> print_response({'op': 'load', 'class': 'B', 'students': 'b.txt',
+        ...                 'half_life': 0})
+        {"error": "'half_life' must be greater than 0", "ok": false}
+        >>> def fail(request):
+        ...     raise ZeroDivisionError('division by zero')
+        >>> server._solve = fail
+        >>> print_response({'op': 'solve', 'class': 'A', 'group_size': 2})
+        {"error": "ZeroDivisionError: division by zero", "ok": false}
+        >>> loop.close()
+        """
+        handlers = {
+            'load': self._load,
+            'append_round': self._append_round,
+            'solve': self._solve,
+        }
+        try:
+            if not isinstance(request, dict):
+                raise ValueError('request must be an object')
+            op = _get_field(request, 'op')
+            if op not in handlers:
+                raise ValueError('unknown op: {!r}'.format(op))
+            response = await handlers[op](request)
+        except (OSError, TypeError, ValueError) as error:
+            return {'ok': False, 'error': str(error)}
+        except Exception as error:
+            return {
+                'ok': False,
+                'error': '{}: {}'.format(type(error).__name__, error)
+            }
+        response['ok'] = True
+        return response
+
+    async def handle_connection(
+            self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Answer each line of JSON a client sends until it disconnects."""
+        try:
+            while True:
+                line = await reader.readline()
+                if len(line) == 0:
+                    break
+                if line.strip() == b'':
+                    continue
+                try:
+                    request = json.loads(line.decode('utf-8'))
+                except ValueError as error:
+                    response = {
+                        'ok': False,
+                        'error': 'invalid JSON: {}'.format(error)
+                    }
+                else:
+                    response = await self.handle_request(request)
+                writer.write(
+                    json.dumps(response, sort_keys=True).encode('utf-8') +
+                    b'\n'
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def start_group_server(
+        server: GroupServer,
+        socket_path: Optional[str] = None,
+        host: str = 'localhost',
+        port: int = 0
+) -> asyncio.AbstractServer:
+    """Start answering clients on a Unix socket, or if not given, on a TCP
+    host and port.
+    """
+    if socket_path is not None:
+        return await asyncio.start_unix_server(
+            server.handle_connection, socket_path, limit=_MAX_REQUEST_BYTES
+        )
+    return await asyncio.start_server(
+        server.handle_connection, host, port, limit=_MAX_REQUEST_BYTES
+    )
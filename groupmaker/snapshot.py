@@ -0,0 +1,164 @@
+"""Functions that read and write pair count snapshot files.
+
+A pair count snapshot is a binary file holding a class and the packed upper
+triangle of its pair count matrix, little-endian:
+
+* the magic bytes ``GMPC``
+* the format version, as an unsigned 16-bit integer
+* the array typecode of the counts, as one ASCII byte, then a zero byte
+* the number of students, as an unsigned 32-bit integer
+* the length of the names, as an unsigned 32-bit integer
+* the UTF-8 student names in sorted order, each followed by a newline
+* zero bytes up to the next multiple of eight bytes
+* every count, as an 8-byte integer or float
+
+Reading a snapshot maps the file into memory and uses the counts in place, so
+large classes can be scored without parsing or building any pairs.
+"""
+import mmap
+import struct
+import sys
+from array import array
+from typing import BinaryIO
+
+from .models import PairCountMatrix
+from .models import PairCounts
+from .models import Students
+
+SNAPSHOT_VERSION = 1
+
+_MAGIC = b'GMPC'
+_HEADER = struct.Struct('<4sHcxII')
+_ALIGNMENT = 8
+_TYPECODES = (b'q', b'd')
+
+
+def _calc_padding_length(length: int) -> int:
+    """Return how many zero bytes align a length to the next multiple of
+    eight.
+
+    >>> _calc_padding_length(13)
+    3
+    >>> _calc_padding_length(16)
+    0
+    """
+    return -length % _ALIGNMENT
+
+
+def write_pair_count_snapshot(
+        students: Students, pair_counts: PairCounts, snapshot_file: BinaryIO
+) -> None:
+    """Write out the pair counts of a class as a snapshot.
+
+    Counts of pairs with students not in the class are dropped.
+    """
+    packed_counts = memoryview(
+        PairCountMatrix.from_pair_counts(students,
+                                         pair_counts).get_packed_counts()
+    )
+    if sys.byteorder != 'little':
+        packed_counts = array(packed_counts.format, packed_counts)
+        packed_counts.byteswap()
+        packed_counts = memoryview(packed_counts)
+    names = ''.join(name + '\n' for name in students.names).encode('utf-8')
+    header = _HEADER.pack(
+        _MAGIC, SNAPSHOT_VERSION, packed_counts.format.encode('ascii'),
+        len(students.names), len(names)
+    )
+    snapshot_file.write(header)
+    snapshot_file.write(names)
+    snapshot_file.write(
+        b'\0' * _calc_padding_length(len(header) + len(names))
+    )
+    snapshot_file.write(packed_counts.tobytes())
+
+
+def read_pair_count_snapshot(snapshot_path: str) -> PairCountMatrix:
+    r"""Read a snapshot file into a pair count matrix backed by the mapped
+    file.
+
+    >>> import os, tempfile
+    >>> from .counting import count_pairs
+    >>> from .file_io import read_group_config
+    >>> from .pairing import calc_pairs_in_group_config
+    >>> students = Students('A', 'B', 'C')
+    >>> pair_counts = count_pairs(calc_pairs_in_group_config(
+    ...     read_group_config(['A\n', 'C\n', '\n', 'B\n'])))
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     snapshot_path = os.path.join(directory, 'counts.snapshot')
+    ...     with open(snapshot_path, 'wb') as snapshot_file:
+    ...         write_pair_count_snapshot(students, pair_counts, snapshot_file)
+    ...     pair_count_matrix = read_pair_count_snapshot(snapshot_path)
+    ...     pair_count_matrix.to_pair_counts() == pair_counts
+    True
+    >>> pair_count_matrix.get_index_count(2, 0)
+    1
+
+    Decaying counts are kept as floats.
+
+    >>> from .counting import DecayingPairCounts
+    >>> decaying_pair_counts = DecayingPairCounts(1)
+    >>> decaying_pair_counts.add_group_config(
+    ...     read_group_config(['A\n', 'B\n']))
+    >>> decaying_pair_counts.add_group_config(
+    ...     read_group_config(['A\n', 'C\n']))
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     snapshot_path = os.path.join(directory, 'counts.snapshot')
+    ...     with open(snapshot_path, 'wb') as snapshot_file:
+    ...         write_pair_count_snapshot(
+    ...             students, decaying_pair_counts, snapshot_file)
+    ...     pair_count_matrix = read_pair_count_snapshot(snapshot_path)
+    >>> pair_count_matrix.get_row(0)
+    [1.5, 0.5, 1.0]
+
+    Files with the wrong magic bytes or version are refused.
+
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     snapshot_path = os.path.join(directory, 'counts.snapshot')
+    ...     with open(snapshot_path, 'wb') as snapshot_file:
+    ...         write_pair_count_snapshot(students, pair_counts, snapshot_file)
+    ...     with open(snapshot_path, 'r+b') as snapshot_file:
+    ...         _ = snapshot_file.write(b'GMPX')
+    ...     read_pair_count_snapshot(snapshot_path)
+    Traceback (most recent call last):
+        ...
+    ValueError: not a pair count snapshot: '...counts.snapshot'
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     snapshot_path = os.path.join(directory, 'counts.snapshot')
+    ...     with open(snapshot_path, 'wb') as snapshot_file:
+    ...         write_pair_count_snapshot(students, pair_counts, snapshot_file)
+    ...     with open(snapshot_path, 'r+b') as snapshot_file:
+    ...         _ = snapshot_file.seek(4)
+    ...         _ = snapshot_file.write(struct.pack('<H', 2))
+    ...     read_pair_count_snapshot(snapshot_path)
+    Traceback (most recent call last):
+        ...
+    ValueError: unsupported pair count snapshot version: 2
+    """
+    with open(snapshot_path, 'rb') as snapshot_file:
+        mapped = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+    buffer = memoryview(mapped)
+    magic, version, typecode, student_count, names_length = \
+        _HEADER.unpack_from(buffer)
+    if magic != _MAGIC:
+        raise ValueError(
+            'not a pair count snapshot: {!r}'.format(snapshot_path)
+        )
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(
+            'unsupported pair count snapshot version: {!r}'.format(version)
+        )
+    if typecode not in _TYPECODES:
+        raise ValueError(
+            'unsupported pair count snapshot typecode: {!r}'.format(typecode)
+        )
+    names_start = _HEADER.size
+    names_end = names_start + names_length
+    names = bytes(buffer[names_start:names_end]).decode('utf-8').split('\n')
+    students = Students(*names[:student_count])
+    counts_start = names_end + _calc_padding_length(names_end)
+    packed_counts = buffer[counts_start:].cast(typecode.decode('ascii'))
+    if sys.byteorder != 'little':
+        packed_counts = array(typecode.decode('ascii'), packed_counts)
+        packed_counts.byteswap()
+    return PairCountMatrix.from_packed_counts(students, packed_counts)
@@ -1,19 +1,52 @@
 """Functions for finding best groups."""
+import random
+import time
+from collections import Counter
+from heapq import heappush, heapreplace
+from typing import Callable
 from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import Union
 
+from .annealing import DEFAULT_ITERATIONS
+from .annealing import anneal_index_groups
+from .branch_and_bound import calc_lower_bound
+from .branch_and_bound import find_feasible_index_groups
+from .branch_and_bound import find_min_scoring_index_groups
+from .constraints import IndexConstraints
+from .dynamic_programming import find_min_scoring_index_groups_dp
+from .generation import chunk_index_groups
 from .generation import generate_all_group_configs
+from .generation import group_config_from_index_groups
+from .generation import resolve_group_sizes
+from .matching import find_min_scoring_index_pairs
+from .matching import solve_for_min_scoring_pairs
+from .models import Constraints
 from .models import Group
 from .models import GroupConfig
 from .models import Pair
+from .models import PairCountMatrix
 from .models import PairCounts
+from .models import Solution
 from .models import Students
-from .pairing import calc_pairs_in_group_config
-from .scoring import score_pairs
+from .profiling import add_counts
+from .scoring import calc_index_cost_rows
+from .scoring import make_group_config_scorer
+
+SOLVER_NAMES = (
+    'exhaustive', 'branch-and-bound', 'dynamic-programming', 'anneal'
+)
+
+_DEADLINE_CHECK_INTERVAL = 256
+_NO_FEASIBLE_GROUP_CONFIG = 'no group config follows the constraints'
 
 
 def find_min_scoring_group_config(
         group_configs: Iterable[GroupConfig], historical_pair_counts:
-        PairCounts
+        Union[PairCounts, PairCountMatrix]
 ) -> GroupConfig:
     """Given a list of possible groups and historical pair counts, return which
     has the minimum score.
@@ -24,32 +57,375 @@ def find_min_scoring_group_config(
     ...     PairCounts((Pair('A', 'B'), 2), (Pair('B', 'D'), 1)))
     GroupConfig(Group('A', 'C'), Group('B', 'D'))
     """
-
-    def _score_group_config_with_historical_pair_counts(
-            group_config: GroupConfig
-    ) -> int:
-        return score_pairs(
-            calc_pairs_in_group_config(group_config), historical_pair_counts
-        )
-
     return min(
-        group_configs, key=_score_group_config_with_historical_pair_counts
+        group_configs, key=make_group_config_scorer(historical_pair_counts)
     )
 
 
+def find_min_scoring_group_configs(
+        group_configs: Iterable[GroupConfig],
+        historical_pair_counts: Union[PairCounts, PairCountMatrix],
+        k: int,
+        score_counts: Optional[Counter] = None
+) -> List[Tuple[GroupConfig, int]]:
+    """Given a list of possible groups and historical pair counts, return the
+    k with the lowest scores and their scores, lowest first.
+
+    Ties are broken by which group config comes first, like
+    `find_min_scoring_group_config`. Only k group configs are kept at a time.
+    If given a counter, also count how many group configs have each score.
+
+    >>> score_counts = Counter()
+    >>> find_min_scoring_group_configs([
+    ...     GroupConfig(Group('A', 'B'), Group('C', 'D')),
+    ...     GroupConfig(Group('A', 'C'), Group('B', 'D')),
+    ...     GroupConfig(Group('A', 'D'), Group('B', 'C'))],
+    ...     PairCounts((Pair('A', 'B'), 2), (Pair('B', 'D'), 1)),
+    ...     2, score_counts)
+    ... # doctest: +NORMALIZE_WHITESPACE
+    [(GroupConfig(Group('A', 'D'), Group('B', 'C')), 0),
+     (GroupConfig(Group('A', 'C'), Group('B', 'D')), 1)]
+    >>> sorted(score_counts.items())
+    [(0, 1), (1, 1), (4, 1)]
+    """
+    # A heap of the worst kept group config first, where later group configs
+    # are worse than earlier ones with the same score.
+    heap = []  # type: List[Tuple[int, int, GroupConfig]]
+    score_group_config_fast = make_group_config_scorer(historical_pair_counts)
+    for order, group_config in enumerate(group_configs):
+        score = score_group_config_fast(group_config)
+        if score_counts is not None:
+            score_counts[score] += 1
+        entry = (-score, -order, group_config)
+        if len(heap) < k:
+            heappush(heap, entry)
+        elif entry > heap[0]:
+            heapreplace(heap, entry)
+    return [
+        (group_config, -negative_score)
+        for negative_score, _, group_config in sorted(heap, reverse=True)
+    ]
+
+
 def solve_for_min_scoring_groups(
         students: Students, group_size: int, historical_pair_counts: PairCounts
 ) -> GroupConfig:
     """Figure out what is the minimum-scoring group config out of all possible
     group configs creatable from a list of students.
 
+    Pairs are found by matching instead, which gives a group config with the
+    same score without generating every group config.
+
     >>> solve_for_min_scoring_groups(
     ...     Students('A', 'B', 'C'),
     ...     2,
     ...     PairCounts((Pair('A', 'B'), 1), (Pair('B', 'C'), 1)))
     GroupConfig(Group('A', 'C'), Group('B'))
     """
+    if group_size == 2:
+        return solve_for_min_scoring_pairs(students, historical_pair_counts)
     all_group_configs = generate_all_group_configs(students, group_size)
     return find_min_scoring_group_config(
-        all_group_configs, historical_pair_counts
+        all_group_configs,
+        PairCountMatrix.from_pair_counts(students, historical_pair_counts)
+    )
+
+
+def solve_top(
+        students: Students,
+        group_size: int,
+        historical_pair_counts: PairCounts,
+        k: int,
+        score_counts: Optional[Counter] = None,
+        constraints: Optional[Constraints] = None,
+        group_sizes: Optional[Sequence[int]] = None
+) -> List[Solution]:
+    """Figure out the k lowest-scoring group configs out of all possible group
+    configs creatable from a list of students, lowest first.
+
+    Every solution with the minimum score is optimal. If given a counter,
+    also count how many group configs have each score. With constraints, only
+    group configs that follow them are considered. Given group sizes are
+    used instead of chunking every group size.
+
+    >>> for solution in solve_top(
+    ...         Students('A', 'B', 'C'),
+    ...         2,
+    ...         PairCounts((Pair('A', 'B'), 1), (Pair('B', 'C'), 1)),
+    ...         2):
+    ...     print(solution)
+    Solution(GroupConfig(Group('A', 'C'), Group('B')), 0, True)
+    Solution(GroupConfig(Group('A'), Group('B', 'C')), 1, False)
+    >>> solve_top(
+    ...     Students('A', 'B'), 1, PairCounts(), 2,
+    ...     constraints=Constraints([Pair('A', 'B')]))
+    Traceback (most recent call last):
+        ...
+    ValueError: no group config follows the constraints
+    """
+    scored_group_configs = find_min_scoring_group_configs(
+        generate_all_group_configs(
+            students, group_size, constraints, group_sizes
+        ),
+        PairCountMatrix.from_pair_counts(students, historical_pair_counts), k,
+        score_counts
+    )
+    if len(scored_group_configs) == 0:
+        raise ValueError(_NO_FEASIBLE_GROUP_CONFIG)
+    min_score = scored_group_configs[0][1]
+    return [
+        Solution(group_config, score, score == min_score)
+        for group_config, score in scored_group_configs
+    ]
+
+
+def _find_min_scoring_solution_exhaustive(
+        group_configs: Iterable[GroupConfig],
+        historical_pair_count_matrix: PairCountMatrix,
+        deadline: Optional[float],
+        on_improvement: Optional[Callable[[Solution], None]]
+) -> Solution:
+    """Score group configs in order until they run out or the deadline
+    passes, and return the best as a solution.
+    """
+    best_solution = None
+    scored_count = 0
+    timed_out = False
+    score_group_config_fast = make_group_config_scorer(
+        historical_pair_count_matrix
+    )
+    for group_config in group_configs:
+        if (deadline is not None and
+                scored_count % _DEADLINE_CHECK_INTERVAL == 1 and
+                time.monotonic() >= deadline):
+            timed_out = True
+            break
+        scored_count += 1
+        score = score_group_config_fast(group_config)
+        if best_solution is None or score < best_solution.score:
+            best_solution = Solution(group_config, score, False)
+            if on_improvement is not None:
+                on_improvement(best_solution)
+    if best_solution is None:
+        raise ValueError(_NO_FEASIBLE_GROUP_CONFIG)
+    add_counts(
+        group_configs_generated=scored_count,
+        group_configs_scored=scored_count,
+        pairs_scored=scored_count * sum(
+            len(group.names) * (len(group.names) + 1) // 2
+            for group in best_solution.group_config.groups
+        )
+    )
+    if timed_out:
+        return best_solution
+    return Solution(best_solution.group_config, best_solution.score, True)
+
+
+def solve(
+        students: Students,
+        group_size: int,
+        historical_pair_counts: PairCounts,
+        solver: str = 'exhaustive',
+        jobs: int = 1,
+        seed: Optional[int] = None,
+        iterations: int = DEFAULT_ITERATIONS,
+        time_limit: Optional[float] = None,
+        on_improvement: Optional[Callable[[Solution], None]] = None,
+        constraints: Optional[Constraints] = None,
+        group_sizes: Optional[Sequence[int]] = None
+) -> Solution:
+    """Find a low-scoring group config with a named solver, stopping with the
+    best group config found so far once the time limit in seconds passes.
+
+    The solution says if the group config is known to be the minimum-scoring
+    one. Each better solution found along the way is passed to
+    `on_improvement`.
+
+    With constraints, every solver only searches group configs that follow
+    them, and raises ValueError if there are none. Given group sizes are used
+    instead of chunking every group size.
+
+    With groups of at most two students, every solver but anneal finds the
+    best groups by matching instead of searching. Among group configs with
+    the same score, it may pick a different one than searching would.
+
+    >>> solve(
+    ...     Students('A', 'B', 'C', 'D'),
+    ...     3,
+    ...     PairCounts((Pair('A', 'B'), 1), (Pair('B', 'C'), 1)),
+    ...     on_improvement=print)
+    Solution(GroupConfig(Group('A'), Group('B', 'C', 'D')), 1, False)
+    Solution(GroupConfig(Group('A', 'C', 'D'), Group('B')), 0, False)
+    Solution(GroupConfig(Group('A', 'C', 'D'), Group('B')), 0, True)
+    >>> solve(
+    ...     Students('A', 'B', 'C', 'D'),
+    ...     3,
+    ...     PairCounts((Pair('A', 'B'), 1)),
+    ...     time_limit=0)
+    Solution(GroupConfig(Group('A'), Group('B', 'C', 'D')), 0, False)
+    >>> solve(
+    ...     Students('A', 'B', 'C'),
+    ...     2,
+    ...     PairCounts((Pair('A', 'B'), 1), (Pair('B', 'C'), 1)),
+    ...     on_improvement=print)
+    Solution(GroupConfig(Group('A', 'C'), Group('B')), 0, False)
+    Solution(GroupConfig(Group('A', 'C'), Group('B')), 0, True)
+    >>> solve(
+    ...     Students('A', 'B', 'C'),
+    ...     2,
+    ...     PairCounts((Pair('A', 'B'), 1), (Pair('B', 'C'), 1)),
+    ...     solver='branch-and-bound')
+    Solution(GroupConfig(Group('A', 'C'), Group('B')), 0, True)
+    >>> for solver in SOLVER_NAMES:
+    ...     print(solve(
+    ...         Students('A', 'B', 'C', 'D'),
+    ...         2,
+    ...         PairCounts((Pair('A', 'B'), 1)),
+    ...         solver,
+    ...         seed=0,
+    ...         constraints=Constraints(
+    ...             [Pair('A', 'B')], pinned_groups=[Group('C', 'D')])))
+    Solution(GroupConfig(Group('A', 'B'), Group('C', 'D')), 1, True)
+    Solution(GroupConfig(Group('A', 'B'), Group('C', 'D')), 1, True)
+    Solution(GroupConfig(Group('A', 'B'), Group('C', 'D')), 1, True)
+    Solution(GroupConfig(Group('A', 'B'), Group('C', 'D')), 1, False)
+    >>> solve(
+    ...     Students('A', 'B'),
+    ...     2,
+    ...     PairCounts(),
+    ...     'branch-and-bound',
+    ...     constraints=Constraints(never_pairs=[Pair('A', 'B')]))
+    Traceback (most recent call last):
+        ...
+    ValueError: no group config follows the constraints
+    >>> solve(
+    ...     Students('A', 'B', 'C', 'D', 'E', 'F'),
+    ...     3,
+    ...     PairCounts(),
+    ...     'branch-and-bound',
+    ...     time_limit=0,
+    ...     constraints=Constraints(never_pairs=[Pair('A', 'B')]))
+    Solution(GroupConfig(Group('A', 'C', 'D'), Group('B', 'E', 'F')), 0, False)
+    >>> for solver in SOLVER_NAMES:
+    ...     print(solve(
+    ...         Students('A', 'B', 'C', 'D', 'E'),
+    ...         3,
+    ...         PairCounts((Pair('A', 'B'), 1), (Pair('C', 'D'), 1)),
+    ...         solver,
+    ...         seed=0,
+    ...         group_sizes=[2, 2, 1]).score)
+    0
+    0
+    0
+    0
+    """
+    if solver not in SOLVER_NAMES:
+        raise ValueError('unknown solver: {!r}'.format(solver))
+    deadline = None
+    if time_limit is not None:
+        deadline = time.monotonic() + time_limit
+    historical_pair_count_matrix = PairCountMatrix.from_pair_counts(
+        students, historical_pair_counts
+    )
+    group_sizes = resolve_group_sizes(
+        len(students.names), group_size, group_sizes
+    )
+    index_constraints = None
+    if constraints is not None:
+        index_constraints = IndexConstraints(students, constraints)
+
+    def _to_solution(index_groups: Optional[List[List[int]]], score: int,
+                     is_optimal: bool) -> Solution:
+        if index_groups is None:
+            raise ValueError(_NO_FEASIBLE_GROUP_CONFIG)
+        return Solution(
+            group_config_from_index_groups(students, index_groups), score,
+            is_optimal
+        )
+
+    if on_improvement is not None:
+
+        def on_index_improvement(
+                index_groups: List[List[int]], score: int
+        ) -> None:
+            on_improvement(_to_solution(index_groups, score, False))
+    else:
+        on_index_improvement = None
+
+    if solver == 'anneal':
+        cost_rows = calc_index_cost_rows(historical_pair_count_matrix)
+        if jobs > 1:
+            from .parallel import anneal_index_groups_parallel
+            index_groups, score = anneal_index_groups_parallel(
+                historical_pair_count_matrix, group_sizes, jobs, seed,
+                iterations, deadline, on_index_improvement, index_constraints
+            )
+        else:
+            seed_index_groups = chunk_index_groups(group_sizes)
+            if index_constraints is not None:
+                seed_index_groups = find_feasible_index_groups(
+                    group_sizes, index_constraints
+                )
+                if seed_index_groups is None:
+                    raise ValueError(_NO_FEASIBLE_GROUP_CONFIG)
+            index_groups, score = anneal_index_groups(
+                cost_rows,
+                seed_index_groups,
+                random.Random(seed),
+                iterations,
+                deadline,
+                on_index_improvement,
+                lower_bound=calc_lower_bound(cost_rows, group_sizes),
+                index_constraints=index_constraints
+            )
+        return _to_solution(
+            index_groups, score,
+            score <= calc_lower_bound(cost_rows, group_sizes)
+        )
+    if max(group_sizes, default=1) <= 2:
+        # Pairs are a matching, which is found exactly in polynomial time
+        # whichever solver was asked for.
+        index_groups, score = find_min_scoring_index_pairs(
+            calc_index_cost_rows(historical_pair_count_matrix), group_sizes,
+            index_constraints
+        )
+        if on_index_improvement is not None and index_groups is not None:
+            on_index_improvement(index_groups, score)
+        return _to_solution(index_groups, score, True)
+    if solver == 'dynamic-programming':
+        # Every set of students left over is solved once, so the search
+        # isn't split between processes.
+        return _to_solution(
+            *find_min_scoring_index_groups_dp(
+                calc_index_cost_rows(historical_pair_count_matrix),
+                group_sizes,
+                deadline=deadline,
+                on_improvement=on_index_improvement,
+                index_constraints=index_constraints
+            )
+        )
+    if jobs > 1:
+        # Worker processes are only set up when asked for.
+        from .parallel import find_min_scoring_index_groups_parallel
+        return _to_solution(
+            *find_min_scoring_index_groups_parallel(
+                historical_pair_count_matrix, group_sizes, jobs, deadline,
+                on_index_improvement, index_constraints
+            )
+        )
+    if solver == 'branch-and-bound':
+        return _to_solution(
+            *find_min_scoring_index_groups(
+                calc_index_cost_rows(historical_pair_count_matrix),
+                group_sizes,
+                deadline=deadline,
+                on_improvement=on_index_improvement,
+                index_constraints=index_constraints
+            )
+        )
+    return _find_min_scoring_solution_exhaustive(
+        generate_all_group_configs(
+            students, group_size, constraints, group_sizes
+        ),
+        historical_pair_count_matrix, deadline, on_improvement
     )
@@ -1,5 +1,5 @@
 """Package definition for groupmaker."""
-from setuptools import setup
+from setuptools import find_packages, setup
 
 setup(
     name='groupmaker',
@@ -9,10 +9,14 @@ setup(
     author='David Selassie',
     author_email='selassid@gmail.com',
     license='BSD',
-    packages=['groupmaker'],
+    packages=find_packages(),
     entry_points={
         'console_scripts': [
             'groupmaker = groupmaker.scripts.groupmaker:main',
+            'groupmaker-benchmark = '
+            'groupmaker.scripts.groupmaker_benchmark:main',
+            'groupmaker-batch = groupmaker.scripts.groupmaker_batch:main',
+            'groupmaker-serve = groupmaker.scripts.groupmaker_serve:main',
         ]
     },
     install_requires=[